@@ -6,10 +6,11 @@ from flask_restx import Api
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
+from app.services.response_service import init_response_layer, output_json
+from app.services.timing_service import init_timing
+from app.services.logging_service import init_logging
 import logging
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
@@ -19,6 +20,8 @@ def create_app():
     """Crée et configure l'application Flask."""
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Journalisation (niveaux, file d'écriture) : avant tout message
+    init_logging(app)
     logger.info("Flask app created with config loaded")
 
     # Initialisation de CORS
@@ -26,7 +29,8 @@ def create_app():
         r"/api/*": { 
             "origins": ["http://localhost:3000"], 
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], 
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "X-Profile"],
+            "expose_headers": ["Server-Timing", "X-Profile-Id"],
             "supports_credentials": True 
         } 
     })
@@ -35,7 +39,7 @@ def create_app():
     @app.after_request
     def after_request(response):
         response.headers["Access-Control-Allow-Origin"] = "http://localhost:3000"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Profile"
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
         response.headers["Access-Control-Allow-Credentials"] = "true"
         return response
@@ -51,8 +55,18 @@ def create_app():
     Migrate(app, db)
     logger.info("Extensions (DB, JWT, Migrate) initialized")
 
+    # Mesure des étapes des requêtes (Server-Timing, histogrammes, profilage) : avant la
+    # couche de réponse, pour que la compression soit mesurée
+    init_timing(app)
+    logger.info("Request timing initialized")
+
+    # Couche de réponse : JSON rapide et compression négociée (Accept-Encoding)
+    init_response_layer(app)
+    logger.info("Response layer initialized")
+
     # Initialisation de l'API avec Swagger
     api = Api(app, title="API Auth", version="1.0", description="API d'authentification")
+    api.representations["application/json"] = output_json
     logger.info("API initialized with Swagger")
 
     # Importation et enregistrement des Blueprints
@@ -1,21 +1,156 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, url_for, current_app, send_file
 from flask_cors import cross_origin
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from app.services.file_service import extract_file_data
+from app.services.extraction_engine import resolve_projection, resolve_tolerance, projection_variant, ENTITY_GROUPS, EXTRACTED_TYPES
+from app.services.extraction_cache import get_extraction_cache, encode_json, cache_response, extraction_etag
+from app.services.extraction_pool import get_extraction_pool, ExtractionPoolError, ExtractionJobError
+from app.services.extraction_jobs import run_extraction, extract_ndjson, extract_columnar_payload, compute_surface, diff_revisions
+from app.services.job_service import get_job_service, job_status
+from app.services.batch_service import resolve_user_path, list_dxf_files, iter_batch, encode_batch_record, encode_batch
+from app.services.folder_tree import get_folder_structure
+from app.services.folder_index import get_folder_listing, folder_changed, tree_generation
+from app.services.columnar import COLUMNAR_MIMETYPE
+from app.services.surface_service import check_threshold
+from app.services.spatial_service import SPATIAL_VARIANT, open_spatial_index
+from app.services.tile_service import TILE_MIMETYPE, ArchiveRange
+from app.services.tile_build_service import get_tile_build_service
+from app.services.prefetch_service import get_prefetch_service
+from app.services.diff_service import DEFAULT_PRECISION
+from app.services.geometry_store import ingest_file, prune_folder, query_entities, relative_name
+from app.services.timing_service import stage, get_timing_histograms, profile_path
+from app.services.response_service import make_etag, not_modified, set_validators
+from werkzeug.wsgi import wrap_file
 import logging
 import os
 from app.models.user import User
-from datetime import datetime
 import shutil
 import json
-from werkzeug.datastructures import FileStorage
+import itertools
 import io
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 file_blueprint = Blueprint("file", __name__)
 
+NDJSON_MIMETYPE = "application/x-ndjson"
+EXTRACTION_MIMETYPES = ["application/json", NDJSON_MIMETYPE, COLUMNAR_MIMETYPE]
+
+def negotiate_format():
+    """Choisit le format de sortie de l'extraction d'après l'en-tête Accept."""
+    return request.accept_mimetypes.best_match(EXTRACTION_MIMETYPES, default="application/json")
+
+def read_projection():
+    """Lit la projection demandée (types, fields) dans le corps JSON, le formulaire ou l'URL.
+
+    Lève ValueError si les paramètres sont invalides.
+    """
+    data = request.get_json(silent=True) or {}
+    types = data.get("types", request.values.get("types"))
+    fields = data.get("fields", request.values.get("fields"))
+    return resolve_projection(types, fields)
+
+def read_tolerance():
+    """Lit la tolérance de simplification des polylignes (aperçus), en unités du dessin.
+
+    Retourne None si absente ; lève ValueError si elle n'est pas un nombre positif.
+    """
+    data = request.get_json(silent=True) or {}
+    return resolve_tolerance(data.get("tolerance", request.values.get("tolerance")))
+
+def pool_error_response(e):
+    """Réponse HTTP d'une tâche d'extraction en échec : 400, 503 (saturation, mémoire) ou 504 (délai)."""
+    logger.error("Échec de la tâche d'extraction : %s", e)
+    response = jsonify({"error": str(e)})
+    response.status_code = e.status_code
+    if e.status_code == 503:
+        response.headers["Retry-After"] = "5"
+    return response
+
+def columnar_response(cache, content_hash, source, types, tolerance=None):
+    """Sert l'extraction au format colonnaire, depuis le cache si possible.
+
+    Le paramètre de requête "quantum" active les coordonnées int32 quantifiées.
+    """
+    quantum = request.args.get("quantum", type=float)
+    if quantum is not None and not 0 < quantum < float("inf"):
+        response = jsonify({"error": "Le paramètre quantum doit être un nombre positif"})
+        response.status_code = 400
+        return response
+
+    variant = projection_variant(types, "full", prefix=f"columnar-q{quantum}" if quantum else "columnar",
+                                 tolerance=tolerance)
+    unchanged = not_modified(extraction_etag(content_hash, variant, COLUMNAR_MIMETYPE))
+    if unchanged is not None:
+        return unchanged
+    payload = cache.get(content_hash, variant)
+    if payload is not None:
+        return cache_response(payload, hit=True, mimetype=COLUMNAR_MIMETYPE, key=(content_hash, variant))
+
+    try:
+        payload = get_extraction_pool().run(extract_columnar_payload, source, quantum, types, tolerance)
+    except (ExtractionPoolError, ExtractionJobError) as e:
+        return pool_error_response(e)
+
+    cache.put(content_hash, variant, payload)
+    return cache_response(payload, hit=False, mimetype=COLUMNAR_MIMETYPE, key=(content_hash, variant))
+
+def ndjson_response(chunks):
+    """Réponse HTTP envoyée au fil de l'extraction, sans mise en tampon."""
+    response = Response(stream_with_context(chunks), mimetype=NDJSON_MIMETYPE)
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+def close_source(source):
+    """Ferme une source d'extraction ouverte (les chemins n'ont rien à fermer)."""
+    if hasattr(source, "close"):
+        source.close()
+
+def iter_pooled_ndjson(first, chunks, source):
+    """Relaie les paquets NDJSON du pool puis ferme la source, une fois la réponse envoyée ou interrompue.
+
+    Une erreur survenue en cours de route termine le flux par une ligne d'erreur.
+    """
+    try:
+        if first is not None:
+            yield first
+        yield from chunks
+    except (ExtractionPoolError, ExtractionJobError) as e:
+        logger.error("Extraction en flux interrompue : %s", e)
+        yield (json.dumps({"section": "error", "data": {"error": str(e)}}) + "\n").encode("utf-8")
+    finally:
+        chunks.close()
+        close_source(source)
+
+def pooled_ndjson_response(source, types, fields, tolerance=None):
+    """Extraction NDJSON dans le pool, envoyée au fil de l'eau.
+
+    Le premier paquet est attendu avant de répondre, pour que la saturation du
+    pool ou une erreur immédiate donnent encore un vrai code HTTP.
+    """
+    chunks = get_extraction_pool().stream(extract_ndjson, source, types, fields, tolerance)
+    try:
+        first = next(chunks, None)
+    except (ExtractionPoolError, ExtractionJobError) as e:
+        close_source(source)
+        return pool_error_response(e)
+    return ndjson_response(iter_pooled_ndjson(first, chunks, source))
+
+def detach_upload_stream(file):
+    """Retourne un flux de l'upload qui reste lisible après la fin de la requête.
+
+    Werkzeug ferme les fichiers reçus à la fin de la requête, avant que la
+    réponse en flux ne soit consommée : on duplique donc le descripteur du
+    fichier temporaire (ou on copie le petit tampon resté en mémoire).
+    """
+    stream = file.stream
+    try:
+        fd = os.dup(stream.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return io.BytesIO(stream.read())
+    detached = os.fdopen(fd, 'rb')
+    detached.seek(0)
+    return detached
+
 def get_user_folder_path():
     """Récupère le chemin du dossier utilisateur basé sur l'email."""
     user_id = get_jwt_identity()
@@ -32,43 +167,6 @@ def get_user_folder_path():
     base_resource_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Ressources'))
     return os.path.join(base_resource_path, folder_name)
 
-def get_folder_structure(base_path, relative_path=""):
-    """Récupère récursivement la structure des dossiers et fichiers."""
-    folder_structure = {"folders": [], "files": []}
-    
-    try:
-        full_path = os.path.join(base_path, relative_path)
-        if not os.path.exists(full_path):
-            logger.debug(f"Folder does not exist: {full_path}")
-            return folder_structure
-
-        for item in os.listdir(full_path):
-            item_path = os.path.join(full_path, item)
-            rel_item_path = os.path.join(relative_path, item) if relative_path else item
-
-            if os.path.isdir(item_path):
-                folder_info = {
-                    "name": item,
-                    "path": rel_item_path,
-                    "last_modified": datetime.fromtimestamp(os.path.getmtime(item_path)).isoformat(),
-                    "size": sum(os.path.getsize(os.path.join(item_path, f)) for f in os.listdir(item_path) if os.path.isfile(os.path.join(item_path, f))),
-                    "sub_structure": get_folder_structure(base_path, rel_item_path)
-                }
-                folder_structure["folders"].append(folder_info)
-            elif os.path.isfile(item_path) and item.lower().endswith('.dxf'):
-                file_info = {
-                    "name": item,
-                    "path": rel_item_path,
-                    "size": os.path.getsize(item_path),
-                    "last_modified": datetime.fromtimestamp(os.path.getmtime(item_path)).isoformat()
-                }
-                folder_structure["files"].append(file_info)
-
-        return folder_structure
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération de la structure : {str(e)}", exc_info=True)
-        return folder_structure
-
 @file_blueprint.route("/api/upload", methods=["POST"])
 @cross_origin()
 @jwt_required()
@@ -82,9 +180,9 @@ def upload_file():
         logger.error("Nom de fichier invalide")
         return jsonify({"error": "Nom de fichier invalide"}), 400
     
-    logger.debug(f"Fichier reçu : {file.filename}")
+    logger.debug("Fichier reçu : %s", file.filename)
     if not file.filename.lower().endswith('.dxf'):
-        logger.error(f"Format non supporté : {file.filename}")
+        logger.error("Format non supporté : %s", file.filename)
         return jsonify({"error": "Seuls les fichiers .dxf sont acceptés"}), 400
 
     user_folder_path = get_user_folder_path()
@@ -94,7 +192,10 @@ def upload_file():
 
     file_path = os.path.join(user_folder_path, file.filename)
     file.save(file_path)
-    logger.debug(f"Fichier sauvegardé dans : {file_path}")
+    folder_changed(file_path)
+    get_extraction_cache().invalidate_path(file_path)
+    get_prefetch_service().submit(file_path, int(get_jwt_identity()), user_folder_path)
+    logger.debug("Fichier sauvegardé dans : %s", file_path)
 
     return jsonify({"message": "Fichier .dxf reçu et sauvegardé", "filename": file.filename, "path": file_path}), 200
 
@@ -102,27 +203,55 @@ def upload_file():
 @cross_origin()
 @jwt_required()
 def extract_data():
-    if 'file' not in request.files:
+    with stage("upload"):
+        # Réception du formulaire multipart (fichier mis en tampon par Werkzeug)
+        files = request.files
+    if 'file' not in files:
         logger.error("Aucun fichier reçu dans la requête")
         return jsonify({"error": "Aucun fichier reçu"}), 400
     
-    file = request.files['file']
+    file = files['file']
     if file.filename == '':
         logger.error("Nom de fichier invalide")
         return jsonify({"error": "Nom de fichier invalide"}), 400
     
-    logger.debug(f"Extraction des données pour : {file.filename}")
+    logger.debug("Extraction des données pour : %s", file.filename)
     if not file.filename.lower().endswith('.dxf'):
-        logger.error(f"Format non supporté : {file.filename}")
+        logger.error("Format non supporté : %s", file.filename)
         return jsonify({"error": "Seuls les fichiers .dxf sont acceptés"}), 400
     
-    result = extract_file_data(file)
-    if "error" in result:
-        logger.error(f"Erreur d'extraction : {result['error']}")
-        return jsonify(result), 400
-    
+    try:
+        types, fields = read_projection()
+        tolerance = read_tolerance()
+    except ValueError as e:
+        logger.error("Projection invalide : %s", e)
+        return jsonify({"error": str(e)}), 400
+
+    output_format = negotiate_format()
+    if output_format == NDJSON_MIMETYPE:
+        logger.debug("Extraction en flux pour : %s", file.filename)
+        return pooled_ndjson_response(detach_upload_stream(file), types, fields, tolerance)
+
+    cache = get_extraction_cache()
+    content_hash = cache.stream_hash(file.stream)
+    if output_format == COLUMNAR_MIMETYPE:
+        logger.debug("Extraction colonnaire pour : %s", file.filename)
+        return columnar_response(cache, content_hash, file.stream, types, tolerance)
+
+    variant = projection_variant(types, fields, tolerance=tolerance)
+    payload = cache.get(content_hash, variant)
+    if payload is not None:
+        logger.debug("Extraction servie depuis le cache pour : %s", file.filename)
+        return cache_response(payload, hit=True, key=(content_hash, variant)), 200
+
+    try:
+        payload = run_extraction(cache, get_extraction_pool(), content_hash, file.stream, types, fields, variant,
+                                 tolerance=tolerance)
+    except (ExtractionPoolError, ExtractionJobError) as e:
+        return pool_error_response(e)
+
     logger.debug("Données extraites avec succès")
-    return jsonify(result), 200
+    return cache_response(payload, hit=False, key=(content_hash, variant)), 200
 
 @file_blueprint.route("/api/transfer-files", methods=["POST"])
 @cross_origin()
@@ -150,19 +279,26 @@ def transfer_files():
 
         transfer_folder = os.path.join(user_folder_path, custom_folder_name)  # Utiliser le nom personnalisé
         os.makedirs(transfer_folder, exist_ok=True)
-        logger.debug(f"Dossier de transfert créé : {transfer_folder}")
+        logger.debug("Dossier de transfert créé : %s", transfer_folder)
 
         file1_path = os.path.join(transfer_folder, filename1)
         file2_path = os.path.join(transfer_folder, filename2)
         
         file1.save(file1_path)
         file2.save(file2_path)
-        logger.debug(f"Fichiers sauvegardés : {file1_path}, {file2_path}")
+        folder_changed(transfer_folder, recursive=True)
+        cache = get_extraction_cache()
+        cache.invalidate_path(file1_path)
+        cache.invalidate_path(file2_path)
+        prefetch = get_prefetch_service()
+        prefetch.submit(file1_path, int(get_jwt_identity()), user_folder_path)
+        prefetch.submit(file2_path, int(get_jwt_identity()), user_folder_path)
+        logger.debug("Fichiers sauvegardés : %s, %s", file1_path, file2_path)
 
         return jsonify({"message": f"Fichiers transférés avec succès dans {custom_folder_name}"}), 200
 
     except Exception as e:
-        logger.error(f"Erreur lors du transfert : {str(e)}", exc_info=True)
+        logger.error("Erreur lors du transfert : %s", e, exc_info=True)
         return jsonify({"error": f"Erreur lors du transfert : {str(e)}"}), 500
 
 @file_blueprint.route("/api/user-folder/files", methods=["GET"])
@@ -175,20 +311,61 @@ def get_user_folder_files():
             logger.error("Dossier utilisateur non trouvé ou inaccessible")
             return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
 
-        folder_structure = get_folder_structure(user_folder_path)
-        logger.debug(f"Folder structure returned: {json.dumps(folder_structure, indent=2)}")
-        return jsonify(folder_structure), 200
+        # Sous-dossier, profondeur et pagination (limit, cursor) optionnels
+        relative_path = request.args.get("path", "")
+        depth = request.args.get("depth", type=int)
+        limit = request.args.get("limit", type=int)
+        if (depth is not None and depth < 1) or (limit is not None and limit < 1):
+            return jsonify({"error": "Les paramètres depth et limit doivent être des entiers positifs"}), 400
+        folder_path = resolve_user_path(user_folder_path, relative_path)
+        if folder_path is None:
+            logger.error("Chemin hors du dossier utilisateur : %s", relative_path)
+            return jsonify({"error": "Chemin invalide"}), 400
+        if not os.path.isdir(folder_path):
+            return jsonify({"error": f"Dossier non trouvé : {relative_path}"}), 404
+        relative_path = os.path.relpath(folder_path, os.path.realpath(user_folder_path))
+        if relative_path == ".":
+            relative_path = ""
+
+        # ETag : génération du dossier dans l'index (aucun si l'index ne peut pas la garantir)
+        cursor = request.args.get("cursor")
+        generation = tree_generation(os.path.join(user_folder_path, relative_path))
+        etag = None
+        if generation is not None:
+            etag = make_etag("application/json", "user-folder-files", *generation, user_folder_path, relative_path,
+                             depth, limit, cursor)
+            unchanged = not_modified(etag)
+            if unchanged is not None:
+                return unchanged
+
+        try:
+            folder_structure = get_folder_structure(user_folder_path, relative_path, depth, limit, cursor,
+                                                    get_folder_listing())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        logger.debug("Folder structure returned: %s folders, %s files",
+                     len(folder_structure['folders']), len(folder_structure['files']))
+        response = jsonify(folder_structure)
+        if etag is not None:
+            set_validators(response, etag)
+        return response, 200
 
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des fichiers : {str(e)}", exc_info=True)
+        logger.error("Erreur lors de la récupération des fichiers : %s", e, exc_info=True)
         return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
 
-@file_blueprint.route("/api/user-folder/extract-data-from-file", methods=["POST"])
+@file_blueprint.route("/api/user-folder/extract-data-from-file", methods=["GET", "POST"])
 @cross_origin()
 @jwt_required()
 def extract_data_from_file():
+    """Extrait les données d'un plan du dossier utilisateur.
+
+    En GET (paramètres dans l'URL), la réponse peut être gardée par le
+    navigateur : elle porte l'ETag du résultat, et une requête If-None-Match
+    reçoit 304 sans relecture du cache.
+    """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or request.args
         filename = data.get("filename")
         folder = data.get("folder", "")  # Path relative to user folder
 
@@ -201,31 +378,641 @@ def extract_data_from_file():
             logger.error("Dossier utilisateur non trouvé ou inaccessible")
             return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
 
-        file_path = os.path.join(user_folder_path, folder, filename) if folder else os.path.join(user_folder_path, filename)
-        logger.debug(f"Received filename: {filename}, folder: {folder}")
-        logger.debug(f"Constructed file path: {file_path}")
+        logger.debug("Received filename: %s, folder: %s", filename, folder)
+        # Chemin confiné au dossier de l'utilisateur (pas de ../ ni de chemin absolu)
+        file_path = resolve_user_path(user_folder_path, os.path.join(folder, filename))
+        logger.debug("Constructed file path: %s", file_path)
+
+        if file_path is None or not os.path.isfile(file_path):
+            logger.error("Fichier non trouvé : %s", filename)
+            return jsonify({"error": f"Fichier non trouvé : {filename}"}), 404
+
+        try:
+            types, fields = read_projection()
+            tolerance = read_tolerance()
+        except ValueError as e:
+            logger.error("Projection invalide : %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        output_format = negotiate_format()
+        if output_format == NDJSON_MIMETYPE:
+            logger.debug("Extraction en flux pour : %s", file_path)
+            return pooled_ndjson_response(file_path, types, fields, tolerance)
+
+        cache = get_extraction_cache()
+        content_hash = cache.content_hash(file_path)
+        if output_format == COLUMNAR_MIMETYPE:
+            logger.debug("Extraction colonnaire pour : %s", file_path)
+            return columnar_response(cache, content_hash, file_path, types, tolerance)
+
+        variant = projection_variant(types, fields, tolerance=tolerance)
+        unchanged = not_modified(extraction_etag(content_hash, variant))
+        if unchanged is not None:
+            logger.debug("Extraction inchangée pour : %s", filename)
+            return unchanged
+        payload = cache.get(content_hash, variant)
+        if payload is not None:
+            logger.debug("Extraction servie depuis le cache pour : %s", filename)
+            return cache_response(payload, hit=True, key=(content_hash, variant)), 200
+
+        try:
+            payload = run_extraction(cache, get_extraction_pool(), content_hash, file_path, types, fields, variant,
+                                     tolerance=tolerance)
+        except (ExtractionPoolError, ExtractionJobError) as e:
+            return pool_error_response(e)
+
+        logger.debug("Données extraites pour : %s", filename)
+        return cache_response(payload, hit=False, key=(content_hash, variant)), 200
+
+    except Exception as e:
+        logger.error("Erreur lors de l'extraction : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+def iter_batch_ndjson(records):
+    """Lignes NDJSON d'une extraction groupée, terminées par le résumé du lot."""
+    succeeded = failed = 0
+    for name, payload, error in records:
+        if error is None:
+            succeeded += 1
+        else:
+            failed += 1
+        yield encode_batch_record(name, payload, error)
+    summary = {"total": succeeded + failed, "succeeded": succeeded, "failed": failed}
+    yield (json.dumps({"summary": summary}) + "\n").encode("utf-8")
+
+@file_blueprint.route("/api/user-folder/extract-batch", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def extract_batch():
+    """Extrait en parallèle tous les fichiers .dxf d'un dossier (folder) ou une liste de fichiers (files)."""
+    try:
+        data = request.get_json(silent=True) or {}
+        folder = data.get("folder")
+        files = data.get("files")
+        if folder is None and not files:
+            logger.error("Ni dossier ni fichiers fournis pour l'extraction groupée")
+            return jsonify({"error": "Dossier ou liste de fichiers requis"}), 400
+
+        try:
+            types, fields = read_projection()
+            tolerance = read_tolerance()
+        except ValueError as e:
+            logger.error("Projection invalide : %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        user_folder_path = get_user_folder_path()
+        if not user_folder_path or not os.path.exists(user_folder_path):
+            logger.error("Dossier utilisateur non trouvé ou inaccessible")
+            return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
+
+        # Fichiers introuvables ou hors du dossier utilisateur : erreurs par fichier
+        rejected = []
+        if files:
+            paths = []
+            for name in files:
+                path = resolve_user_path(user_folder_path, name)
+                if path is None or not os.path.isfile(path):
+                    rejected.append((name, None, f"Fichier non trouvé : {name}"))
+                else:
+                    paths.append(path)
+        else:
+            folder_path = resolve_user_path(user_folder_path, folder)
+            if folder_path is None or not os.path.isdir(folder_path):
+                logger.error("Dossier non trouvé : %s", folder)
+                return jsonify({"error": f"Dossier non trouvé : {folder}"}), 404
+            paths = list_dxf_files(folder_path)
+
+        max_files = current_app.config["EXTRACTION_BATCH_MAX_FILES"]
+        if len(paths) > max_files:
+            logger.error("Trop de fichiers pour l'extraction groupée : %s", len(paths))
+            return jsonify({"error": f"Trop de fichiers : {len(paths)} (maximum {max_files})"}), 400
+
+        logger.debug("Extraction groupée de %s fichiers", len(paths))
+        records = iter_batch(get_extraction_cache(), get_extraction_pool(), user_folder_path,
+                             paths, types, fields, projection_variant(types, fields, tolerance=tolerance),
+                             tolerance)
+
+        if negotiate_format() == NDJSON_MIMETYPE:
+            return ndjson_response(iter_batch_ndjson(itertools.chain(rejected, records)))
+        return Response(encode_batch(itertools.chain(rejected, records)), mimetype="application/json")
+
+    except Exception as e:
+        logger.error("Erreur lors de l'extraction groupée : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+def locate_spatial_index(cache, content_hash, file_path):
+    """Chemin de l'index spatial en cache d'un fichier, construit au besoin.
+
+    L'index est construit par l'extraction complète, mise en cache au passage ;
+    lève ExtractionPoolError ou ExtractionJobError en cas d'échec.
+    """
+    index_path = cache.locate(content_hash, SPATIAL_VARIANT)
+    if index_path is None:
+        run_extraction(cache, get_extraction_pool(), content_hash, file_path,
+                       EXTRACTED_TYPES, "full", projection_variant(EXTRACTED_TYPES, "full"))
+        index_path = cache.locate(content_hash, SPATIAL_VARIANT)
+    return index_path
+
+def read_bbox(value):
+    """Valide une emprise [minx, miny, maxx, maxy] ; lève ValueError si invalide."""
+    try:
+        bbox = [float(v) for v in value]
+    except (TypeError, ValueError):
+        raise ValueError("Emprise invalide : [minx, miny, maxx, maxy] attendu")
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError("Emprise invalide : [minx, miny, maxx, maxy] attendu")
+    return bbox
+
+@file_blueprint.route("/api/user-folder/viewport", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def viewport():
+    """Retourne les entités d'un fichier dont l'emprise intersecte bbox, filtrées par calque et type."""
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = data.get("filename")
+        folder = data.get("folder", "")
+        layers = data.get("layers")
+
+        if not filename:
+            logger.error("Nom de fichier manquant")
+            return jsonify({"error": "Nom de fichier requis"}), 400
+
+        try:
+            bbox = read_bbox(data.get("bbox"))
+            groups = None
+            if data.get("types"):
+                types, _ = resolve_projection(data.get("types"))
+                groups = [group for group, dxftypes in ENTITY_GROUPS.items() if any(t in types for t in dxftypes)]
+        except ValueError as e:
+            logger.error("Requête de vue invalide : %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        user_folder_path = get_user_folder_path()
+        if not user_folder_path or not os.path.exists(user_folder_path):
+            logger.error("Dossier utilisateur non trouvé ou inaccessible")
+            return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
 
-        if not os.path.exists(file_path):
-            logger.error(f"Fichier non trouvé : {file_path}")
+        file_path = resolve_user_path(user_folder_path, os.path.join(folder, filename))
+        if file_path is None or not os.path.isfile(file_path):
+            logger.error("Fichier non trouvé : %s", filename)
             return jsonify({"error": f"Fichier non trouvé : {filename}"}), 404
 
-        # Open the file and wrap it as a FileStorage object
-        with open(file_path, 'rb') as f:
-            file_content = f.read()  # Read the entire file content
-            file_obj = FileStorage(
-                stream=io.BytesIO(file_content),  # Wrap in BytesIO for FileStorage
-                filename=filename,
-                content_type='application/octet-stream'  # Generic binary type
-            )
-            result = extract_file_data(file_obj)
+        cache = get_extraction_cache()
+        try:
+            index_path = locate_spatial_index(cache, cache.content_hash(file_path), file_path)
+        except (ExtractionPoolError, ExtractionJobError) as e:
+            return pool_error_response(e)
+
+        index = open_spatial_index(index_path)
+        ids = index.query(bbox, layers, groups)
+        logger.debug("Vue %s : %s entités pour %s", bbox, len(ids), filename)
+        return Response(index.encode(ids, bbox, groups), mimetype="application/json")
+
+    except Exception as e:
+        logger.error("Erreur lors de la requête de vue : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+@file_blueprint.route("/api/user-folder/geometry/ingest", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def ingest_geometry():
+    """Enregistre en base la géométrie des fichiers .dxf d'un dossier (folder) ou d'une liste de fichiers (files).
+
+    Les fichiers déjà enregistrés avec le même contenu ne sont pas relus ; pour
+    un dossier, les fichiers qui n'y existent plus sont retirés de la base.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        folder = data.get("folder")
+        files = data.get("files")
+        if folder is None and not files:
+            logger.error("Ni dossier ni fichiers fournis pour l'enregistrement de la géométrie")
+            return jsonify({"error": "Dossier ou liste de fichiers requis"}), 400
+
+        user_folder_path = get_user_folder_path()
+        if not user_folder_path or not os.path.exists(user_folder_path):
+            logger.error("Dossier utilisateur non trouvé ou inaccessible")
+            return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
+
+        results = []
+        removed = 0
+        user_id = int(get_jwt_identity())
+        if files:
+            paths = []
+            for name in files:
+                path = resolve_user_path(user_folder_path, name)
+                if path is None or not os.path.isfile(path):
+                    results.append({"file": name, "error": f"Fichier non trouvé : {name}"})
+                else:
+                    paths.append(path)
+        else:
+            folder_path = resolve_user_path(user_folder_path, folder)
+            if folder_path is None or not os.path.isdir(folder_path):
+                logger.error("Dossier non trouvé : %s", folder)
+                return jsonify({"error": f"Dossier non trouvé : {folder}"}), 404
+            paths = list_dxf_files(folder_path)
+            removed = prune_folder(user_id, user_folder_path, folder_path, paths)
+
+        max_files = current_app.config["EXTRACTION_BATCH_MAX_FILES"]
+        if len(paths) > max_files:
+            logger.error("Trop de fichiers pour l'enregistrement de la géométrie : %s", len(paths))
+            return jsonify({"error": f"Trop de fichiers : {len(paths)} (maximum {max_files})"}), 400
+
+        for path in paths:
+            name = relative_name(user_folder_path, path)
+            try:
+                dxf_file, ingested = ingest_file(user_id, user_folder_path, path)
+                results.append({"file": name, "status": "ingested" if ingested else "unchanged",
+                                "entities": dxf_file.nb_entites})
+            except (ExtractionPoolError, ExtractionJobError) as e:
+                logger.error("Échec de l'enregistrement de la géométrie de %s : %s", name, e)
+                results.append({"file": name, "error": str(e)})
+
+        summary = {
+            "ingested": sum(1 for r in results if r.get("status") == "ingested"),
+            "unchanged": sum(1 for r in results if r.get("status") == "unchanged"),
+            "failed": sum(1 for r in results if "error" in r),
+            "removed": removed
+        }
+        return jsonify({"results": results, "summary": summary}), 200
+
+    except Exception as e:
+        logger.error("Erreur lors de l'enregistrement de la géométrie : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
 
-        if "error" in result:
-            logger.error(f"Erreur d'extraction : {result['error']}")
-            return jsonify(result), 400
+@file_blueprint.route("/api/user-folder/geometry/query", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def query_geometry():
+    """Recherche les entités enregistrées de l'utilisateur, tous fichiers confondus.
 
-        logger.debug(f"Données extraites pour : {filename}")
-        return jsonify(result), 200
+    Filtres : folder, layers, types, closed, bbox ; limit borne le nombre d'entités retournées.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        max_results = current_app.config["GEOMETRY_QUERY_MAX_RESULTS"]
+        try:
+            types = resolve_projection(data.get("types"))[0] if data.get("types") else None
+            bbox = read_bbox(data.get("bbox")) if data.get("bbox") is not None else None
+            closed = data.get("closed")
+            if closed is not None and not isinstance(closed, bool):
+                raise ValueError("closed doit être un booléen")
+            layers = data.get("layers")
+            if isinstance(layers, str):
+                layers = [layers]
+            limit = int(data.get("limit", max_results))
+            if not 0 < limit <= max_results:
+                raise ValueError(f"limit doit être compris entre 1 et {max_results}")
+        except (TypeError, ValueError) as e:
+            logger.error("Requête de géométrie invalide : %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        entities, truncated = query_entities(int(get_jwt_identity()), data.get("folder"), layers, types,
+                                             closed, bbox, limit)
+        logger.debug("Requête de géométrie : %s entités", len(entities))
+        return jsonify({"entities": entities, "count": len(entities), "truncated": truncated}), 200
 
     except Exception as e:
-        logger.error(f"Erreur lors de l'extraction : {str(e)}", exc_info=True)
-        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
\ No newline at end of file
+        logger.error("Erreur lors de la requête de géométrie : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+def read_distance(value, name):
+    """Valide une distance strictement positive (ou None) ; lève ValueError si invalide."""
+    if value in (None, ""):
+        return None
+    try:
+        distance = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} invalide : {value}")
+    if not 0 < distance < float("inf"):
+        raise ValueError(f"{name} doit être un nombre positif : {value}")
+    return distance
+
+@file_blueprint.route("/api/user-folder/diff", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def diff_files():
+    """Compare deux révisions d'un plan du dossier utilisateur (file1 : ancienne, file2 : nouvelle).
+
+    Retourne les entités ajoutées, supprimées et modifiées, et l'écart de
+    surface par calque. precision (arrondi des coordonnées) et match_distance
+    (distance d'appariement des entités déplacées) sont optionnels.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        folder = data.get("folder", "")
+        filename1 = data.get("file1")
+        filename2 = data.get("file2")
+        if not filename1 or not filename2:
+            logger.error("Noms de fichiers manquants pour la comparaison")
+            return jsonify({"error": "Deux fichiers sont requis pour la comparaison"}), 400
+
+        try:
+            precision = read_distance(data.get("precision"), "Précision") or DEFAULT_PRECISION
+            match_distance = read_distance(data.get("match_distance"), "Distance d'appariement")
+        except ValueError as e:
+            logger.error("Comparaison invalide : %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        user_folder_path = get_user_folder_path()
+        if not user_folder_path or not os.path.exists(user_folder_path):
+            logger.error("Dossier utilisateur non trouvé ou inaccessible")
+            return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
+
+        paths = []
+        for filename in (filename1, filename2):
+            path = resolve_user_path(user_folder_path, os.path.join(folder, filename))
+            if path is None or not os.path.isfile(path):
+                logger.error("Fichier non trouvé : %s", filename)
+                return jsonify({"error": f"Fichier non trouvé : {filename}"}), 404
+            paths.append(path)
+
+        # Résultat mis en cache sous l'ancienne révision, par nouvelle révision et paramètres
+        cache = get_extraction_cache()
+        old_hash, new_hash = (cache.content_hash(path) for path in paths)
+        variant = f"diff-{new_hash}-p{precision:g}"
+        if match_distance is not None:
+            variant += f"-d{match_distance:g}"
+        payload = cache.get(old_hash, variant)
+        if payload is not None:
+            logger.debug("Comparaison servie depuis le cache : %s / %s", filename1, filename2)
+            return cache_response(payload, hit=True, key=(old_hash, variant)), 200
+
+        try:
+            index_paths = [locate_spatial_index(cache, content_hash, path)
+                           for content_hash, path in ((old_hash, paths[0]), (new_hash, paths[1]))]
+            payload = get_extraction_pool().run(diff_revisions, *index_paths, precision, match_distance)
+        except (ExtractionPoolError, ExtractionJobError) as e:
+            return pool_error_response(e)
+        cache.put(old_hash, variant, payload)
+        logger.debug("Comparaison terminée : %s / %s", filename1, filename2)
+        return cache_response(payload, hit=False, key=(old_hash, variant)), 200
+
+    except Exception as e:
+        logger.error("Erreur lors de la comparaison : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+def get_tile_source():
+    """Chemin du dessin dont on demande les tuiles (paramètres filename et folder), ou une réponse d'erreur."""
+    filename = request.args.get("filename")
+    folder = request.args.get("folder", "")
+    if not filename:
+        logger.error("Nom de fichier manquant")
+        return None, (jsonify({"error": "Nom de fichier requis"}), 400)
+
+    user_folder_path = get_user_folder_path()
+    if not user_folder_path or not os.path.exists(user_folder_path):
+        logger.error("Dossier utilisateur non trouvé ou inaccessible")
+        return None, (jsonify({"error": "Dossier utilisateur non trouvé"}), 400)
+
+    file_path = resolve_user_path(user_folder_path, os.path.join(folder, filename))
+    if file_path is None or not os.path.isfile(file_path):
+        logger.error("Fichier non trouvé : %s", filename)
+        return None, (jsonify({"error": f"Fichier non trouvé : {filename}"}), 404)
+    return file_path, None
+
+def tile_status_response(status, value):
+    """Réponse d'attente (202) ou d'erreur quand l'archive de tuiles n'est pas prête."""
+    if status == "building":
+        response = jsonify({"status": "building"})
+        response.status_code = 202
+        response.headers["Retry-After"] = "5"
+        return response
+    return jsonify({"status": "error", "error": value}), 500
+
+@file_blueprint.route("/api/user-folder/tiles", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def tile_metadata():
+    """Décrit la pyramide de tuiles d'un fichier ; la construit en arrière-plan si besoin (202)."""
+    try:
+        file_path, error = get_tile_source()
+        if error:
+            return error
+
+        status, archive = get_tile_build_service().status(file_path)
+        if status != "ready":
+            return tile_status_response(status, archive)
+
+        metadata = archive.metadata()
+        metadata["status"] = "ready"
+        metadata["tile_url"] = url_for("file.get_tile", z=0, x=0, y=0, **request.args).replace("/0/0/0", "/{z}/{x}/{y}", 1)
+        return jsonify(metadata), 200
+
+    except Exception as e:
+        logger.error("Erreur lors de la lecture des tuiles : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+@file_blueprint.route("/api/user-folder/tiles/<int:z>/<int:x>/<int:y>", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def get_tile(z, x, y):
+    """Sert une tuile, lue directement dans l'archive ; 204 si la tuile est vide."""
+    try:
+        file_path, error = get_tile_source()
+        if error:
+            return error
+
+        status, archive = get_tile_build_service().status(file_path)
+        if status != "ready":
+            return tile_status_response(status, archive)
+
+        location = archive.locate(z, x, y)
+        if location is None:
+            return Response(status=204)
+
+        offset, length = location
+        response = current_app.response_class(
+            wrap_file(request.environ, ArchiveRange(archive.path, offset, length)),
+            mimetype=TILE_MIMETYPE,
+            direct_passthrough=True
+        )
+        response.content_length = length
+        return response
+
+    except Exception as e:
+        logger.error("Erreur lors de la lecture de la tuile %s/%s/%s : %s", z, x, y, e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+@file_blueprint.route("/api/user-folder/surface-area", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def surface_area():
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = data.get("filename")
+        folder = data.get("folder", "")
+        threshold = data.get("threshold")
+
+        if not filename:
+            logger.error("Nom de fichier manquant")
+            return jsonify({"error": "Nom de fichier requis"}), 400
+
+        if threshold in ("", None):
+            threshold = None
+        else:
+            try:
+                threshold = float(threshold)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Seuil invalide"}), 400
+
+        user_folder_path = get_user_folder_path()
+        if not user_folder_path or not os.path.exists(user_folder_path):
+            logger.error("Dossier utilisateur non trouvé ou inaccessible")
+            return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
+
+        file_path = resolve_user_path(user_folder_path, os.path.join(folder, filename))
+        if file_path is None or not os.path.isfile(file_path):
+            logger.error("Fichier non trouvé : %s", filename)
+            return jsonify({"error": f"Fichier non trouvé : {filename}"}), 404
+
+        cache = get_extraction_cache()
+        content_hash = cache.content_hash(file_path)
+        payload = cache.get(content_hash, "surface")
+        if payload is not None:
+            surface = json.loads(payload)
+        else:
+            try:
+                surface = get_extraction_pool().run(compute_surface, file_path)
+            except (ExtractionPoolError, ExtractionJobError) as e:
+                return pool_error_response(e)
+            cache.put(content_hash, "surface", encode_json(surface))
+
+        logger.debug("Surface calculée pour : %s", filename)
+        return jsonify(check_threshold(surface, threshold)), 200
+
+    except Exception as e:
+        logger.error("Erreur lors du calcul de surface : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+@file_blueprint.route("/api/extraction-cache/stats", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def extraction_cache_stats():
+    if get_jwt().get('role') != 'admin':
+        logger.error("Accès aux statistiques du cache refusé")
+        return jsonify({"error": "Accès réservé aux administrateurs"}), 403
+
+    return jsonify(get_extraction_cache().stats()), 200
+
+@file_blueprint.route("/api/timings/stats", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def timing_stats():
+    """Histogrammes des durées d'étapes par route (processus courant)."""
+    if get_jwt().get('role') != 'admin':
+        logger.error("Accès aux durées des requêtes refusé")
+        return jsonify({"error": "Accès réservé aux administrateurs"}), 403
+
+    return jsonify(get_timing_histograms().snapshot()), 200
+
+@file_blueprint.route("/api/timings/profiles/<profile_id>", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def download_profile(profile_id):
+    """Profil d'une requête (piles cumulées au format collapsed), voir l'en-tête X-Profile."""
+    if get_jwt().get('role') != 'admin':
+        logger.error("Accès aux profils refusé")
+        return jsonify({"error": "Accès réservé aux administrateurs"}), 403
+
+    path = profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": "Profil non trouvé"}), 404
+    return send_file(path, mimetype="text/plain", as_attachment=True, download_name=f"{profile_id}.folded")
+
+def job_response(job, status_code=200):
+    """Statut d'une tâche d'extraction, avec les liens de suivi et de résultat."""
+    response = jsonify(dict(
+        job_status(job),
+        status_url=url_for("file.extraction_job_status", job_id=job["id"]),
+        result_url=url_for("file.extraction_job_result", job_id=job["id"])
+    ))
+    response.status_code = status_code
+    return response
+
+def get_owned_job(job_id):
+    """Retourne la tâche si elle appartient à l'utilisateur connecté, sinon None."""
+    job = get_job_service().store.get(job_id)
+    if job is None or job["owner"] != str(get_jwt_identity()):
+        return None
+    return job
+
+@file_blueprint.route("/api/extraction-jobs", methods=["POST"])
+@cross_origin()
+@jwt_required()
+def submit_extraction_job():
+    """Soumet une extraction asynchrone d'un fichier uploadé ("file") ou du dossier utilisateur (filename, folder)."""
+    try:
+        try:
+            types, fields = read_projection()
+        except ValueError as e:
+            logger.error("Projection invalide : %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        upload = request.files.get('file')
+        file_path = None
+        if upload is not None:
+            if upload.filename == '':
+                logger.error("Nom de fichier invalide")
+                return jsonify({"error": "Nom de fichier invalide"}), 400
+            if not upload.filename.lower().endswith('.dxf'):
+                logger.error("Format non supporté : %s", upload.filename)
+                return jsonify({"error": "Seuls les fichiers .dxf sont acceptés"}), 400
+            filename = upload.filename
+        else:
+            data = request.get_json(silent=True) or {}
+            filename = data.get("filename")
+            folder = data.get("folder", "")
+            if not filename:
+                logger.error("Nom de fichier manquant")
+                return jsonify({"error": "Nom de fichier requis"}), 400
+
+            user_folder_path = get_user_folder_path()
+            if not user_folder_path or not os.path.exists(user_folder_path):
+                logger.error("Dossier utilisateur non trouvé ou inaccessible")
+                return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
+
+            file_path = resolve_user_path(user_folder_path, os.path.join(folder, filename))
+            if file_path is None or not os.path.isfile(file_path):
+                logger.error("Fichier non trouvé : %s", filename)
+                return jsonify({"error": f"Fichier non trouvé : {filename}"}), 404
+
+        job = get_job_service().submit(
+            get_jwt_identity(), filename, types, fields, projection_variant(types, fields),
+            file_path=file_path, upload=upload
+        )
+        logger.debug("Tâche d'extraction soumise : %s (%s)", job['id'], filename)
+        response = job_response(job, 202)
+        response.headers["Location"] = url_for("file.extraction_job_status", job_id=job["id"])
+        return response
+
+    except Exception as e:
+        logger.error("Erreur lors de la soumission de la tâche : %s", e, exc_info=True)
+        return jsonify({"error": f"Erreur serveur : {str(e)}"}), 500
+
+@file_blueprint.route("/api/extraction-jobs/<job_id>", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def extraction_job_status(job_id):
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({"error": "Tâche non trouvée"}), 404
+    return job_response(job)
+
+@file_blueprint.route("/api/extraction-jobs/<job_id>/result", methods=["GET"])
+@cross_origin()
+@jwt_required()
+def extraction_job_result(job_id):
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({"error": "Tâche non trouvée"}), 404
+    if job["status"] == "error":
+        return jsonify({"error": job["error"]}), 400
+    if job["status"] != "done":
+        return job_response(job, 409)
+
+    payload = get_job_service().store.read_result(job_id)
+    if payload is None:
+        return jsonify({"error": "Résultat de la tâche expiré"}), 410
+    return Response(payload, mimetype="application/json")
@@ -1,14 +1,17 @@
-from flask import request
+from flask import request, current_app
 from flask_restx import Namespace, Resource, fields, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.services.user_service import create_user, get_users, get_user_by_id, update_user, delete_user, get_users_with_folders
+from app.services.user_service import create_user, get_users, get_user_by_id, update_user, delete_user, get_users_with_folders, \
+    USER_SORTS, USERS_PAGE_SIZE, USERS_PAGE_MAX_SIZE
 from app.services.folder_service import populate_folders_from_resources
+from app.services.folder_index import tree_generation
+from app.services.response_service import output_json, make_etag, not_modified, set_validators
+from app.models.generation import get_generation, USERS_GENERATION
 from app import db
 import os
 import logging
 from datetime import datetime
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ns = Namespace("users", description="Gestion des utilisateurs")
@@ -48,7 +51,7 @@ class UserResource(Resource):
     @ns.marshal_with(user_model)
     def get(self, user_id):
         """Récupère un utilisateur par son identifiant"""
-        logger.info(f"GET request received for user ID {user_id}")
+        logger.info("GET request received for user ID %s", user_id)
         user = get_user_by_id(user_id)
         if user:
             return user
@@ -58,7 +61,7 @@ class UserResource(Resource):
     @ns.marshal_with(user_model)
     def put(self, user_id):
         """Met à jour les informations d'un utilisateur ou son dossier"""
-        logger.info(f"PUT request received for user ID {user_id}")
+        logger.info("PUT request received for user ID %s", user_id)
         user = get_user_by_id(user_id)
         if not user:
             abort(404, "Utilisateur non trouvé")
@@ -72,30 +75,30 @@ class UserResource(Resource):
     @jwt_required()
     def delete(self, user_id):
         """Supprime un utilisateur et son dossier personnel dans la base de données et dans Ressources."""
-        logger.info(f"DELETE request received for user ID {user_id} by user ID {get_jwt_identity()}")
+        logger.info("DELETE request received for user ID %s by user ID %s", user_id, get_jwt_identity())
         current_user_id = get_jwt_identity()
         current_user = get_user_by_id(current_user_id)
 
         # Autoriser les admins ou l'utilisateur lui-même
         if current_user.role != 'admin' and current_user_id != user_id:
-            logger.warning(f"Permission denied for user ID {current_user_id} to delete user ID {user_id}")
+            logger.warning("Permission denied for user ID %s to delete user ID %s", current_user_id, user_id)
             abort(403, "Seul un admin ou l'utilisateur lui-même peut supprimer ce compte")
 
         user = get_user_by_id(user_id)
         if not user:
-            logger.error(f"User ID {user_id} not found")
+            logger.error("User ID %s not found", user_id)
             abort(404, "Utilisateur non trouvé")
 
         try:
             success = delete_user(user_id)  # Supprime l'utilisateur et son dossier
             if success:
-                logger.info(f"Utilisateur ID {user_id} et son dossier supprimés avec succès")
+                logger.info("Utilisateur ID %s et son dossier supprimés avec succès", user_id)
                 return {"message": "Utilisateur et dossier supprimés avec succès"}, 200
             else:
-                logger.error(f"Failed to delete user ID {user_id}")
+                logger.error("Failed to delete user ID %s", user_id)
                 abort(500, "Échec de la suppression de l'utilisateur")
         except Exception as e:
-            logger.error(f"Erreur lors de la suppression pour l'utilisateur ID {user_id}: {str(e)}")
+            logger.error("Erreur lors de la suppression pour l'utilisateur ID %s: %s", user_id, e)
             abort(500, f"Erreur lors de la suppression: {str(e)}")
 
 @ns.route("/<int:user_id>/password")
@@ -108,7 +111,7 @@ class UserPasswordResource(Resource):
     @jwt_required()
     def put(self, user_id):
         """Met à jour le mot de passe d'un utilisateur"""
-        logger.info(f"PUT request received to update password for user ID {user_id}")
+        logger.info("PUT request received to update password for user ID %s", user_id)
         current_user_id = get_jwt_identity()
         if current_user_id != user_id:
             abort(403, "Vous n'êtes pas autorisé à modifier ce compte")
@@ -129,19 +132,79 @@ class UserPasswordResource(Resource):
         db.session.commit()
         return {"message": "Mot de passe mis à jour avec succès"}, 200
 
+def users_with_folders_generations(base_resource_path):
+    """Génération des comptes en base et de Ressources (dossiers des utilisateurs),
+    ou None si l'une des deux n'est pas disponible.
+    """
+    generation = get_generation(USERS_GENERATION)
+    resources = tree_generation(base_resource_path)
+    if generation is None or resources is None:
+        return None
+    return (generation, *resources)
+
+def users_with_folders_etag(generations, *params):
+    """ETag d'une page de la liste pour ces générations et paramètres, ou None."""
+    if generations is None:
+        return None
+    return make_etag("application/json", "users-with-folders", *generations, *params)
+
+def sync_users_folders(base_resource_path):
+    """Synchronise la table folder avec Ressources si les comptes ou Ressources ont changé
+    depuis la dernière synchronisation de ce processus ; retourne les générations à jour.
+    """
+    generations = users_with_folders_generations(base_resource_path)
+    if generations is not None and current_app.extensions.get("users_folders_synced") == generations:
+        logger.debug("Ressources unchanged since last sync, skipping populate_folders_from_resources")
+        return generations
+    logger.debug("Calling populate_folders_from_resources with path: %s", base_resource_path)
+    populate_folders_from_resources(base_resource_path)
+    # La synchronisation a pu modifier la base : générations relues
+    generations = users_with_folders_generations(base_resource_path)
+    current_app.extensions["users_folders_synced"] = generations
+    return generations
+
 @ns.route("/users-with-folders")
 class UsersWithFolders(Resource):
     @jwt_required()
     def get(self):
-        """Récupère tous les utilisateurs avec leurs dossiers après synchronisation avec Ressources."""
+        """Récupère une page des utilisateurs avec leurs dossiers après synchronisation avec Ressources.
+
+        Paramètres : q (recherche sur le nom, le prénom et l'email), sort (name,
+        email ou date), order (asc ou desc), limit (taille de la page) et
+        cursor (next_cursor de la page précédente). Retourne
+        {"items": [...], "next_cursor": ...}, next_cursor valant null à la
+        dernière page. Si ni les comptes ni Ressources n'ont changé depuis la
+        version du client (If-None-Match), répond 304 sans synchroniser ni
+        relire la base.
+        """
+        search = request.args.get("q", "").strip()
+        sort = request.args.get("sort", "name")
+        order = request.args.get("order", "asc")
+        limit = request.args.get("limit", USERS_PAGE_SIZE, type=int)
+        cursor = request.args.get("cursor") or None
+        if sort not in USER_SORTS or order not in ("asc", "desc"):
+            abort(400, f"Tri invalide (sort : {', '.join(USER_SORTS)} ; order : asc ou desc)")
+        if not 1 <= limit <= USERS_PAGE_MAX_SIZE:
+            abort(400, f"Le paramètre limit doit être compris entre 1 et {USERS_PAGE_MAX_SIZE}")
+        params = (search, sort, order, limit, cursor or "")
+
         try:
             logger.info("GET request received for users-with-folders")
             base_resource_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Ressources'))
-            logger.info(f"Calling populate_folders_from_resources with path: {base_resource_path}")
-            populate_folders_from_resources(base_resource_path)
-            result = get_users_with_folders()
-            logger.info(f"Returning users with folders: {len(result)} entries")
-            return result
+            etag = users_with_folders_etag(users_with_folders_generations(base_resource_path), *params)
+            unchanged = not_modified(etag) if etag is not None else None
+            if unchanged is not None:
+                return unchanged
+            etag = users_with_folders_etag(sync_users_folders(base_resource_path), *params)
+            try:
+                items, next_cursor = get_users_with_folders(search, sort, order == "desc", limit, cursor)
+            except ValueError as e:
+                return output_json({"message": str(e)}, 400)
+            logger.info("Returning users with folders: %s entries", len(items))
+            response = output_json({"items": items, "next_cursor": next_cursor}, 200)
+            if etag is not None:
+                set_validators(response, etag)
+            return response
         except Exception as e:
-            logger.error(f"Error in users-with-folders: {str(e)}")
+            logger.error("Error in users-with-folders: %s", e)
             abort(500, f"Erreur lors de la récupération des utilisateurs et dossiers: {str(e)}")
\ No newline at end of file
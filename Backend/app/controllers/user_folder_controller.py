@@ -5,10 +5,15 @@ from flask import jsonify, current_app, request, send_file
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.models.user import User
-import ezdxf  # Add this import
+from app.services.extraction_cache import get_extraction_cache, cache_response
+from app.services.extraction_pool import get_extraction_pool, ExtractionPoolError, ExtractionJobError
+from app.services.extraction_jobs import run_extraction
+from app.services.columnar import COLUMNAR_MIMETYPE
+from app.services.extraction_engine import projection_variant
+from app.services.folder_index import get_folder_listing, folder_changed
+from app.services.batch_service import resolve_user_path
+from app.controllers.file_controller import negotiate_format, columnar_response, read_projection, read_tolerance
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Création du namespace
@@ -31,7 +36,10 @@ folder_files_response = ns.model('FolderFilesResponse', {
 })
 
 extract_request = ns.model('ExtractRequest', {
-    'filename': fields.String(required=True, description="Nom du fichier à extraire")
+    'filename': fields.String(required=True, description="Nom du fichier à extraire"),
+    'types': fields.List(fields.String, description="Types d'entités à extraire (ex. LWPOLYLINE, lines) ; tous par défaut"),
+    'fields': fields.String(description="Champs produits : full (défaut), geometry, layers, stats ou measures (mesures par calque)"),
+    'tolerance': fields.Float(description="Tolérance de simplification des polylignes (unités du dessin) pour les aperçus")
 })
 
 def get_user_email():
@@ -62,7 +70,7 @@ class UserFolder(Resource):
             if not email:
                 return {'error': 'Utilisateur non trouvé'}, 404
 
-            logger.info(f"Checking folder for user: {email}")
+            logger.info("Checking folder for user: %s", email)
 
             folder_name = email.split('@')[0].replace('.', '_')
             base_resource_path = os.path.abspath(os.path.join(current_app.root_path, '..', 'Ressources'))
@@ -70,14 +78,14 @@ class UserFolder(Resource):
             
             folder_exists = os.path.exists(resource_path)
 
-            logger.info(f"Folder check result for {email}: exists={folder_exists}, path={resource_path}")
+            logger.info("Folder check result for %s: exists=%s, path=%s", email, folder_exists, resource_path)
             return {
                 'folderExists': folder_exists,
                 'folderName': folder_name,
                 'message': 'Dossier trouvé' if folder_exists else 'Dossier non trouvé'
             }
         except Exception as e:
-            logger.error(f"Error in check_user_folder: {str(e)}", exc_info=True)
+            logger.error("Error in check_user_folder: %s", e, exc_info=True)
             return {'error': f'Erreur lors de la vérification du dossier: {str(e)}'}, 500
 
     @jwt_required()
@@ -93,7 +101,7 @@ class UserFolder(Resource):
             if not email:
                 return {'error': 'Utilisateur non trouvé'}, 404
 
-            logger.info(f"Creating folder for user: {email}")
+            logger.info("Creating folder for user: %s", email)
 
             folder_name = email.split('@')[0].replace('.', '_')
             base_resource_path = os.path.abspath(os.path.join(current_app.root_path, '..', 'Ressources'))
@@ -101,14 +109,15 @@ class UserFolder(Resource):
 
             if not os.path.exists(resource_path):
                 os.makedirs(resource_path)
-                logger.info(f"Created user folder: {resource_path}")
+                folder_changed(resource_path)
+                logger.info("Created user folder: %s", resource_path)
                 return {
                     'folderExists': True,
                     'folderName': folder_name,
                     'message': 'Dossier créé avec succès'
                 }, 201
 
-            logger.info(f"Folder already exists: {resource_path}")
+            logger.info("Folder already exists: %s", resource_path)
             return {
                 'folderExists': True,
                 'folderName': folder_name,
@@ -116,7 +125,7 @@ class UserFolder(Resource):
             }, 200
 
         except Exception as e:
-            logger.error(f"Error in create_user_folder: {str(e)}", exc_info=True)
+            logger.error("Error in create_user_folder: %s", e, exc_info=True)
             return {'error': f'Erreur lors de la création du dossier: {str(e)}'}, 500
 
 @ns.route('/files')
@@ -133,7 +142,7 @@ class UserFolderFiles(Resource):
             if not email:
                 return {'error': 'Utilisateur non trouvé'}, 404
 
-            logger.info(f"Listing files for user: {email}")
+            logger.info("Listing files for user: %s", email)
 
             folder_name = email.split('@')[0].replace('.', '_')
             base_resource_path = os.path.abspath(os.path.join(current_app.root_path, '..', 'Ressources'))
@@ -146,23 +155,22 @@ class UserFolderFiles(Resource):
                 }, 200
 
             files = []
-            for filename in os.listdir(resource_path):
-                file_path = os.path.join(resource_path, filename)
-                if os.path.isfile(file_path):
+            for entry in get_folder_listing().entries(resource_path):
+                if not entry.is_dir:
                     files.append({
-                        'name': filename,
-                        'size': os.path.getsize(file_path),
-                        'last_modified': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+                        'name': entry.name,
+                        'size': entry.size,
+                        'last_modified': datetime.fromtimestamp(entry.mtime).isoformat()
                     })
 
-            logger.info(f"Found {len(files)} files in folder: {resource_path}")
+            logger.info("Found %s files in folder: %s", len(files), resource_path)
             return {
                 'files': files,
                 'message': 'Fichiers récupérés avec succès'
             }, 200
 
         except Exception as e:
-            logger.error(f"Error in list_user_folder_files: {str(e)}", exc_info=True)
+            logger.error("Error in list_user_folder_files: %s", e, exc_info=True)
             return {'error': f'Erreur lors de la récupération des fichiers: {str(e)}'}, 500
 
 @ns.route('/extract-data-from-file')
@@ -173,6 +181,8 @@ class ExtractDataFromFile(Resource):
     @ns.response(400, 'Requête invalide')
     @ns.response(404, 'Fichier non trouvé')
     @ns.response(500, 'Erreur serveur')
+    @ns.response(503, 'Serveur d\'extraction saturé')
+    @ns.response(504, 'Durée maximale d\'extraction dépassée')
     def post(self):
         try:
             email = get_user_email()
@@ -186,67 +196,40 @@ class ExtractDataFromFile(Resource):
 
             folder_name = email.split('@')[0].replace('.', '_')
             base_resource_path = os.path.abspath(os.path.join(current_app.root_path, '..', 'Ressources'))
-            file_path = os.path.join(base_resource_path, folder_name, filename)
-
-            if not os.path.exists(file_path):
-                return {'error': 'Fichier non trouvé'}, 404
-
-            # Parse the DXF file using ezdxf
-            doc = ezdxf.readfile(file_path)
-            msp = doc.modelspace()
-
-            # Extract layers
-            layers = [{'name': layer.dxf.name, 'color': layer.dxf.color if layer.dxf.color else 'N/A'} for layer in doc.layers]
-
-            # Extract entities dynamically like file_service.py
-            polylines = []
-            lines = []
-            circles = []
-            arcs = []
-            texts = []
-
-            for entity in msp.query('*'):
-                dxftype = entity.dxftype()
-                if dxftype in ['POLYLINE', 'LWPOLYLINE']:
-                    vertices = ([{'x': v[0], 'y': v[1]} for v in entity.points()] if dxftype == 'POLYLINE'
-                                else [{'x': v[0], 'y': v[1]} for v in entity.get_points()])
-                    polylines.append({
-                        'type': dxftype,
-                        'layer': entity.dxf.layer,
-                        'vertices': vertices,
-                        'closed': entity.closed
-                    })
-                elif dxftype == 'LINE':
-                    lines.append({'type': dxftype, 'layer': entity.dxf.layer})
-                elif dxftype == 'CIRCLE':
-                    circles.append({'type': dxftype, 'layer': entity.dxf.layer, 'radius': entity.dxf.radius})
-                elif dxftype == 'ARC':
-                    arcs.append({'type': dxftype, 'layer': entity.dxf.layer})
-                elif dxftype == 'TEXT':
-                    texts.append({'type': dxftype, 'layer': entity.dxf.layer, 'text': entity.dxf.text})
-
-            # Statistics
-            extracted_data = {
-                'statistics': {
-                    'layer_count': len(layers),
-                    'polyline_count': len(polylines),
-                    'line_count': len(lines),
-                    'circle_count': len(circles),
-                    'arc_count': len(arcs),
-                    'text_count': len(texts),
-                    'total_entities': len(msp)
-                },
-                'layers': layers,
-                'polylines': polylines,
-                'lines': lines,
-                'circles': circles,
-                'arcs': arcs,
-                'texts': texts
-            }
-
-            logger.info(f"Extracted data from file: {file_path}")
-            return extracted_data, 200
+            # Chemin confiné au dossier de l'utilisateur (pas de ../ ni de chemin absolu)
+            file_path = resolve_user_path(os.path.join(base_resource_path, folder_name), filename)
+
+            if file_path is None or not os.path.isfile(file_path):
+                return {'message': 'Fichier non trouvé'}, 404
+
+            try:
+                types, fields = read_projection()
+                tolerance = read_tolerance()
+            except ValueError as e:
+                return {'error': str(e)}, 400
+
+            cache = get_extraction_cache()
+            content_hash = cache.content_hash(file_path)
+            if negotiate_format() == COLUMNAR_MIMETYPE:
+                return columnar_response(cache, content_hash, file_path, types, tolerance)
+
+            variant = projection_variant(types, fields, tolerance=tolerance)
+            payload = cache.get(content_hash, variant)
+            if payload is not None:
+                logger.info("Extracted data served from cache: %s", file_path)
+                return cache_response(payload, hit=True, key=(content_hash, variant))
+
+            # Same extraction engine and worker pool as file_service.extract_file_data
+            try:
+                payload = run_extraction(cache, get_extraction_pool(), content_hash, file_path, types, fields, variant,
+                                         tolerance=tolerance)
+            except (ExtractionPoolError, ExtractionJobError) as e:
+                logger.error("Extraction failed for %s: %s", file_path, e)
+                return {'error': str(e)}, e.status_code
+
+            logger.info("Extracted data from file: %s", file_path)
+            return cache_response(payload, hit=False, key=(content_hash, variant))
 
         except Exception as e:
-            logger.error(f"Error in extract_data_from_file: {str(e)}", exc_info=True)
+            logger.error("Error in extract_data_from_file: %s", e, exc_info=True)
             return {'error': f'Erreur lors de l\'extraction des données: {str(e)}'}, 500
\ No newline at end of file
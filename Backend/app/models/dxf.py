@@ -0,0 +1,84 @@
+from app import db
+from datetime import datetime
+
+# Identifiants 64 bits (entiers auto-incrémentés simples sous SQLite)
+BigId = db.BigInteger().with_variant(db.Integer(), "sqlite")
+
+
+class DxfFile(db.Model):
+    """Fichier DXF du dossier d'un utilisateur dont la géométrie est enregistrée."""
+    __tablename__ = 'dxf_file'
+    __table_args__ = (
+        db.UniqueConstraint('id_user', 'chemin', name='uq_dxf_file_user_chemin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    id_user = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    chemin = db.Column(db.String(1024), nullable=False)  # Relatif au dossier de l'utilisateur, séparateur "/"
+    hash_contenu = db.Column(db.String(64), nullable=False)
+    taille = db.Column(db.BigInteger, nullable=False)
+    nb_entites = db.Column(db.Integer, nullable=False, default=0)
+    minx = db.Column(db.Float)
+    miny = db.Column(db.Float)
+    maxx = db.Column(db.Float)
+    maxy = db.Column(db.Float)
+    date_ingestion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationship to User
+    user = db.relationship('User', backref=db.backref('dxf_files', lazy=True, passive_deletes=True))
+
+    def __init__(self, id_user, chemin, hash_contenu, taille):
+        self.id_user = id_user
+        self.chemin = chemin
+        self.hash_contenu = hash_contenu
+        self.taille = taille
+
+
+class DxfLayer(db.Model):
+    """Calque d'un fichier DXF enregistré."""
+    __tablename__ = 'dxf_layer'
+    __table_args__ = (
+        db.UniqueConstraint('id_fichier', 'nom', name='uq_dxf_layer_fichier_nom'),
+        db.Index('ix_dxf_layer_nom', 'nom'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    id_fichier = db.Column(db.Integer, db.ForeignKey('dxf_file.id', ondelete='CASCADE'), nullable=False)
+    nom = db.Column(db.String(255), nullable=False)
+    couleur = db.Column(db.Integer)  # NULL : couleur non définie ("N/A")
+    epaisseur_trait = db.Column(db.Integer)
+
+    def __init__(self, id_fichier, nom, couleur=None, epaisseur_trait=None):
+        self.id_fichier = id_fichier
+        self.nom = nom
+        self.couleur = couleur
+        self.epaisseur_trait = epaisseur_trait
+
+
+class DxfEntity(db.Model):
+    """Entité d'un fichier DXF enregistré.
+
+    La géométrie est un blob de coordonnées float64 petit-boutistes (voir
+    geometry_store) ; l'emprise est dupliquée en colonnes pour les requêtes
+    spatiales indexées. Les entités sont insérées en masse, jamais une à une.
+    """
+    __tablename__ = 'dxf_entity'
+    __table_args__ = (
+        db.Index('ix_dxf_entity_calque_type', 'id_calque', 'type_entite', 'ferme'),
+        db.Index('ix_dxf_entity_fichier_emprise', 'id_fichier', 'minx', 'maxx', 'miny', 'maxy'),
+    )
+
+    id = db.Column(BigId, primary_key=True)
+    id_fichier = db.Column(db.Integer, db.ForeignKey('dxf_file.id', ondelete='CASCADE'), nullable=False)
+    id_calque = db.Column(db.Integer, db.ForeignKey('dxf_layer.id', ondelete='CASCADE'), nullable=False)
+    type_entite = db.Column(db.String(16), nullable=False)
+    ferme = db.Column(db.Boolean, nullable=False, default=False)
+    couleur = db.Column(db.Integer)  # NULL : couleur non définie ("N/A")
+    epaisseur_trait = db.Column(db.Integer)
+    nb_sommets = db.Column(db.Integer, nullable=False)
+    minx = db.Column(db.Float, nullable=False)
+    miny = db.Column(db.Float, nullable=False)
+    maxx = db.Column(db.Float, nullable=False)
+    maxy = db.Column(db.Float, nullable=False)
+    geometrie = db.Column(db.LargeBinary, nullable=False)
+    texte = db.Column(db.Text)
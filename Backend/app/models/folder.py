@@ -5,7 +5,7 @@ class Folder(db.Model):
     __tablename__ = 'folder'
     
     id = db.Column(db.Integer, primary_key=True)
-    id_user = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    id_user = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     nom_dossier = db.Column(db.String(100), nullable=False)
     date_creation = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
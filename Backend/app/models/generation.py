@@ -0,0 +1,37 @@
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models.user import User
+from app.models.folder import Folder
+
+# Génération des comptes et de leurs dossiers (liste users-with-folders)
+USERS_GENERATION = "users"
+
+
+class Generation(db.Model):
+    """Compteur incrémenté à chaque modification d'un ensemble de lignes, partagé par tous les processus.
+
+    Sert d'ETag aux réponses qui décrivent cet ensemble : les lire coûte une
+    seule requête, sans relire les lignes.
+    """
+    __tablename__ = 'generation'
+
+    nom = db.Column(db.String(50), primary_key=True)
+    valeur = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+def get_generation(name):
+    """Valeur courante du compteur name, ou None s'il n'existe pas (base non migrée)."""
+    return db.session.query(Generation.valeur).filter_by(nom=name).scalar()
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_users_generation(session, flush_context, instances):
+    # Dans la transaction de l'écriture : le compteur change si et seulement si elle est validée
+    changed = any(isinstance(obj, (User, Folder)) for obj in session.new) \
+        or any(isinstance(obj, (User, Folder)) for obj in session.deleted) \
+        or any(isinstance(obj, (User, Folder)) and session.is_modified(obj) for obj in session.dirty)
+    if changed:
+        session.execute(
+            update(Generation).where(Generation.nom == USERS_GENERATION).values(valeur=Generation.valeur + 1)
+        )
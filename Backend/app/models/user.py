@@ -9,6 +9,9 @@ from Crypto.Random import get_random_bytes
 SECRET_KEY = os.getenv('SECRET_KEY', 'my_secret_key')  # A remplacer par une clé plus sécurisée
 
 class User(db.Model):
+    # Tri par nom de la liste des comptes (get_users_with_folders)
+    __table_args__ = (db.Index('ix_user_nom_prenom', 'nom', 'prenom'),)
+
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(50), nullable=False)
     prenom = db.Column(db.String(50), nullable=False)
@@ -0,0 +1,88 @@
+"""Extraction groupée des fichiers DXF d'un dossier utilisateur (dossiers de transfert).
+
+Les fichiers sont extraits en parallèle par le pool d'extraction, chacun via le
+cache ; un fichier en échec est signalé dans son propre résultat sans
+interrompre les autres.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.services.extraction_jobs import run_extraction
+from app.services.extraction_pool import ExtractionPoolError, ExtractionJobError
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_user_path(user_folder_path, relative_path):
+    """Chemin absolu de relative_path dans le dossier utilisateur, ou None s'il en sort."""
+    root = os.path.realpath(user_folder_path)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([path, root]) != root:
+        return None
+    return path
+
+
+def list_dxf_files(folder_path):
+    """Liste récursivement les fichiers .dxf d'un dossier, dans l'ordre alphabétique."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(folder_path):
+        dirnames.sort()
+        found.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.lower().endswith(".dxf"))
+    return found
+
+
+def _extract_one(cache, pool, path, types, fields, variant, tolerance):
+    """Extraction d'un fichier via le cache : retourne le résultat JSON encodé."""
+    content_hash = cache.content_hash(path)
+    payload = cache.get(content_hash, variant)
+    if payload is None:
+        payload = run_extraction(cache, pool, content_hash, path, types, fields, variant, tolerance=tolerance)
+    return payload
+
+
+def iter_batch(cache, pool, user_folder_path, paths, types, fields, variant, tolerance=None):
+    """Extrait les fichiers en parallèle et génère (nom relatif, résultat encodé, erreur)
+    dans l'ordre où ils se terminent ; exactement l'un des deux derniers vaut None.
+    """
+    root = os.path.realpath(user_folder_path)
+    max_workers = max(1, min(len(paths), pool.size or 1))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extraction-batch") as executor:
+        futures = {
+            executor.submit(_extract_one, cache, pool, path, types, fields, variant, tolerance): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            name = os.path.relpath(futures[future], root).replace(os.sep, "/")
+            try:
+                yield name, future.result(), None
+            except (ExtractionPoolError, ExtractionJobError) as e:
+                logger.error("Échec de l'extraction groupée pour %s : %s", name, e)
+                yield name, None, str(e)
+            except Exception as e:
+                logger.error("Erreur lors de l'extraction groupée pour %s : %s", name, e, exc_info=True)
+                yield name, None, f"Erreur lors de l'extraction des données : {str(e)}"
+
+
+def encode_batch_record(name, payload, error):
+    """Ligne NDJSON d'un fichier du lot, sans re-sérialiser le résultat déjà encodé."""
+    if error is not None:
+        return (json.dumps({"file": name, "status": "error", "error": error}) + "\n").encode("utf-8")
+    return b'{"file":' + json.dumps(name).encode("utf-8") + b',"status":"ok","data":' + payload + b"}\n"
+
+
+def encode_batch(records):
+    """Réponse JSON complète du lot : résultats et erreurs par fichier, puis résumé."""
+    parts = []
+    errors = {}
+    for name, payload, error in records:
+        if error is None:
+            parts.append(json.dumps(name).encode("utf-8") + b":" + payload)
+        else:
+            errors[name] = error
+    summary = {"total": len(parts) + len(errors), "succeeded": len(parts), "failed": len(errors)}
+    return (
+        b'{"results":{' + b",".join(parts) + b'},"errors":'
+        + json.dumps(errors).encode("utf-8")
+        + b',"summary":' + json.dumps(summary).encode("utf-8") + b"}"
+    )
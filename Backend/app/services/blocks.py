@@ -0,0 +1,364 @@
+"""Développement des références de blocs (INSERT) en géométrie.
+
+Chaque définition de bloc (section BLOCKS) est convertie une seule fois, à sa
+première référence, en géométrie compacte (BlockGeometry : tableaux NumPy par
+groupe d'entités) mémorisée pour tout le fichier. Une référence n'est ensuite
+qu'une transformation affine de cette géométrie : un produit matriciel par
+groupe, quel que soit le nombre d'entités du bloc.
+
+Les blocs imbriqués sont aplatis dans la géométrie du bloc parent ; les
+références circulaires et les imbrications au-delà de MAX_BLOCK_DEPTH niveaux
+sont ignorées (avec un avertissement).
+
+Conventions DXF appliquées à chaque référence :
+  - les entités du calque "0" prennent le calque de la référence ;
+  - la couleur DUBLOC (0) et l'épaisseur DUBLOC (-2) prennent celles de la référence.
+
+Les transformations sont planes : à échelle non uniforme, cercles, arcs et
+textes gardent une forme circulaire (rayon multiplié par l'échelle moyenne).
+"""
+import logging
+import math
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Profondeur maximale d'imbrication des blocs
+MAX_BLOCK_DEPTH = 16
+
+# Nombre maximal d'occurrences développées pour une référence en tableau (MINSERT)
+MAX_ARRAY_INSTANCES = 10000
+
+BYBLOCK_COLOR = 0
+BYBLOCK_LINEWEIGHT = -2
+
+# Tableaux NumPy de chaque groupe ; les attributs (type, calque, couleur,
+# épaisseur, texte) sont des listes Python
+GROUP_ARRAYS = {
+    "polylines": ("coords", "bulges", "lengths", "closed"),
+    "lines": ("coords",),
+    "circles": ("center", "radius"),
+    "arcs": ("center", "radius", "start_angle", "end_angle"),
+    "texts": ("position", "height")
+}
+ATTRIBUTES = ("type", "layer", "color", "lineweight")
+GROUP_OF_TYPE = {
+    "POLYLINE": "polylines", "LWPOLYLINE": "polylines", "LINE": "lines",
+    "CIRCLE": "circles", "ARC": "arcs", "TEXT": "texts"
+}
+GROUP_TYPES = {group: [t for t, g in GROUP_OF_TYPE.items() if g == group] for group in GROUP_ARRAYS}
+ARRAY_SHAPES = {"coords": (0, 2), "center": (0, 2), "position": (0, 2)}
+
+
+def is_layout_block(name):
+    """Blocs des espaces objet et papier, dont les entités ne sont pas des définitions de bloc."""
+    name = name.lower()
+    return name.startswith("*model_space") or name.startswith("*paper_space")
+
+
+def _lineweight(entity):
+    return entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
+
+
+def _inherit(values, marker, value):
+    """Remplace marker par value dans la liste (copie seulement si nécessaire)."""
+    if value == marker or marker not in values:
+        return values
+    return [value if v == marker else v for v in values]
+
+
+class BlockGeometry:
+    """Géométrie aplatie d'un bloc ou d'une référence : un dictionnaire de colonnes par groupe."""
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    @staticmethod
+    def _empty_group(group):
+        data = {name: np.zeros(ARRAY_SHAPES.get(name, (0,))) for name in GROUP_ARRAYS[group]}
+        if group == "polylines":
+            data["lengths"] = np.zeros(0, dtype=np.int64)
+            data["closed"] = np.zeros(0, dtype=bool)
+        for name in ATTRIBUTES:
+            data[name] = []
+        if group == "texts":
+            data["text"] = []
+        return data
+
+    @classmethod
+    def from_entities(cls, entities):
+        """Géométrie des entités simples (hors INSERT) d'une définition de bloc."""
+        rows = {group: [] for group in GROUP_ARRAYS}
+        polyline_points = []
+        for entity in entities:
+            dxftype = entity.dxftype()
+            group = GROUP_OF_TYPE.get(dxftype)
+            if group is None:
+                continue
+            dxf = entity.dxf
+            attributes = (dxftype, dxf.layer, dxf.color, _lineweight(entity))
+            if group == "polylines":
+                if dxftype == "POLYLINE" and not (entity.is_2d_polyline or entity.is_3d_polyline):
+                    continue
+                if dxftype == "LWPOLYLINE":
+                    points = np.asarray(entity.get_points("xyb"), dtype=np.float64).reshape(-1, 3)
+                    closed = entity.closed
+                else:
+                    points = np.array(
+                        [(v.dxf.location[0], v.dxf.location[1], v.dxf.bulge) for v in entity.vertices],
+                        dtype=np.float64
+                    ).reshape(-1, 3)
+                    closed = entity.is_closed
+                polyline_points.append(points)
+                rows[group].append((attributes, closed))
+            elif group == "lines":
+                rows[group].append((attributes, (dxf.start[0], dxf.start[1], dxf.end[0], dxf.end[1])))
+            elif group == "circles":
+                rows[group].append((attributes, (dxf.center[0], dxf.center[1], dxf.radius)))
+            elif group == "arcs":
+                rows[group].append((attributes, (dxf.center[0], dxf.center[1], dxf.radius,
+                                                 dxf.start_angle, dxf.end_angle)))
+            else:
+                rows[group].append((attributes, (dxf.insert[0], dxf.insert[1], dxf.height), dxf.text))
+
+        groups = {}
+        for group, entries in rows.items():
+            data = cls._empty_group(group)
+            groups[group] = data
+            if not entries:
+                continue
+            for name, values in zip(ATTRIBUTES, zip(*(entry[0] for entry in entries))):
+                data[name] = list(values)
+            if group == "polylines":
+                points = np.concatenate(polyline_points)
+                data["coords"] = points[:, :2].copy()
+                data["bulges"] = points[:, 2].copy()
+                data["lengths"] = np.array([len(p) for p in polyline_points], dtype=np.int64)
+                data["closed"] = np.array([entry[1] for entry in entries], dtype=bool)
+                continue
+            values = np.array([entry[1] for entry in entries], dtype=np.float64)
+            if group == "lines":
+                data["coords"] = values.reshape(-1, 2)
+            elif group == "texts":
+                data["position"] = values[:, :2].copy()
+                data["height"] = values[:, 2].copy()
+                data["text"] = [entry[2] for entry in entries]
+            else:
+                data["center"] = values[:, :2].copy()
+                data["radius"] = values[:, 2].copy()
+                if group == "arcs":
+                    data["start_angle"] = values[:, 3].copy()
+                    data["end_angle"] = values[:, 4].copy()
+        return cls(groups)
+
+    @classmethod
+    def concatenate(cls, parts):
+        groups = {}
+        for group in GROUP_ARRAYS:
+            datas = [part.groups[group] for part in parts if part.groups[group]["type"]]
+            if not datas:
+                groups[group] = cls._empty_group(group)
+            elif len(datas) == 1:
+                groups[group] = datas[0]
+            else:
+                merged = {name: np.concatenate([data[name] for data in datas]) for name in GROUP_ARRAYS[group]}
+                for name in ATTRIBUTES + (("text",) if group == "texts" else ()):
+                    merged[name] = [value for data in datas for value in data[name]]
+                groups[group] = merged
+        return cls(groups)
+
+    def entity_count(self):
+        return sum(len(data["type"]) for data in self.groups.values())
+
+    def transformed(self, matrix, offset, layer, color, lineweight):
+        """Géométrie transformée (p -> matrix @ p + offset), attributs hérités de la référence."""
+        det = matrix[0, 0] * matrix[1, 1] - matrix[0, 1] * matrix[1, 0]
+        scale = math.sqrt(abs(det))
+        groups = {}
+        for group, data in self.groups.items():
+            if not data["type"]:
+                groups[group] = data
+                continue
+            out = dict(data)
+            if group in ("polylines", "lines"):
+                out["coords"] = data["coords"] @ matrix.T + offset
+                if group == "polylines" and det < 0:
+                    out["bulges"] = -data["bulges"]
+            elif group == "texts":
+                out["position"] = data["position"] @ matrix.T + offset
+                out["height"] = data["height"] * math.hypot(matrix[0, 1], matrix[1, 1])
+            else:
+                out["center"] = data["center"] @ matrix.T + offset
+                out["radius"] = data["radius"] * scale
+                if group == "arcs":
+                    start, end = _transform_angles(matrix, np.stack((data["start_angle"], data["end_angle"])))
+                    # Une symétrie inverse le sens de parcours de l'arc
+                    out["start_angle"], out["end_angle"] = (end, start) if det < 0 else (start, end)
+            out["layer"] = _inherit(data["layer"], "0", layer)
+            out["color"] = _inherit(data["color"], BYBLOCK_COLOR, color)
+            out["lineweight"] = _inherit(data["lineweight"], BYBLOCK_LINEWEIGHT, lineweight)
+            groups[group] = out
+        return BlockGeometry(groups)
+
+    def iter_serialized(self, types, block=None):
+        """Génère (clé du résultat, dictionnaire) au format de serialize_entity, pour les types demandés."""
+        for group, data in self.groups.items():
+            if not data["type"] or not any(dxftype in types for dxftype in GROUP_TYPES[group]):
+                continue
+            colors = data["color"]
+            if BYBLOCK_COLOR in colors:
+                colors = ['N/A' if color == BYBLOCK_COLOR else color for color in colors]
+            if group == "polylines":
+                coords = data["coords"].tolist()
+                ends = np.cumsum(data["lengths"]).tolist()
+                starts = [0] + ends[:-1]
+                fields = (
+                    {"vertices": [{"x": x, "y": y} for x, y in coords[start:end]], "closed": closed}
+                    for start, end, closed in zip(starts, ends, data["closed"].tolist())
+                )
+            elif group == "lines":
+                fields = (
+                    {"start": {"x": x1, "y": y1}, "end": {"x": x2, "y": y2}}
+                    for x1, y1, x2, y2 in data["coords"].reshape(-1, 4).tolist()
+                )
+            elif group == "circles":
+                fields = (
+                    {"center": {"x": x, "y": y}, "radius": r}
+                    for (x, y), r in zip(data["center"].tolist(), data["radius"].tolist())
+                )
+            elif group == "arcs":
+                fields = (
+                    {"center": {"x": x, "y": y}, "radius": r, "start_angle": a, "end_angle": b}
+                    for (x, y), r, a, b in zip(data["center"].tolist(), data["radius"].tolist(),
+                                               data["start_angle"].tolist(), data["end_angle"].tolist())
+                )
+            else:
+                fields = (
+                    {"text": text, "position": {"x": x, "y": y}, "height": h}
+                    for text, (x, y), h in zip(data["text"], data["position"].tolist(), data["height"].tolist())
+                )
+            for dxftype, layer, color, lineweight, values in zip(data["type"], data["layer"], colors,
+                                                                 data["lineweight"], fields):
+                if dxftype not in types:
+                    continue
+                entity = {"type": dxftype, "layer": layer}
+                entity.update(values)
+                entity["color"] = color
+                entity["lineweight"] = lineweight
+                if block is not None:
+                    entity["block"] = block
+                yield group, entity
+
+
+def _transform_angles(matrix, angles):
+    """Angles (degrés) des directions transformées par la partie linéaire matrix."""
+    radians = np.radians(angles)
+    cos, sin = np.cos(radians), np.sin(radians)
+    x = matrix[0, 0] * cos + matrix[0, 1] * sin
+    y = matrix[1, 0] * cos + matrix[1, 1] * sin
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def insert_transforms(insert, base):
+    """Transformations (matrice 2 x 2, décalage) des occurrences d'une référence de bloc.
+
+    Une référence en tableau (MINSERT) a une occurrence par ligne et colonne.
+    """
+    dxf = insert.dxf
+    angle = math.radians(dxf.rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+    xscale, yscale = dxf.xscale, dxf.yscale
+    # Repère objet inversé (extrusion vers -Z) : symétrie par rapport à l'axe Y
+    sign = -1.0 if dxf.extrusion[2] < 0 else 1.0
+    matrix = np.array([[sign * cos * xscale, -sign * sin * yscale], [sin * xscale, cos * yscale]])
+    x = dxf.insert[0] - (cos * xscale * base[0] - sin * yscale * base[1])
+    y = dxf.insert[1] - (sin * xscale * base[0] + cos * yscale * base[1])
+
+    rows = max(int(dxf.row_count), 1)
+    columns = max(int(dxf.column_count), 1)
+    if rows * columns == 1:
+        return [(matrix, np.array([sign * x, y]))]
+    if rows * columns > MAX_ARRAY_INSTANCES:
+        logger.warning("Référence en tableau de %s x %s occurrences limitée à %s",
+                       rows, columns, MAX_ARRAY_INSTANCES)
+    transforms = []
+    for index in range(min(rows * columns, MAX_ARRAY_INSTANCES)):
+        row, column = divmod(index, columns)
+        dx, dy = column * dxf.column_spacing, row * dxf.row_spacing
+        transforms.append((matrix, np.array([sign * (x + cos * dx - sin * dy), y + sin * dx + cos * dy])))
+    return transforms
+
+
+class BlockLibrary:
+    """Définitions de blocs d'un fichier et leur géométrie, calculée une fois par bloc."""
+
+    def __init__(self, max_depth=MAX_BLOCK_DEPTH):
+        self.max_depth = max_depth
+        self._definitions = {}
+        self._geometries = {}
+        self._building = []
+        self._truncated = set()
+
+    def add(self, block):
+        """Enregistre une définition ({"name", "base", "entities"}) lue dans la section BLOCKS."""
+        self._definitions[block["name"]] = block
+
+    def geometry(self, name):
+        """Géométrie aplatie du bloc name (dans son propre repère), ou None.
+
+        Seule une géométrie complète est mémorisée, avec son nombre de niveaux
+        d'imbrication : elle n'est resservie que là où ces niveaux tiennent sous
+        max_depth, sinon le bloc est recalculé, tronqué, pour cette référence.
+        """
+        if name in self._geometries:
+            geometry, height = self._geometries[name]
+            if len(self._building) + height <= self.max_depth:
+                return geometry
+        block = self._definitions.get(name)
+        if block is None:
+            logger.warning("Référence à un bloc inconnu : %s", name)
+            self._geometries[name] = (None, 0)
+            return None
+        if name in self._building:
+            logger.warning("Référence circulaire au bloc %s ignorée", name)
+            self._truncated.update(self._building)
+            return None
+        if len(self._building) >= self.max_depth:
+            logger.warning("Bloc %s ignoré : plus de %s niveaux d'imbrication", name, self.max_depth)
+            self._truncated.update(self._building)
+            return None
+
+        self._building.append(name)
+        height = 1
+        try:
+            parts = [BlockGeometry.from_entities(block["entities"])]
+            for entity in block["entities"]:
+                if entity.dxftype() == "INSERT":
+                    nested = self.expand(entity)
+                    if nested is not None:
+                        parts.append(nested)
+                    child = self._geometries.get(entity.dxf.name)
+                    if child is not None:
+                        height = max(height, child[1] + 1)
+        finally:
+            self._building.pop()
+        geometry = parts[0] if len(parts) == 1 else BlockGeometry.concatenate(parts)
+        if name in self._truncated:
+            # Une référence imbriquée a été coupée (cycle, profondeur) : résultat propre à cet endroit
+            self._truncated.discard(name)
+        else:
+            self._geometries[name] = (geometry, height)
+        return geometry
+
+    def expand(self, insert):
+        """Géométrie d'une référence de bloc (INSERT, tableau MINSERT compris), ou None si vide."""
+        name = insert.dxf.name
+        geometry = self.geometry(name)
+        if geometry is None or not geometry.entity_count():
+            return None
+        dxf = insert.dxf
+        instances = [
+            geometry.transformed(matrix, offset, dxf.layer, dxf.color, _lineweight(insert))
+            for matrix, offset in insert_transforms(insert, self._definitions[name]["base"])
+        ]
+        return instances[0] if len(instances) == 1 else BlockGeometry.concatenate(instances)
@@ -0,0 +1,348 @@
+"""Format binaire colonnaire des résultats d'extraction DXF.
+
+Le contenu est le même que celui de extract_file_data, mais chaque champ est
+stocké dans une colonne NumPy contiguë au lieu d'un dictionnaire par entité :
+
+    magic (8 octets)  b"GXCOL1\\0\\0"
+    uint32            longueur de l'en-tête JSON
+    en-tête JSON      UTF-8, complété par des espaces jusqu'à un multiple de 8
+    colonnes          tampons little-endian alignés sur 8 octets
+
+L'en-tête décrit chaque colonne ("polylines.coords", "lines.layer", ...) par son
+type, son décalage (depuis le début du contenu) et son nombre d'éléments. Le
+client les lit directement en Float64Array / Int32Array / Uint16Array, sans
+créer d'objet par sommet.
+
+Conventions :
+  - coords : x0, y0, x1, y1, ... ; "polylines.offsets" (n + 1 valeurs) donne
+    l'index du premier sommet de chaque polyligne ;
+  - layer / color / type : index dans les dictionnaires "layer_names",
+    "colors" et "polyline_types" de l'en-tête ;
+  - lineweight : int16, LINEWEIGHT_NULL quand la valeur est absente ;
+  - texts.text : octets UTF-8 concaténés, découpés par "texts.text_offsets" ;
+  - en mode "int32-delta", chaque colonne de coordonnées contient
+    round((v - origin) / quantum) encodé en différences successives par axe :
+    v = origin + cumsum(colonne) * quantum.
+"""
+import json
+import logging
+import struct
+from array import array
+import numpy as np
+from app.services.blocks import BlockLibrary
+from app.services.dxf_stream import iter_dxf
+from app.services.extraction_engine import EXTRACTED_TYPES, build_statistics, count_expanded
+from app.services.simplify import simplify_points
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_MIMETYPE = "application/vnd.gexpertise.columnar"
+MAGIC = b"GXCOL1\0\0"
+LINEWEIGHT_NULL = -32768
+POLYLINE_TYPES = ["POLYLINE", "LWPOLYLINE"]
+
+# Colonnes de coordonnées (couples x, y) concernées par la quantification
+COORD_COLUMNS = ("polylines.coords", "lines.coords", "circles.center", "arcs.center", "texts.position")
+
+INT32_MAX = 2 ** 31 - 1
+
+
+class ColumnarBuilder:
+    """Accumule les entités DXF directement dans des colonnes typées.
+
+    tolerance, si fournie, simplifie les polylignes (Douglas–Peucker). Les
+    références de blocs (INSERT) sont développées en entités (voir blocks).
+    """
+
+    def __init__(self, tolerance=None):
+        self.tolerance = tolerance
+        self.blocks = BlockLibrary()
+        self.layers = []
+        self.layer_index = {}
+        self.color_index = {}
+        self.colors = []
+        self.polyline_parts = []
+        self.columns = {
+            "polylines.type": array("B"),
+            "polylines.layer": array("I"),
+            "polylines.color": array("I"),
+            "polylines.lineweight": array("i"),
+            "polylines.closed": array("B"),
+            "polylines.offsets": array("Q", [0]),
+            "lines.layer": array("I"),
+            "lines.color": array("I"),
+            "lines.lineweight": array("i"),
+            "lines.coords": array("d"),
+            "circles.layer": array("I"),
+            "circles.color": array("I"),
+            "circles.lineweight": array("i"),
+            "circles.center": array("d"),
+            "circles.radius": array("d"),
+            "arcs.layer": array("I"),
+            "arcs.color": array("I"),
+            "arcs.lineweight": array("i"),
+            "arcs.center": array("d"),
+            "arcs.radius": array("d"),
+            "arcs.start_angle": array("d"),
+            "arcs.end_angle": array("d"),
+            "texts.layer": array("I"),
+            "texts.color": array("I"),
+            "texts.lineweight": array("i"),
+            "texts.position": array("d"),
+            "texts.height": array("d"),
+            "texts.text_offsets": array("Q", [0])
+        }
+        self.text_data = bytearray()
+        self.vertex_count = 0
+        self.end = {"total_entities": 0, "type_counts": {}}
+        self.expanded = {}
+
+    def _layer(self, name):
+        index = self.layer_index.get(name)
+        if index is None:
+            index = self.layer_index[name] = len(self.layer_index)
+        return index
+
+    def _color(self, entity):
+        return self._color_value(entity.dxf.color)
+
+    def _color_value(self, color):
+        color = color if color != 0 else "N/A"
+        index = self.color_index.get(color)
+        if index is None:
+            index = self.color_index[color] = len(self.colors)
+            self.colors.append(color)
+        return index
+
+    @staticmethod
+    def _lineweight(entity):
+        return entity.dxf.lineweight if hasattr(entity.dxf, "lineweight") else LINEWEIGHT_NULL
+
+    def _common(self, group, entity):
+        columns = self.columns
+        columns[f"{group}.layer"].append(self._layer(entity.dxf.layer))
+        columns[f"{group}.color"].append(self._color(entity))
+        columns[f"{group}.lineweight"].append(self._lineweight(entity))
+
+    def add_layer(self, layer):
+        self._layer(layer["name"])
+        self.layers.append(layer)
+
+    def _add_polyline(self, points, closed):
+        if self.tolerance:
+            points = simplify_points(points, self.tolerance, closed)
+        self.polyline_parts.append(points)
+        self.vertex_count += len(points)
+        self.columns["polylines.offsets"].append(self.vertex_count)
+
+    def add_geometry(self, geometry):
+        """Ajoute la géométrie développée d'une référence de bloc, colonne par colonne."""
+        columns = self.columns
+        for group, data in geometry.groups.items():
+            if not data["type"]:
+                continue
+            columns[f"{group}.layer"].extend(self._layer(name) for name in data["layer"])
+            columns[f"{group}.color"].extend(self._color_value(color) for color in data["color"])
+            columns[f"{group}.lineweight"].extend(
+                LINEWEIGHT_NULL if lineweight is None else lineweight for lineweight in data["lineweight"]
+            )
+            if group == "polylines":
+                columns["polylines.type"].extend(POLYLINE_TYPES.index(dxftype) for dxftype in data["type"])
+                columns["polylines.closed"].extend(data["closed"].astype(np.uint8).tolist())
+                ends = np.cumsum(data["lengths"]).tolist()
+                for start, end, closed in zip([0] + ends[:-1], ends, data["closed"].tolist()):
+                    self._add_polyline(data["coords"][start:end], closed)
+            elif group == "lines":
+                columns["lines.coords"].frombytes(data["coords"].tobytes())
+            elif group == "texts":
+                columns["texts.position"].frombytes(data["position"].tobytes())
+                columns["texts.height"].frombytes(data["height"].tobytes())
+                for text in data["text"]:
+                    self.text_data += text.encode("utf-8", errors="surrogateescape")
+                    columns["texts.text_offsets"].append(len(self.text_data))
+            else:
+                columns[f"{group}.center"].frombytes(data["center"].tobytes())
+                columns[f"{group}.radius"].frombytes(data["radius"].tobytes())
+                if group == "arcs":
+                    columns["arcs.start_angle"].frombytes(data["start_angle"].tobytes())
+                    columns["arcs.end_angle"].frombytes(data["end_angle"].tobytes())
+
+    def add_entity(self, entity):
+        dxftype = entity.dxftype()
+        columns = self.columns
+        if dxftype == "INSERT":
+            geometry = self.blocks.expand(entity)
+            if geometry is not None:
+                self.add_geometry(geometry)
+                count_expanded(self.expanded, geometry)
+        elif dxftype in ("POLYLINE", "LWPOLYLINE"):
+            if dxftype == "POLYLINE":
+                points = np.array([(v[0], v[1]) for v in entity.points()], dtype=np.float64).reshape(-1, 2)
+                closed = entity.is_closed
+            else:
+                points = np.asarray(entity.get_points("xy"), dtype=np.float64).reshape(-1, 2)
+                closed = entity.closed
+            self._common("polylines", entity)
+            columns["polylines.type"].append(POLYLINE_TYPES.index(dxftype))
+            columns["polylines.closed"].append(1 if closed else 0)
+            self._add_polyline(points, closed)
+        elif dxftype == "LINE":
+            self._common("lines", entity)
+            start, end = entity.dxf.start, entity.dxf.end
+            columns["lines.coords"].extend((start[0], start[1], end[0], end[1]))
+        elif dxftype == "CIRCLE":
+            self._common("circles", entity)
+            center = entity.dxf.center
+            columns["circles.center"].extend((center[0], center[1]))
+            columns["circles.radius"].append(entity.dxf.radius)
+        elif dxftype == "ARC":
+            self._common("arcs", entity)
+            center = entity.dxf.center
+            columns["arcs.center"].extend((center[0], center[1]))
+            columns["arcs.radius"].append(entity.dxf.radius)
+            columns["arcs.start_angle"].append(entity.dxf.start_angle)
+            columns["arcs.end_angle"].append(entity.dxf.end_angle)
+        elif dxftype == "TEXT":
+            self._common("texts", entity)
+            insert = entity.dxf.insert
+            columns["texts.position"].extend((insert[0], insert[1]))
+            columns["texts.height"].append(entity.dxf.height)
+            self.text_data += entity.dxf.text.encode("utf-8", errors="surrogateescape")
+            columns["texts.text_offsets"].append(len(self.text_data))
+
+    def statistics(self):
+        return build_statistics(len(self.layers), self.end, self.expanded)
+
+    def to_arrays(self):
+        """Convertit les colonnes accumulées en tableaux NumPy compacts."""
+        layer_dtype = np.uint16 if len(self.layer_index) <= 0xFFFF else np.uint32
+        color_dtype = np.uint16 if len(self.colors) <= 0xFFFF else np.uint32
+        offset_dtype = np.uint32 if max(self.vertex_count, len(self.text_data)) <= 0xFFFFFFFF else np.uint64
+
+        arrays = {}
+        for name, values in self.columns.items():
+            data = np.frombuffer(values, dtype=values.typecode) if len(values) else np.zeros(0, values.typecode)
+            field = name.split(".", 1)[1]
+            if field == "layer":
+                data = data.astype(layer_dtype)
+            elif field == "color":
+                data = data.astype(color_dtype)
+            elif field == "lineweight":
+                data = data.astype(np.int16)
+            elif field in ("offsets", "text_offsets"):
+                data = data.astype(offset_dtype)
+            arrays[name] = data
+
+        if self.polyline_parts:
+            arrays["polylines.coords"] = np.concatenate(self.polyline_parts).ravel()
+        else:
+            arrays["polylines.coords"] = np.zeros(0, np.float64)
+        arrays["texts.text"] = np.frombuffer(bytes(self.text_data), dtype=np.uint8)
+        return arrays
+
+
+def _quantize(arrays, quantum):
+    """Remplace les colonnes de coordonnées par des deltas int32 quantifiés.
+
+    Retourne l'origine utilisée, ou None si la plage de valeurs ne tient pas en int32.
+    """
+    non_empty = [arrays[name].reshape(-1, 2) for name in COORD_COLUMNS if len(arrays[name])]
+    if not non_empty:
+        return [0.0, 0.0]
+    origin = np.min([part.min(axis=0) for part in non_empty], axis=0)
+
+    quantized = {}
+    for name in COORD_COLUMNS:
+        pairs = arrays[name].reshape(-1, 2)
+        steps = np.rint((pairs - origin) / quantum)
+        if len(steps) and np.abs(steps).max() > INT32_MAX:
+            return None
+        steps = steps.astype(np.int64)
+        deltas = np.diff(steps, axis=0, prepend=np.zeros((1, 2), np.int64))
+        if len(deltas) and np.abs(deltas).max() > INT32_MAX:
+            return None
+        quantized[name] = deltas.astype(np.int32).ravel()
+
+    arrays.update(quantized)
+    return origin.tolist()
+
+
+def encode_columnar(builder, quantum=None):
+    """Sérialise un ColumnarBuilder rempli au format binaire colonnaire."""
+    arrays = builder.to_arrays()
+    header = {
+        "version": 1,
+        "coords": "float64",
+        "layers": builder.layers,
+        "layer_names": list(builder.layer_index),
+        "colors": builder.colors,
+        "polyline_types": POLYLINE_TYPES,
+        "lineweight_null": LINEWEIGHT_NULL,
+        "statistics": builder.statistics()
+    }
+    if quantum:
+        origin = _quantize(arrays, quantum)
+        if origin is None:
+            logger.warning("Quantification impossible avec un pas de %s, coordonnées en float64", quantum)
+        else:
+            header.update({"coords": "int32-delta", "quantum": quantum, "origin": origin})
+
+    return pack_columns(header, arrays)
+
+
+def pack_columns(header, arrays):
+    """Assemble un en-tête JSON et des tableaux NumPy au format colonnaire.
+
+    Utilisé pour les résultats d'extraction comme pour les index spatiaux ;
+    decode_columnar relit l'un comme l'autre.
+    """
+    columns = {}
+    offset = 0
+    for name, data in arrays.items():
+        data = data.astype(data.dtype.newbyteorder("<"), copy=False)
+        columns[name] = {"dtype": data.dtype.name, "offset": offset, "count": int(data.size)}
+        offset += -(-data.nbytes // 8) * 8
+    header = dict(header, columns=columns)
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % 8)
+    parts = [MAGIC, struct.pack("<I", len(header_bytes)), header_bytes]
+    for data in arrays.values():
+        raw = data.astype(data.dtype.newbyteorder("<"), copy=False).tobytes()
+        parts.append(raw)
+        parts.append(b"\0" * (-len(raw) % 8))
+    return b"".join(parts)
+
+
+def decode_columnar(payload):
+    """Décode un contenu colonnaire : retourne (en-tête, {colonne: tableau NumPy}).
+
+    Les tableaux sont des vues sur le contenu (bytes ou mmap), sans copie.
+    """
+    if payload[:len(MAGIC)] != MAGIC:
+        raise ValueError("Format colonnaire invalide")
+    (header_len,) = struct.unpack_from("<I", payload, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(payload[start:start + header_len])
+    body = start + header_len
+    arrays = {
+        name: np.frombuffer(payload, dtype=np.dtype(column["dtype"]).newbyteorder("<"),
+                            count=column["count"], offset=body + column["offset"])
+        for name, column in header["columns"].items()
+    }
+    return header, arrays
+
+
+def extract_columnar(stream, quantum=None, types=EXTRACTED_TYPES, tolerance=None):
+    """Extrait un flux DXF binaire directement au format colonnaire."""
+    builder = ColumnarBuilder(tolerance)
+    for kind, value in iter_dxf(stream, types=(*types, "INSERT")):
+        if kind == "layer":
+            builder.add_layer(value)
+        elif kind == "block":
+            builder.blocks.add(value)
+        elif kind == "entity":
+            builder.add_entity(value)
+        else:
+            builder.end = value
+    return encode_columnar(builder, quantum)
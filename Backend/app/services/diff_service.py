@@ -0,0 +1,342 @@
+"""Comparaison géométrique de deux révisions d'un plan DXF.
+
+Chaque entité reçoit une clé de géométrie normalisée : coordonnées arrondies à
+la précision demandée, contours fermés ramenés à leur plus petit sommet et à
+un sens de parcours canonique, polylignes ouvertes et lignes orientées. Cette
+clé se décompose en une forme (géométrie relative à un point d'ancrage) et
+l'ancrage lui-même.
+
+L'appariement se fait en temps linéaire, par tables de hachage puis par grille :
+
+  0. JSON identique dans les index spatiaux des deux révisions : entité
+     inchangée, sans même la décoder (cas de loin le plus fréquent) ;
+  1. clé complète identique (géométrie et attributs) : entité inchangée ;
+  2. même géométrie, attributs différents : entité modifiée (attributs) ;
+  3. même forme et mêmes attributs, ancrage proche : entité déplacée ;
+  4. même type et même calque, emprise proche : géométrie modifiée ;
+  5. le reste est ajouté (nouvelle révision) ou supprimé (ancienne révision).
+
+Les étapes 3 et 4 recherchent le candidat le plus proche dans les cellules
+voisines d'une grille de pas match_distance. L'écart de surface par calque
+(polylignes fermées et cercles) ne dépend que des entités non appariées à
+l'étape 0.
+"""
+import json
+import math
+from collections import defaultdict
+import numpy as np
+from app.services.extraction_engine import ENTITY_GROUPS
+from app.services.spatial_service import entity_bbox, GROUPS
+
+# Précision par défaut de comparaison des coordonnées, en unités du dessin
+DEFAULT_PRECISION = 1e-6
+
+# Distance d'appariement par défaut, en fraction de la diagonale de l'emprise des deux révisions
+MATCH_DISTANCE_RATIO = 0.01
+
+ATTRIBUTES = ("type", "layer", "color", "lineweight")
+
+
+def _quantize(value, precision):
+    return round(value / precision)
+
+
+def _path_shape(points, closed):
+    """Forme normalisée d'une suite de sommets arrondis : (forme, ancrage)."""
+    if closed:
+        if len(points) > 1 and points[0] == points[-1]:
+            points = points[:-1]
+        start = points.index(min(points))
+        forward = points[start:] + points[:start]
+        backward = forward[:1] + forward[:0:-1]
+        points = min(forward, backward)
+    else:
+        points = min(points, points[::-1])
+    ax, ay = points[0]
+    return tuple((x - ax, y - ay) for x, y in points), (ax, ay)
+
+
+def normalize(group, entity, precision):
+    """Retourne (forme, ancrage) de la géométrie normalisée d'une entité sérialisée."""
+    if group == "polylines":
+        points = [(_quantize(v["x"], precision), _quantize(v["y"], precision)) for v in entity["vertices"]]
+        if not points:
+            return ("polyline",), (0, 0)
+        shape, anchor = _path_shape(points, entity["closed"])
+        return ("polyline", entity["closed"], shape), anchor
+    if group == "lines":
+        shape, anchor = _path_shape([
+            (_quantize(entity["start"]["x"], precision), _quantize(entity["start"]["y"], precision)),
+            (_quantize(entity["end"]["x"], precision), _quantize(entity["end"]["y"], precision))
+        ], False)
+        return ("line", shape), anchor
+    anchor_point = entity["position"] if group == "texts" else entity["center"]
+    anchor = (_quantize(anchor_point["x"], precision), _quantize(anchor_point["y"], precision))
+    if group == "circles":
+        return ("circle", _quantize(entity["radius"], precision)), anchor
+    if group == "arcs":
+        return ("arc", _quantize(entity["radius"], precision),
+                round(entity["start_angle"] % 360.0, 6), round(entity["end_angle"] % 360.0, 6)), anchor
+    return ("text", entity["text"], _quantize(entity["height"] or 0.0, precision)), anchor
+
+
+class _Revision:
+    """Entités d'une révision avec leurs clés normalisées, emprises et centres."""
+
+    def __init__(self, result, precision):
+        self.entities = []
+        self.shapes = []
+        self.anchors = []
+        self.attributes = []
+        self.bboxes = []
+        for group in ENTITY_GROUPS:
+            for entity in result.get(group, ()):
+                shape, anchor = normalize(group, entity, precision)
+                self.entities.append(entity)
+                self.shapes.append(shape)
+                self.anchors.append(anchor)
+                self.attributes.append(tuple(entity.get(name) for name in ATTRIBUTES))
+                bbox = entity_bbox(group, entity)
+                self.bboxes.append(bbox if bbox is not None else (0.0, 0.0, 0.0, 0.0))
+
+    def center(self, index):
+        minx, miny, maxx, maxy = self.bboxes[index]
+        return (minx + maxx) / 2, (miny + maxy) / 2
+
+    def extent(self):
+        if not self.bboxes:
+            return None
+        bboxes = np.asarray(self.bboxes)
+        return (*bboxes[:, :2].min(axis=0), *bboxes[:, 2:].max(axis=0))
+
+
+def _match_exact(old_ids, new_ids, old_key, new_key):
+    """Apparie par clé identique (multiensemble) : retourne (paires, anciens restants, nouveaux restants)."""
+    buckets = defaultdict(list)
+    for i in old_ids:
+        buckets[old_key(i)].append(i)
+    pairs = []
+    remaining_new = []
+    for j in new_ids:
+        bucket = buckets.get(new_key(j))
+        if bucket:
+            pairs.append((bucket.pop(), j))
+        else:
+            remaining_new.append(j)
+    matched = {i for i, _ in pairs}
+    return pairs, [i for i in old_ids if i not in matched], remaining_new
+
+
+def _match_nearby(old_ids, new_ids, old_key, new_key, old_point, new_point, distance):
+    """Apparie chaque nouvelle entité à l'ancienne de même clé la plus proche, à moins de distance.
+
+    Les anciennes entités sont rangées dans une grille de pas distance : seules
+    les 9 cellules autour du point recherché sont parcourues.
+    """
+    if distance <= 0:
+        return [], old_ids, new_ids
+    grid = defaultdict(list)
+    for i in old_ids:
+        x, y = old_point(i)
+        grid[(old_key(i), math.floor(x / distance), math.floor(y / distance))].append(i)
+    matched = set()
+    pairs = []
+    remaining_new = []
+    limit = distance * distance
+    for j in new_ids:
+        key = new_key(j)
+        x, y = new_point(j)
+        cx, cy = math.floor(x / distance), math.floor(y / distance)
+        best, best_distance = None, limit
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for i in grid.get((key, cx + dx, cy + dy), ()):
+                    if i in matched:
+                        continue
+                    ox, oy = old_point(i)
+                    d = (ox - x) ** 2 + (oy - y) ** 2
+                    if d <= best_distance:
+                        best, best_distance = i, d
+        if best is None:
+            remaining_new.append(j)
+        else:
+            matched.add(best)
+            pairs.append((best, j))
+    return pairs, [i for i in old_ids if i not in matched], remaining_new
+
+
+def _changed_attributes(old, new, i, j):
+    return [name for name, a, b in zip(ATTRIBUTES, old.attributes[i], new.attributes[j]) if a != b]
+
+
+def layer_areas(result):
+    """Surface totale par calque des polylignes fermées et des cercles."""
+    areas = defaultdict(float)
+    lengths = []
+    layers = []
+    coords = []
+    for polyline in result.get("polylines", ()):
+        vertices = polyline["vertices"]
+        if not polyline["closed"] or len(vertices) < 3:
+            continue
+        lengths.append(len(vertices))
+        layers.append(polyline["layer"])
+        coords.extend((v["x"], v["y"]) for v in vertices)
+    if lengths:
+        points = np.asarray(coords, dtype=np.float64)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        following = np.arange(1, len(points) + 1)
+        following[np.cumsum(lengths) - 1] = starts
+        # Formule du lacet, contour par contour
+        cross = points[:, 0] * points[following, 1] - points[following, 0] * points[:, 1]
+        for layer, area in zip(layers, np.abs(np.add.reduceat(cross, starts)) / 2):
+            areas[layer] += float(area)
+    for circle in result.get("circles", ()):
+        areas[circle["layer"]] += math.pi * circle["radius"] ** 2
+    return areas
+
+
+def diff_results(old_result, new_result, precision=DEFAULT_PRECISION, match_distance=None):
+    """Compare deux résultats d'extraction complets (ancienne puis nouvelle révision).
+
+    match_distance (unités du dessin) borne la distance d'appariement des
+    entités déplacées ou modifiées ; par défaut MATCH_DISTANCE_RATIO de la
+    diagonale de l'emprise des deux révisions.
+    """
+    old = _Revision(old_result, precision)
+    new = _Revision(new_result, precision)
+
+    if match_distance is None:
+        extents = [extent for extent in (old.extent(), new.extent()) if extent is not None]
+        if extents:
+            extents = np.asarray(extents)
+            minx, miny = extents[:, :2].min(axis=0)
+            maxx, maxy = extents[:, 2:].max(axis=0)
+            match_distance = float(math.hypot(maxx - minx, maxy - miny)) * MATCH_DISTANCE_RATIO
+        else:
+            match_distance = 0.0
+
+    old_ids = list(range(len(old.entities)))
+    new_ids = list(range(len(new.entities)))
+
+    # 1. Inchangées : géométrie et attributs identiques
+    unchanged, old_ids, new_ids = _match_exact(
+        old_ids, new_ids,
+        lambda i: (old.shapes[i], old.anchors[i], old.attributes[i]),
+        lambda j: (new.shapes[j], new.anchors[j], new.attributes[j])
+    )
+    modified = []
+
+    # 2. Même géométrie, attributs modifiés
+    pairs, old_ids, new_ids = _match_exact(
+        old_ids, new_ids,
+        lambda i: (old.shapes[i], old.anchors[i]),
+        lambda j: (new.shapes[j], new.anchors[j])
+    )
+    for i, j in pairs:
+        modified.append({"changes": _changed_attributes(old, new, i, j), "old": old.entities[i], "new": new.entities[j]})
+
+    # 3. Déplacées : même forme et mêmes attributs, ancrage proche
+    scale = precision
+    pairs, old_ids, new_ids = _match_nearby(
+        old_ids, new_ids,
+        lambda i: (old.shapes[i], old.attributes[i]),
+        lambda j: (new.shapes[j], new.attributes[j]),
+        lambda i: (old.anchors[i][0] * scale, old.anchors[i][1] * scale),
+        lambda j: (new.anchors[j][0] * scale, new.anchors[j][1] * scale),
+        match_distance
+    )
+    for i, j in pairs:
+        modified.append({
+            "changes": ["position"],
+            "offset": {"dx": (new.anchors[j][0] - old.anchors[i][0]) * scale,
+                       "dy": (new.anchors[j][1] - old.anchors[i][1]) * scale},
+            "old": old.entities[i],
+            "new": new.entities[j]
+        })
+
+    # 4. Géométrie modifiée : même type et même calque, emprise proche
+    pairs, old_ids, new_ids = _match_nearby(
+        old_ids, new_ids,
+        lambda i: old.attributes[i][:2],
+        lambda j: new.attributes[j][:2],
+        old.center, new.center,
+        match_distance
+    )
+    for i, j in pairs:
+        modified.append({
+            "changes": ["geometry"] + _changed_attributes(old, new, i, j),
+            "old": old.entities[i],
+            "new": new.entities[j]
+        })
+
+    # Surfaces avant / après des entités modifiées, ajoutées ou supprimées
+    old_areas = layer_areas(old_result)
+    new_areas = layer_areas(new_result)
+    areas = {
+        layer: {
+            "before": old_areas.get(layer, 0.0),
+            "after": new_areas.get(layer, 0.0),
+            "delta": new_areas.get(layer, 0.0) - old_areas.get(layer, 0.0)
+        }
+        for layer in sorted(set(old_areas) | set(new_areas))
+    }
+
+    return {
+        "summary": {
+            "unchanged": len(unchanged),
+            "added": len(new_ids),
+            "removed": len(old_ids),
+            "modified": len(modified),
+            "precision": precision,
+            "match_distance": match_distance
+        },
+        "added": [new.entities[j] for j in new_ids],
+        "removed": [old.entities[i] for i in old_ids],
+        "modified": modified,
+        "layer_areas": areas
+    }
+
+
+def _entity_keys(index):
+    """JSON compact de chaque entité d'un index spatial (clé d'égalité exacte)."""
+    raw = index.json.tobytes()
+    offsets = index.json_offsets.tolist()
+    return [raw[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def _decode_entities(index, keys, ids):
+    """Résultat d'extraction (par groupe) reconstruit pour les seules entités ids."""
+    result = {group: [] for group in GROUPS}
+    groups = index.groups.tolist()
+    for entity_id in ids:
+        result[GROUPS[groups[entity_id]]].append(json.loads(keys[entity_id]))
+    return result
+
+
+def diff_indexes(old_index, new_index, precision=DEFAULT_PRECISION, match_distance=None):
+    """Compare deux révisions à partir de leurs index spatiaux (voir spatial_service).
+
+    Les entités au JSON identique sont appariées sans être décodées ; seules
+    les autres passent par diff_results.
+    """
+    old_keys = _entity_keys(old_index)
+    new_keys = _entity_keys(new_index)
+    unchanged, old_ids, new_ids = _match_exact(
+        range(len(old_keys)), range(len(new_keys)), old_keys.__getitem__, new_keys.__getitem__
+    )
+
+    if match_distance is None:
+        extents = np.asarray([index.header["extent"] for index in (old_index, new_index) if len(index.groups)])
+        match_distance = 0.0
+        if len(extents):
+            minx, miny = extents[:, :2].min(axis=0)
+            maxx, maxy = extents[:, 2:].max(axis=0)
+            match_distance = float(math.hypot(maxx - minx, maxy - miny)) * MATCH_DISTANCE_RATIO
+
+    diff = diff_results(
+        _decode_entities(old_index, old_keys, old_ids), _decode_entities(new_index, new_keys, new_ids),
+        precision, match_distance
+    )
+    diff["summary"]["unchanged"] += len(unchanged)
+    return diff
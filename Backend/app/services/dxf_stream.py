@@ -0,0 +1,255 @@
+import logging
+from ezdxf.addons.iterdxf import binary_tagger, SUPPORTED_TYPES
+from ezdxf.document import Drawing
+from ezdxf.entities import factory
+from ezdxf.entities.subentity import entity_linker
+from ezdxf.lldxf.const import DXFStructureError
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import tag_compiler, binary_tags_loader
+from ezdxf.lldxf.types import DXFTag
+from ezdxf.tools.codepage import toencoding
+from app.services.blocks import is_layout_block
+
+logger = logging.getLogger(__name__)
+
+# Entités rattachées à une entité parente : elles ne comptent pas dans le modelspace
+LINKED_TYPES = {"VERTEX", "SEQEND", "ATTRIB"}
+
+# En-tête des fichiers DXF binaires, qui ne peuvent pas être lus en flux
+BINARY_DXF_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+
+# Épaisseur de trait par défaut d'un calque (LINEWEIGHT_DEFAULT dans ezdxf)
+DEFAULT_LAYER_LINEWEIGHT = -3
+
+
+def requested_types(types=None):
+    """Retourne l'ensemble des types DXF à charger, entités liées comprises.
+
+    types=None charge tous les types pris en charge, un ensemble vide aucun.
+    """
+    if types is None:
+        return set(SUPPORTED_TYPES)
+    requested = SUPPORTED_TYPES.intersection(t.upper() for t in types)
+    if "POLYLINE" in requested:
+        requested.update(("VERTEX", "SEQEND"))
+    if "INSERT" in requested:
+        requested.update(("ATTRIB", "SEQEND"))
+    return requested
+
+
+def _read_header(stream):
+    """Lit la section HEADER pour en déduire l'encodage et la version.
+
+    Retourne aussi le nom de la première section suivante, déjà consommée.
+    """
+    encoding = "cp1252"
+    version = "AC1009"
+    fetch_header_var = None
+    prev_code = -1
+    for code, value in binary_tagger(stream):
+        if code == 0 and value == b"EOF":
+            return encoding, version, None
+        if code == 2 and prev_code == 0 and value != b"HEADER":
+            if version >= "AC1021":
+                encoding = "utf-8"
+            return encoding, version, value.decode("ascii", errors="ignore")
+        if code == 9 and value == b"$DWGCODEPAGE":
+            fetch_header_var = "ENCODING"
+        elif code == 9 and value == b"$ACADVER":
+            fetch_header_var = "VERSION"
+        elif fetch_header_var == "ENCODING":
+            encoding = toencoding(value.decode())
+            fetch_header_var = None
+        elif fetch_header_var == "VERSION":
+            version = value.decode()
+            fetch_header_var = None
+        prev_code = code
+    raise DXFStructureError("Fichier DXF incomplet")
+
+
+# Tag ajouté après les tags d'une entité : tag_compiler lit un tag d'avance
+# après chaque point et perdrait sinon un point placé en dernier
+END_OF_ENTITY = DXFTag(0, "EOF")
+
+
+def _load_entity(tags):
+    """Entité ezdxf construite à partir de ses tags bruts."""
+    compiled = list(tag_compiler(iter([*tags, END_OF_ENTITY])))
+    compiled.pop()
+    return factory.load(ExtendedTags(compiled))
+
+
+def _block_header(tags):
+    """Nom et point de base d'une définition de bloc (tags bruts de l'entité BLOCK)."""
+    name = ""
+    base = [0.0, 0.0]
+    for tag in tags[1:]:
+        if tag.code == 2 and not name:
+            name = tag.value
+        elif tag.code == 10:
+            base[0] = float(tag.value)
+        elif tag.code == 20:
+            base[1] = float(tag.value)
+    return {"name": name, "base": tuple(base), "entities": []}
+
+
+def _iter_document(doc, wanted):
+    """Équivalent de iter_dxf pour un document déjà chargé (DXF binaire)."""
+    if "INSERT" in wanted:
+        for block in doc.blocks:
+            if not is_layout_block(block.name):
+                yield "block", {
+                    "name": block.name,
+                    "base": (block.base_point[0], block.base_point[1]),
+                    "entities": [entity for entity in block if entity.dxftype() in wanted]
+                }
+    for layer in doc.layers:
+        if layer.dxf.name.startswith("*"):
+            continue
+        yield "layer", {
+            "name": layer.dxf.name,
+            "color": layer.dxf.color if layer.dxf.color != 0 else "N/A",
+            "lineweight": layer.dxf.lineweight if hasattr(layer.dxf, "lineweight") else None
+        }
+
+    type_counts = {}
+    modelspace = doc.modelspace()
+    for entity in modelspace:
+        dxftype = entity.dxftype()
+        type_counts[dxftype] = type_counts.get(dxftype, 0) + 1
+        if dxftype in wanted:
+            yield "entity", entity
+    yield "end", {"total_entities": len(modelspace), "type_counts": type_counts}
+
+
+def iter_dxf(stream, types=None, errors="surrogateescape"):
+    """Parcourt un flux DXF binaire en une seule passe, à mémoire bornée.
+
+    Génère des couples (genre, valeur) :
+      - ("layer", {"name", "color", "lineweight"}) pour chaque calque de la table LAYER
+      - ("block", {"name", "base", "entities"}) pour chaque définition de bloc,
+        seulement si le type INSERT est demandé : entités des types demandés
+        et point de base (x, y)
+      - ("entity", entité ezdxf) pour chaque entité du modelspace dont le type est demandé
+      - ("end", {"total_entities", "type_counts"}) en dernier, avec le nombre
+        d'entités du modelspace par type
+
+    Seules les entités des types demandés sont construites (types=None : toutes) ;
+    les autres ne sont que comptées, sans même décoder leurs coordonnées. Le
+    document complet n'est jamais chargé en mémoire, sauf pour les DXF binaires.
+    """
+    wanted = requested_types(types)
+
+    position = stream.tell()
+    if stream.read(len(BINARY_DXF_SENTINEL)) == BINARY_DXF_SENTINEL:
+        stream.seek(position)
+        doc = Drawing.load(binary_tags_loader(stream.read(), errors=errors))
+        yield from _iter_document(doc, wanted)
+        return
+    stream.seek(position)
+
+    encoding, version, section = _read_header(stream)
+    has_lineweight = version > "AC1009"
+
+    total_entities = 0
+    type_counts = {}
+    queued = None
+    linked_entity = entity_linker()
+    tags = []
+    layer = None
+    block = None
+    block_queued = None
+    block_linked_entity = entity_linker()
+    prev_code = 0
+    prev_value = "SECTION"
+
+    if section is None:
+        yield "end", {"total_entities": 0, "type_counts": type_counts}
+        return
+
+    # Les tags restent bruts (chaînes) : seuls ceux des entités chargées sont compilés
+    for tag in binary_tagger(stream, encoding, errors):
+        code = tag.code
+        value = tag.value
+
+        if section == "ENTITIES":
+            if code == 0:
+                if tags:
+                    dxftype = tags[0].value
+                    in_modelspace = not any(t.code == 67 and t.value.strip() == "1" for t in tags)
+                    if in_modelspace and dxftype not in LINKED_TYPES:
+                        total_entities += 1
+                        type_counts[dxftype] = type_counts.get(dxftype, 0) + 1
+                    if dxftype in wanted:
+                        entity = _load_entity(tags)
+                        if not linked_entity(entity) and entity.dxf.paperspace == 0:
+                            # Une entité reste en attente pour rattacher ses VERTEX/ATTRIB
+                            if queued is not None:
+                                yield "entity", queued
+                            queued = entity
+                if value == "ENDSEC":
+                    if queued is not None:
+                        yield "entity", queued
+                    yield "end", {"total_entities": total_entities, "type_counts": type_counts}
+                    return
+                tags = [tag]
+            else:
+                tags.append(tag)
+            continue
+
+        if section == "BLOCKS" and "INSERT" in wanted:
+            if code == 0:
+                if tags:
+                    dxftype = tags[0].value
+                    if dxftype == "BLOCK":
+                        block = _block_header(tags)
+                    elif dxftype == "ENDBLK":
+                        if block is not None:
+                            if block_queued is not None:
+                                block["entities"].append(block_queued)
+                            if not is_layout_block(block["name"]):
+                                yield "block", block
+                        block = None
+                        block_queued = None
+                    elif dxftype in wanted and block is not None:
+                        entity = _load_entity(tags)
+                        if not block_linked_entity(entity):
+                            if block_queued is not None:
+                                block["entities"].append(block_queued)
+                            block_queued = entity
+                # Les marqueurs de section ne sont jamais des entités
+                tags = [] if value in ("SECTION", "ENDSEC") else [tag]
+            else:
+                tags.append(tag)
+
+        if section == "TABLES":
+            if code == 0:
+                if layer is not None and not layer["name"].startswith("*"):
+                    yield "layer", layer
+                layer = None
+                if value == "LAYER":
+                    layer = {
+                        "name": "",
+                        "color": 7,
+                        # Valeur par défaut d'ezdxf, y compris pour les fichiers R12 sans épaisseurs
+                        "lineweight": DEFAULT_LAYER_LINEWEIGHT
+                    }
+            elif layer is not None:
+                if code == 2:
+                    layer["name"] = value
+                elif code == 62:
+                    color = int(value)
+                    layer["color"] = color if color != 0 else "N/A"
+                elif code == 370 and has_lineweight:
+                    layer["lineweight"] = int(value)
+
+        if code == 2 and prev_code == 0 and prev_value == "SECTION":
+            section = value
+            tags = []
+        elif code == 0 and value == "EOF":
+            break
+        prev_code = code
+        prev_value = value
+
+    # Fichier sans section ENTITIES
+    yield "end", {"total_entities": total_entities, "type_counts": type_counts}
@@ -0,0 +1,291 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from flask import current_app
+from app.services.response_service import (dumps, negotiate_encoding, compress, set_content_encoding, make_etag,
+                                           set_validators)
+from app.services.timing_service import stage, timed
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Version du format des résultats : l'incrémenter change tous les hash de contenu,
+# et donc invalide les résultats en cache, les archives de tuiles et la géométrie
+# enregistrée en base (2 : développement des références de blocs ; 3 : comptes
+# des entités issues des blocs, marqueur SECTION plus compté comme entité ;
+# 4 : épaisseur par défaut des calques R12 ; 5 : variantes calques et statistiques
+# préchargées sans les comptes des entités issues des blocs, blocs imbriqués
+# indépendants de l'ordre des références)
+FORMAT_VERSION = 5
+
+
+class ExtractionCache:
+    """Cache disque des résultats d'extraction, partagé entre les processus workers.
+
+    Les résultats sont indexés par le hash SHA-256 du contenu du fichier DXF et
+    par une « variante » (format de sortie). Un index SQLite mémorise en plus
+    l'association chemin + taille + mtime -> hash pour éviter de relire le
+    fichier à chaque requête.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(cache_dir, "index.sqlite3")
+        self._local = threading.local()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        """Retourne une connexion SQLite propre au thread courant."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "content_hash TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "content_hash TEXT NOT NULL, variant TEXT NOT NULL, size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL, PRIMARY KEY (content_hash, variant))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != FORMAT_VERSION:
+            # Les hash mémorisés datent d'une version précédente du format
+            conn.execute("DELETE FROM fingerprints")
+            conn.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+
+    def _blob_path(self, content_hash, variant):
+        return os.path.join(self.blob_dir, f"{content_hash}.{variant}")
+
+    def _incr(self, name):
+        self._connect().execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    @timed("hash")
+    def content_hash(self, path):
+        """Retourne le hash du contenu d'un fichier, via l'index chemin/taille/mtime si possible."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT content_hash FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        with open(path, "rb") as f:
+            content_hash = self.stream_hash(f)
+        conn.execute(
+            "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, content_hash)
+        )
+        return content_hash
+
+    @staticmethod
+    @timed("hash")
+    def stream_hash(stream):
+        """Calcule le hash SHA-256 d'un flux binaire (préfixé par FORMAT_VERSION) puis le rembobine si possible."""
+        digest = hashlib.sha256(f"gexpertise-extraction-v{FORMAT_VERSION}\n".encode("ascii"))
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        if stream.seekable():
+            stream.seek(0)
+        return digest.hexdigest()
+
+    @timed("cache-read")
+    def get(self, content_hash, variant, count=True):
+        """Retourne les octets en cache pour (hash, variante), ou None.
+
+        count=False pour une variante dérivée (version compressée d'un résultat
+        déjà compté) : l'accès n'entre pas dans les compteurs hits/misses.
+        """
+        try:
+            with open(self._blob_path(content_hash, variant), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            if count:
+                self._incr("misses")
+            return None
+
+        conn = self._connect()
+        conn.execute(
+            "UPDATE entries SET last_access = ? WHERE content_hash = ? AND variant = ?",
+            (time.time(), content_hash, variant)
+        )
+        if count:
+            self._incr("hits")
+        return data
+
+    @timed("cache-read")
+    def locate(self, content_hash, variant):
+        """Comme get, mais retourne le chemin du fichier en cache (à ouvrir en mmap), ou None."""
+        path = self._blob_path(content_hash, variant)
+        if not os.path.exists(path):
+            self._incr("misses")
+            return None
+
+        conn = self._connect()
+        conn.execute(
+            "UPDATE entries SET last_access = ? WHERE content_hash = ? AND variant = ?",
+            (time.time(), content_hash, variant)
+        )
+        self._incr("hits")
+        return path
+
+    def contains(self, content_hash, variant):
+        """Indique si (hash, variante) est en cache, sans compter d'accès."""
+        return os.path.exists(self._blob_path(content_hash, variant))
+
+    @timed("cache-write")
+    def put(self, content_hash, variant, data):
+        """Enregistre un résultat de manière atomique puis applique la limite de taille."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._blob_path(content_hash, variant))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (content_hash, variant, size, last_access) VALUES (?, ?, ?, ?)",
+            (content_hash, variant, len(data), time.time())
+        )
+        self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes."""
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for content_hash, variant, size in conn.execute(
+            "SELECT content_hash, variant, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop(content_hash, variant)
+            total -= size
+            self._incr("evictions")
+            logger.debug("Entrée évincée du cache : %s.%s", content_hash, variant)
+
+    def _drop(self, content_hash, variant):
+        conn = self._connect()
+        conn.execute("DELETE FROM entries WHERE content_hash = ? AND variant = ?", (content_hash, variant))
+        try:
+            os.unlink(self._blob_path(content_hash, variant))
+        except FileNotFoundError:
+            pass
+
+    def invalidate_path(self, path):
+        """Oublie l'empreinte d'un fichier réécrit et les résultats qui ne servent plus qu'à lui."""
+        path = os.path.abspath(path)
+        conn = self._connect()
+        row = conn.execute("SELECT content_hash FROM fingerprints WHERE path = ?", (path,)).fetchone()
+        if not row:
+            return
+        content_hash = row[0]
+        conn.execute("DELETE FROM fingerprints WHERE path = ?", (path,))
+
+        still_used = conn.execute(
+            "SELECT 1 FROM fingerprints WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone()
+        if not still_used:
+            for (variant,) in conn.execute(
+                "SELECT variant FROM entries WHERE content_hash = ?", (content_hash,)
+            ).fetchall():
+                self._drop(content_hash, variant)
+        self._incr("invalidations")
+
+    def stats(self):
+        """Retourne les compteurs du cache (tous processus confondus)."""
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entry_count, total_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+            "evictions": counters.get("evictions", 0),
+            "invalidations": counters.get("invalidations", 0),
+            "entries": entry_count,
+            "size_bytes": total_size,
+            "max_bytes": self.max_bytes
+        }
+
+
+def get_extraction_cache():
+    """Retourne l'instance du cache associée à l'application courante."""
+    cache = current_app.extensions.get("extraction_cache")
+    if cache is None:
+        cache = ExtractionCache(
+            current_app.config["EXTRACTION_CACHE_FOLDER"],
+            current_app.config["EXTRACTION_CACHE_MAX_BYTES"]
+        )
+        current_app.extensions["extraction_cache"] = cache
+    return cache
+
+
+def encode_json(result):
+    """Sérialise un résultat d'extraction en JSON compact pour le cache."""
+    return dumps(result)
+
+
+def extraction_etag(content_hash, variant, mimetype="application/json"):
+    """ETag fort du résultat (hash de contenu, variante), tel que le servirait cache_response."""
+    return make_etag(mimetype, content_hash, variant)
+
+
+def cache_response(payload, hit, mimetype="application/json", key=None):
+    """Construit la réponse HTTP à partir d'octets en cache, sans re-sérialisation.
+
+    key (hash de contenu, variante) est la clé de payload dans le cache : si le
+    client accepte la compression, la version compressée y est mise en cache
+    à son tour (variante "<variante>.<encodage>") et resservie telle quelle.
+    La réponse porte alors l'ETag du résultat (voir extraction_etag).
+    """
+    encoding = negotiate_encoding(mimetype, len(payload)) if key is not None else None
+    if encoding is not None:
+        cache = get_extraction_cache()
+        content_hash, variant = key
+        compressed = cache.get(content_hash, f"{variant}.{encoding}", count=False)
+        if compressed is None:
+            with stage("compress"):
+                compressed = compress(payload, encoding)
+            cache.put(content_hash, f"{variant}.{encoding}", compressed)
+        payload = compressed
+    response = current_app.response_class(payload, mimetype=mimetype)
+    response.headers["X-Extraction-Cache"] = "HIT" if hit else "MISS"
+    if encoding is not None:
+        set_content_encoding(response, encoding)
+    if key is not None:
+        set_validators(response, extraction_etag(*key, mimetype=mimetype))
+    return response
@@ -0,0 +1,308 @@
+"""Moteur d'extraction DXF commun à toutes les routes d'extraction.
+
+La projection demandée (types d'entités, champs) est appliquée dès la lecture
+du flux : les entités des types non demandés ne sont jamais construites, et
+les modes "stats" et "layers" ne construisent aucune entité. Le mode
+"measures" ajoute les mesures de chaque calque, calculées sans sérialiser
+d'entité (voir layer_statistics).
+"""
+import json
+import logging
+from app.services.blocks import BlockLibrary
+from app.services.dxf_stream import iter_dxf
+from app.services.layer_statistics import LayerStatistics
+from app.services.simplify import simplify_vertices
+
+logger = logging.getLogger(__name__)
+
+# Groupes d'entités du résultat et types DXF correspondants
+ENTITY_GROUPS = {
+    "polylines": ('POLYLINE', 'LWPOLYLINE'),
+    "lines": ('LINE',),
+    "circles": ('CIRCLE',),
+    "arcs": ('ARC',),
+    "texts": ('TEXT',)
+}
+EXTRACTED_TYPES = tuple(dxftype for dxftypes in ENTITY_GROUPS.values() for dxftype in dxftypes)
+STATISTIC_KEYS = {
+    "polylines": "polyline_count",
+    "lines": "line_count",
+    "circles": "circle_count",
+    "arcs": "arc_count",
+    "texts": "text_count"
+}
+
+# Champs produits : tout, géométrie seule, calques seuls, statistiques seules
+# ou statistiques et mesures par calque
+FIELD_SETS = ("full", "geometry", "layers", "stats", "measures")
+
+# Taille approximative des paquets envoyés en mode flux
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+# Nombre d'entités extraites entre deux signalements d'avancement
+PROGRESS_INTERVAL = 1000
+
+
+def _color(entity):
+    return entity.dxf.color if entity.dxf.color != 0 else 'N/A'
+
+def _lineweight(entity):
+    return entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
+
+def serialize_entity(entity):
+    """Convertit une entité ezdxf en dictionnaire JSON.
+
+    Retourne un couple (clé du résultat, dictionnaire), ou None si le type
+    d'entité n'est pas extrait.
+    """
+    dxftype = entity.dxftype()
+    if dxftype == 'POLYLINE':
+        return 'polylines', {
+            'type': dxftype,
+            'layer': entity.dxf.layer,
+            'vertices': [{'x': v[0], 'y': v[1]} for v in entity.points()],  # Already matches frontend expectation
+            'closed': entity.is_closed,
+            'color': _color(entity),
+            'lineweight': _lineweight(entity)
+        }
+    if dxftype == 'LWPOLYLINE':
+        return 'polylines', {
+            'type': dxftype,
+            'layer': entity.dxf.layer,
+            'vertices': [{'x': v[0], 'y': v[1]} for v in entity.get_points()],  # Already matches frontend expectation
+            'closed': entity.closed,
+            'color': _color(entity),
+            'lineweight': _lineweight(entity)
+        }
+    if dxftype == 'LINE':
+        return 'lines', {
+            'type': dxftype,
+            'layer': entity.dxf.layer,
+            'start': {'x': entity.dxf.start[0], 'y': entity.dxf.start[1]},  # Use dict for consistency
+            'end': {'x': entity.dxf.end[0], 'y': entity.dxf.end[1]},
+            'color': _color(entity),
+            'lineweight': _lineweight(entity)
+        }
+    if dxftype == 'CIRCLE':
+        return 'circles', {
+            'type': dxftype,
+            'layer': entity.dxf.layer,
+            'center': {'x': entity.dxf.center[0], 'y': entity.dxf.center[1]},  # Use dict for consistency
+            'radius': entity.dxf.radius,
+            'color': _color(entity),
+            'lineweight': _lineweight(entity)
+        }
+    if dxftype == 'ARC':
+        return 'arcs', {
+            'type': dxftype,
+            'layer': entity.dxf.layer,
+            'center': {'x': entity.dxf.center[0], 'y': entity.dxf.center[1]},  # Use dict for consistency
+            'radius': entity.dxf.radius,
+            'start_angle': entity.dxf.start_angle,
+            'end_angle': entity.dxf.end_angle,
+            'color': _color(entity),
+            'lineweight': _lineweight(entity)
+        }
+    if dxftype == 'TEXT':
+        return 'texts', {
+            'type': dxftype,
+            'layer': entity.dxf.layer,
+            'text': entity.dxf.text,
+            'position': {'x': entity.dxf.insert[0], 'y': entity.dxf.insert[1]},  # Use dict for consistency
+            'height': entity.dxf.height,
+            'color': _color(entity),
+            'lineweight': _lineweight(entity)
+        }
+    return None
+
+
+def resolve_projection(types=None, fields="full"):
+    """Valide une projection et retourne (types DXF à extraire, champs).
+
+    types accepte des types DXF ("LWPOLYLINE") ou des groupes ("polylines"),
+    en liste ou séparés par des virgules. Lève ValueError si invalide.
+    """
+    fields = (fields or "full").lower()
+    if fields not in FIELD_SETS:
+        raise ValueError(f"Champs inconnus : {fields} (valeurs possibles : {', '.join(FIELD_SETS)})")
+
+    if isinstance(types, str):
+        types = types.split(",")
+    if not types:
+        return EXTRACTED_TYPES, fields
+
+    selected = set()
+    for name in types:
+        name = name.strip()
+        if name.lower() in ENTITY_GROUPS:
+            selected.update(ENTITY_GROUPS[name.lower()])
+        elif name.upper() in EXTRACTED_TYPES:
+            selected.add(name.upper())
+        elif name:
+            raise ValueError(f"Type d'entité non pris en charge : {name}")
+    return tuple(dxftype for dxftype in EXTRACTED_TYPES if dxftype in selected), fields
+
+
+def resolve_tolerance(value):
+    """Valide une tolérance de simplification : None (aucune) ou nombre positif.
+
+    Lève ValueError si invalide.
+    """
+    if value in (None, ""):
+        return None
+    try:
+        tolerance = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Tolérance invalide : {value}")
+    if not tolerance > 0 or tolerance == float("inf"):
+        raise ValueError(f"La tolérance doit être un nombre positif : {value}")
+    return tolerance
+
+
+def projection_variant(types, fields, prefix="extract", tolerance=None):
+    """Nom de la variante de cache correspondant à une projection (et à une tolérance)."""
+    if tolerance:
+        prefix = f"{prefix}-t{tolerance:g}"
+    if fields == "full" and tuple(types) == EXTRACTED_TYPES:
+        return prefix
+    return f"{prefix}-{fields}-{'+'.join(types).lower()}"
+
+
+def build_statistics(layer_count, end, expanded=None):
+    """Statistiques globales à partir des compteurs de fin de lecture du flux.
+
+    Les compteurs *_count et total_entities sont bruts : entités du modelspace,
+    une référence de bloc comptant pour un INSERT. expanded, si fourni (modes
+    qui développent les blocs), donne par clé du résultat le nombre d'entités
+    issues des références de blocs, publié en expanded_*_count : la liste
+    "polylines" contient polyline_count + expanded_polyline_count entités.
+    """
+    type_counts = end["type_counts"]
+    statistics = {"layer_count": layer_count}
+    for key, dxftypes in ENTITY_GROUPS.items():
+        statistics[STATISTIC_KEYS[key]] = sum(type_counts.get(dxftype, 0) for dxftype in dxftypes)
+    statistics["insert_count"] = type_counts.get("INSERT", 0)
+    statistics["total_entities"] = end["total_entities"]
+    if expanded is not None:
+        for key in ENTITY_GROUPS:
+            statistics[f"expanded_{STATISTIC_KEYS[key]}"] = expanded.get(key, 0)
+    return statistics
+
+
+def count_expanded(expanded, geometry):
+    """Ajoute à expanded (clé du résultat -> nombre) les entités d'une référence de bloc développée."""
+    for group, data in geometry.groups.items():
+        if data["type"]:
+            expanded[group] = expanded.get(group, 0) + len(data["type"])
+
+
+def _iter_records(stream, types, fields, tolerance=None):
+    """Parcourt le flux selon la projection : génère (section, données).
+
+    tolerance, si fournie, simplifie les polylignes (Douglas–Peucker).
+    Les références de blocs (INSERT) sont développées en entités des types
+    demandés, marquées du nom du bloc ("block"), et comptées à part dans les
+    statistiques (expanded_*_count). En mode "measures", les entités alimentent
+    seulement les mesures par calque ("layer_statistics").
+    """
+    with_layers = fields in ("full", "layers")
+    load_types = (*types, "INSERT") if fields in ("full", "geometry", "measures") else ()
+    expanded = {} if load_types else None
+    measures = LayerStatistics() if fields == "measures" else None
+    blocks = BlockLibrary()
+    layer_count = 0
+    for kind, value in iter_dxf(stream, types=load_types):
+        if kind == "layer":
+            layer_count += 1
+            if with_layers:
+                yield "layers", value
+            if measures is not None:
+                measures.add_layer(value["name"])
+        elif kind == "block":
+            blocks.add(value)
+        elif kind == "entity":
+            if measures is not None:
+                if value.dxftype() != "INSERT":
+                    measures.add_entity(value)
+                else:
+                    geometry = blocks.expand(value)
+                    if geometry is not None:
+                        measures.add_geometry(geometry)
+                        count_expanded(expanded, geometry)
+                continue
+            from_block = value.dxftype() == "INSERT"
+            if from_block:
+                geometry = blocks.expand(value)
+                records = geometry.iter_serialized(types, value.dxf.name) if geometry is not None else ()
+            else:
+                serialized = serialize_entity(value)
+                records = (serialized,) if serialized else ()
+            for group, data in records:
+                if tolerance and group == "polylines":
+                    data["vertices"] = simplify_vertices(data["vertices"], tolerance, data["closed"])
+                if from_block:
+                    expanded[group] = expanded.get(group, 0) + 1
+                yield group, data
+        else:
+            if measures is not None:
+                for entry in measures.summary():
+                    yield "layer_statistics", entry
+            yield "statistics", build_statistics(layer_count, value, expanded)
+
+
+def extract(stream, types=EXTRACTED_TYPES, fields="full", progress=None, tolerance=None):
+    """Extrait un flux DXF binaire selon la projection demandée.
+
+    progress, si fourni, est appelé avec le nombre d'entités extraites toutes
+    les PROGRESS_INTERVAL entités, puis une dernière fois à la fin. tolerance
+    simplifie les polylignes.
+    """
+    result = {}
+    if fields in ("full", "layers"):
+        result["layers"] = []
+    if fields in ("full", "geometry"):
+        for key, dxftypes in ENTITY_GROUPS.items():
+            if any(dxftype in types for dxftype in dxftypes):
+                result[key] = []
+    if fields == "measures":
+        result["layer_statistics"] = []
+
+    processed = 0
+    for section, data in _iter_records(stream, types, fields, tolerance):
+        if section == "statistics":
+            result["statistics"] = data
+        else:
+            result[section].append(data)
+            if section not in ("layers", "layer_statistics"):
+                processed += 1
+                if progress is not None and processed % PROGRESS_INTERVAL == 0:
+                    progress(processed)
+    if progress is not None:
+        progress(processed)
+    return result
+
+
+def iter_ndjson(stream, types=EXTRACTED_TYPES, fields="full", tolerance=None):
+    """Extrait un flux DXF binaire en NDJSON, entité par entité, à mémoire constante.
+
+    Chaque ligne est un objet {"section": ..., "data": ...} où section reprend
+    les clés du résultat de extract ; les statistiques sont envoyées en dernier.
+    """
+    buffer = []
+    buffered = 0
+    try:
+        for section, data in _iter_records(stream, types, fields, tolerance):
+            line = json.dumps({"section": section, "data": data}, separators=(",", ":")) + "\n"
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= NDJSON_CHUNK_SIZE:
+                yield "".join(buffer).encode("utf-8")
+                buffer = []
+                buffered = 0
+    except Exception as e:
+        logger.error("Erreur lors de l'extraction en flux : %s", e, exc_info=True)
+        error = {"error": f"Erreur lors de l'extraction des données : {str(e)}"}
+        buffer.append(json.dumps({"section": "error", "data": error}) + "\n")
+
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
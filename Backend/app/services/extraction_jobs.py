@@ -0,0 +1,127 @@
+"""Tâches d'extraction exécutées dans les processus du pool (voir extraction_pool).
+
+Chaque tâche reçoit une source DXF : le chemin du fichier sur le disque, un
+fichier binaire ouvert (upload transmis par descripteur) ou ses octets. Les
+résultats volumineux sont sérialisés dans le processus du pool, pour ne faire
+transiter que des octets prêts à être mis en cache.
+"""
+import io
+import os
+from app.services.columnar import extract_columnar
+from app.services.extraction_cache import encode_json
+from app.services.diff_service import diff_indexes
+from app.services.extraction_engine import iter_ndjson, projection_variant, EXTRACTED_TYPES
+from app.services.extraction_pool import ExtractionJobError, report_progress
+from app.services.file_service import extract_file_data, open_dxf
+from app.services.spatial_service import build_spatial_index, open_spatial_index, SPATIAL_VARIANT
+from app.services.surface_service import compute_surface_areas
+from app.services.tile_service import write_tile_archive
+from app.services.timing_service import stage
+
+
+def open_source(source):
+    """Ouvre une source DXF en flux binaire, à utiliser avec with."""
+    if isinstance(source, (str, os.PathLike)):
+        return open_dxf(source)
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def extract_json(source, types, fields, tolerance=None):
+    """Extraction JSON : retourne (résultat encodé, index spatial ou None).
+
+    L'index spatial n'est construit que si toutes les entités sont extraites,
+    sans simplification.
+    L'avancement (entités extraites) est signalé via report_progress.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    result = extract_file_data(source, types, fields, report_progress, tolerance)
+    if "error" in result:
+        raise ExtractionJobError(result["error"])
+    index = None
+    if tuple(types) == EXTRACTED_TYPES and fields in ("full", "geometry") and not tolerance:
+        with stage("index"):
+            index = build_spatial_index(result)
+    with stage("encode"):
+        payload = encode_json(result)
+    return payload, index
+
+
+def run_extraction(cache, pool, content_hash, source, types, fields, variant, progress=None, tolerance=None):
+    """Côté serveur : exécute extract_json dans le pool et met en cache le résultat,
+    ainsi que l'index spatial s'il a été construit. Retourne le résultat encodé.
+
+    Lève ExtractionPoolError ou ExtractionJobError en cas d'échec.
+    """
+    payload, index = pool.run(extract_json, source, types, fields, tolerance, progress=progress)
+    cache.put(content_hash, variant, payload)
+    if index is not None:
+        cache.put(content_hash, SPATIAL_VARIANT, index)
+    return payload
+
+
+def extract_ndjson(source, types, fields, tolerance=None):
+    """Extraction NDJSON : génère les paquets de lignes au fil de la lecture."""
+    with open_source(source) as stream:
+        yield from iter_ndjson(stream, types, fields, tolerance)
+
+
+def extract_columnar_payload(source, quantum, types, tolerance=None):
+    """Extraction au format colonnaire : retourne le contenu binaire."""
+    with open_source(source) as stream, stage("parse"):
+        return extract_columnar(stream, quantum, types, tolerance)
+
+
+def compute_surface(source):
+    """Calcul des surfaces d'un fichier DXF."""
+    with open_source(source) as stream, stage("parse"):
+        return compute_surface_areas(stream)
+
+
+def build_tiles(source, path, content_hash, max_zoom):
+    """Pyramide de tuiles d'un fichier DXF, écrite dans l'archive path.
+
+    Retourne le nombre de tuiles non vides.
+    """
+    result = extract_file_data(source)
+    if "error" in result:
+        raise ExtractionJobError(result["error"])
+    return write_tile_archive(path, result, content_hash, max_zoom)
+
+
+def prefetch_file(source, tiles_path, content_hash, max_zoom):
+    """Pré-extraction d'un fichier : une seule lecture pour toutes les variantes servies
+    à l'ouverture (complète, calques, statistiques), l'index spatial et, si
+    tiles_path est fourni, l'archive de tuiles.
+
+    Retourne {variante de cache: contenu}.
+    """
+    result = extract_file_data(source)
+    if "error" in result:
+        raise ExtractionJobError(result["error"])
+    # Sans les comptes des entités issues des blocs, comme à l'extraction à la
+    # demande de ces variantes : même clé de cache, même contenu
+    statistics = {key: value for key, value in result["statistics"].items() if not key.startswith("expanded_")}
+    payloads = {
+        projection_variant(EXTRACTED_TYPES, "full"): encode_json(result),
+        projection_variant(EXTRACTED_TYPES, "layers"): encode_json(
+            {"layers": result["layers"], "statistics": statistics}
+        ),
+        projection_variant(EXTRACTED_TYPES, "stats"): encode_json({"statistics": statistics}),
+        SPATIAL_VARIANT: build_spatial_index(result)
+    }
+    if tiles_path is not None:
+        write_tile_archive(tiles_path, result, content_hash, max_zoom)
+    return payloads
+
+
+def diff_revisions(old_index_path, new_index_path, precision, match_distance):
+    """Comparaison de deux révisions d'un plan à partir de leurs index spatiaux en cache
+    (voir diff_service) : retourne le résultat encodé.
+    """
+    return encode_json(diff_indexes(
+        open_spatial_index(old_index_path), open_spatial_index(new_index_path), precision, match_distance
+    ))
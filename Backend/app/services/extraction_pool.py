@@ -0,0 +1,358 @@
+"""Pool de processus dédié à l'analyse des fichiers DXF.
+
+L'analyse ezdxf est du Python pur, gourmand en CPU : exécutée sur le thread de
+la requête, elle bloque le worker Flask et le GIL pour toutes les autres
+requêtes du processus. Les tâches d'extraction (voir extraction_jobs) sont donc
+confiées à des processus séparés :
+
+  - la taille du pool est fixe, une requête qui ne trouve pas de processus libre
+    après EXTRACTION_QUEUE_TIMEOUT secondes reçoit PoolSaturatedError (503) ;
+  - chaque tâche a une durée maximale et un plafond de mémoire résidente : le
+    processus fautif est tué et remplacé (JobTimeoutError 504, JobMemoryError 503) ;
+  - un processus est recyclé après EXTRACTION_WORKER_MAX_JOBS tâches, pour
+    rendre au système la mémoire fragmentée.
+
+Le plafond de mémoire est contrôlé via /proc (Linux) ; ailleurs, seule la
+durée maximale s'applique.
+
+Les durées des étapes d'une tâche (et son profil, si la requête est profilée)
+sont renvoyées à la requête qui l'a lancée (voir timing_service).
+"""
+import atexit
+import contextlib
+import inspect
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.reduction import send_handle, recv_handle
+from flask import current_app
+from app.services.timing_service import stage, record, start_timings, finish_timings, merge_timings
+from app.services.timing_service import start_profiler, stop_profiler, profiling_interval, merge_profile
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de surveillance d'une tâche en cours (durée, mémoire)
+POLL_INTERVAL = 0.05
+
+# Destination de report_progress pour la tâche en cours dans ce thread
+_progress = threading.local()
+
+
+class ExtractionPoolError(Exception):
+    """Le pool n'a pas pu mener la tâche à bien (saturation, délai, mémoire)."""
+    status_code = 503
+
+
+class PoolSaturatedError(ExtractionPoolError):
+    status_code = 503
+
+
+class JobTimeoutError(ExtractionPoolError):
+    status_code = 504
+
+
+class JobMemoryError(ExtractionPoolError):
+    status_code = 503
+
+
+class ExtractionJobError(Exception):
+    """Erreur levée par la tâche elle-même (fichier DXF invalide, ...)."""
+    status_code = 400
+
+
+def report_progress(value):
+    """Signale l'avancement de la tâche en cours à l'appelant (sans effet hors tâche)."""
+    callback = getattr(_progress, "callback", None)
+    if callback is not None:
+        callback(value)
+
+
+def _worker_main(conn):
+    """Boucle d'un processus du pool : exécute les tâches reçues jusqu'à None."""
+    _progress.callback = lambda value: conn.send(("progress", value))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        func, args, handle_index, profile = message
+        if handle_index is not None:
+            args = list(args)
+            args[handle_index] = os.fdopen(recv_handle(conn), "rb")
+        start_timings()
+        if profile:
+            start_profiler(profile)
+        try:
+            result = func(*args)
+            if inspect.isgenerator(result):
+                for chunk in result:
+                    conn.send(("chunk", chunk))
+                outcome = ("done", None)
+            else:
+                outcome = ("result", result)
+        except ExtractionJobError as e:
+            outcome = ("error", str(e))
+        except Exception as e:
+            logger.error("Erreur dans le processus d'extraction : %s", e, exc_info=True)
+            outcome = ("error", f"Erreur lors de l'extraction des données : {str(e)}")
+        finally:
+            if handle_index is not None:
+                args[handle_index].close()
+
+        # Durées d'étapes et profil de la tâche, avant son issue (voir timing_service)
+        timings = finish_timings()
+        if timings:
+            conn.send(("timings", timings))
+        stacks = stop_profiler()
+        if stacks is not None:
+            conn.send(("profile", stacks))
+        conn.send(outcome)
+
+
+class _Worker:
+    """Processus du pool et son canal de communication."""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def rss(self):
+        """Mémoire résidente du processus en octets, ou None si indisponible."""
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def stop(self, force=False):
+        """Arrête le processus : poliment s'il est libre, de force s'il est occupé."""
+        if not force:
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=1)
+            except (OSError, ValueError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ExtractionPool:
+    """Pool de processus d'extraction avec délai, plafond mémoire et recyclage.
+
+    size=0 exécute les tâches dans le thread appelant, sans isolation
+    (développement).
+    """
+
+    def __init__(self, size, timeout, max_rss, max_jobs_per_worker, queue_timeout):
+        self.size = size
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.queue_timeout = queue_timeout
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            # Pas de fork() direct d'un processus Flask multi-thread
+            self._context = multiprocessing.get_context("forkserver")
+            self._context.set_forkserver_preload(["__main__", "app.services.extraction_jobs"])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        atexit.register(self.shutdown)
+
+    def _acquire(self):
+        """Réserve un processus libre, en le créant si besoin."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            logger.warning("Pool d'extraction saturé")
+            raise PoolSaturatedError("Serveur d'extraction saturé, réessayez dans quelques instants")
+        try:
+            worker = self._idle.get_nowait()
+            if worker.process.is_alive():
+                return worker
+            self._discard(worker)
+        except queue.Empty:
+            pass
+        try:
+            worker = _Worker(self._context)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._workers.add(worker)
+        logger.debug("Processus d'extraction démarré : %s", worker.process.pid)
+        return worker
+
+    def _discard(self, worker, force=False):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop(force)
+
+    def _release(self, worker, reusable):
+        """Rend le processus au pool, ou le remplace s'il a trop servi ou a échoué."""
+        try:
+            if not reusable:
+                self._discard(worker, force=True)
+            elif worker.jobs < self.max_jobs_per_worker:
+                self._idle.put(worker)
+            else:
+                logger.debug("Recyclage du processus d'extraction : %s", worker.process.pid)
+                self._discard(worker)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _prepare_args(args):
+        """Repère un fichier ouvert parmi les arguments, transmis par descripteur.
+
+        Un flux sans descripteur (tampon en mémoire) est transmis par copie.
+        """
+        prepared = list(args)
+        for index, arg in enumerate(prepared):
+            if isinstance(arg, io.IOBase) or hasattr(arg, "fileno"):
+                try:
+                    fd = arg.fileno()
+                    prepared[index] = None
+                    return prepared, index, fd
+                except (AttributeError, OSError, io.UnsupportedOperation):
+                    arg.seek(0)
+                    prepared[index] = arg.read()
+        return prepared, None, None
+
+    def _wait(self, worker, deadline, timeout):
+        """Attend le prochain message du processus en surveillant durée et mémoire."""
+        while not worker.conn.poll(POLL_INTERVAL):
+            if time.monotonic() > deadline:
+                logger.warning("Tâche d'extraction interrompue après %s s", timeout)
+                raise JobTimeoutError(f"Extraction interrompue : durée maximale de {timeout:g} s dépassée")
+            rss = worker.rss() if self.max_rss else None
+            if rss is not None and rss > self.max_rss:
+                logger.warning("Tâche d'extraction interrompue : %s octets en mémoire", rss)
+                raise JobMemoryError("Extraction interrompue : limite de mémoire dépassée")
+            if not worker.process.is_alive():
+                raise ExtractionPoolError("Le processus d'extraction s'est arrêté de manière inattendue")
+        return worker.conn.recv()
+
+    def _execute(self, func, args, progress=None, timeout=None):
+        """Exécute func(*args) dans un processus : génère les morceaux d'une tâche
+        génératrice, puis retourne le résultat de la tâche.
+
+        progress, si fourni, reçoit chaque valeur passée à report_progress par la
+        tâche ; timeout remplace la durée maximale par défaut du pool.
+        """
+        timeout = timeout or self.timeout
+        with stage("queue"):
+            worker = self._acquire()
+        reusable = False
+        try:
+            prepared, handle_index, fd = self._prepare_args(args)
+            worker.jobs += 1
+            started = time.perf_counter()
+            worker.conn.send((func, tuple(prepared), handle_index, profiling_interval()))
+            if handle_index is not None:
+                send_handle(worker.conn, fd, worker.process.pid)
+
+            deadline = time.monotonic() + timeout
+            while True:
+                kind, value = self._wait(worker, deadline, timeout)
+                if kind == "chunk":
+                    yield value
+                    continue
+                if kind == "progress":
+                    if progress is not None:
+                        progress(value)
+                    continue
+                if kind == "timings":
+                    merge_timings(value)
+                    continue
+                if kind == "profile":
+                    merge_profile(value)
+                    continue
+                record("pool", time.perf_counter() - started)
+                reusable = True
+                if kind == "error":
+                    raise ExtractionJobError(value)
+                return value
+        finally:
+            # Une tâche abandonnée en cours de route (délai, client parti) tue le processus
+            self._release(worker, reusable)
+
+    def run(self, func, *args, progress=None, timeout=None):
+        """Exécute une tâche et retourne son résultat."""
+        if self.size == 0:
+            return _run_inline(func, args, progress)
+        messages = self._execute(func, args, progress, timeout)
+        while True:
+            try:
+                next(messages)
+            except StopIteration as stop:
+                return stop.value
+
+    def stream(self, func, *args):
+        """Exécute une tâche génératrice et génère ses morceaux au fil de l'eau."""
+        if self.size == 0:
+            yield from _stream_inline(func, args)
+            return
+        yield from self._execute(func, args)
+
+    def shutdown(self):
+        """Arrête tous les processus du pool."""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+@contextlib.contextmanager
+def _inline_errors():
+    """Convertit une erreur de tâche exécutée sans pool en ExtractionJobError, comme dans un worker."""
+    try:
+        yield
+    except ExtractionJobError:
+        raise
+    except Exception as e:
+        logger.error("Erreur lors de l'extraction : %s", e, exc_info=True)
+        raise ExtractionJobError(f"Erreur lors de l'extraction des données : {str(e)}")
+
+
+def _run_inline(func, args, progress=None):
+    _progress.callback = progress
+    try:
+        with _inline_errors():
+            return func(*args)
+    finally:
+        _progress.callback = None
+
+
+def _stream_inline(func, args):
+    # Les erreurs surviennent pendant l'itération, pas à la création du générateur
+    with _inline_errors():
+        yield from func(*args)
+
+
+def get_extraction_pool():
+    """Retourne le pool d'extraction associé à l'application courante."""
+    pool = current_app.extensions.get("extraction_pool")
+    if pool is None:
+        pool = ExtractionPool(
+            current_app.config["EXTRACTION_POOL_SIZE"],
+            current_app.config["EXTRACTION_JOB_TIMEOUT"],
+            current_app.config["EXTRACTION_JOB_MAX_RSS"],
+            current_app.config["EXTRACTION_WORKER_MAX_JOBS"],
+            current_app.config["EXTRACTION_QUEUE_TIMEOUT"]
+        )
+        current_app.extensions["extraction_pool"] = pool
+    return pool
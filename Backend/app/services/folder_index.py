@@ -0,0 +1,379 @@
+"""Index en mémoire des dossiers utilisateurs (Ressources/<utilisateur>), tenu à jour par inotify.
+
+Le contenu d'un dossier lu une fois (voir folder_tree.scan_directory) est
+gardé en mémoire avec la taille de son sous-arbre, et le dossier est surveillé
+par inotify. Toute modification (création, suppression, renommage, fin
+d'écriture, changement d'attributs) invalide le dossier concerné, son parent
+(où son entrée a changé de date) et la taille de ses ancêtres : la lecture
+suivante ne relit que ces dossiers.
+
+- Les écritures de l'application (dépôt, transfert, renommage, suppression)
+  appellent folder_changed aussitôt, sans attendre l'événement inotify : une
+  requête voit toujours ses propres écritures.
+- Une réconciliation périodique compare le contenu mémorisé au disque, au
+  cas où des événements auraient été perdus ; un débordement de la file
+  inotify vide l'index.
+- Un dossier qui ne peut pas être surveillé (limite max_user_watches) n'est
+  pas mémorisé : il est relu à chaque fois.
+- Chaque modification vue sous un dossier change sa génération (voir
+  generation) : les réponses qui décrivent le dossier en tirent leur ETag.
+
+L'index est propre au processus : chaque worker du serveur WSGI a le sien,
+mis à jour par ses propres événements inotify. Hors Linux, ou si
+FOLDER_INDEX est désactivé, les dossiers sont lus directement sur le disque.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import threading
+import uuid
+from flask import current_app, has_app_context
+from app.services.folder_tree import scan_directory, DISK_LISTING
+
+logger = logging.getLogger(__name__)
+
+# Événements inotify (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+# Pas de IN_MODIFY : un dépôt en cours produirait un événement par écriture, IN_CLOSE_WRITE suffit
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+EVENT_HEADER = struct.Struct("iIII")
+EVENT_BUFFER_SIZE = 64 * 1024
+
+
+class Inotify:
+    """Accès minimal à l'API inotify de Linux, via la libc (sans dépendance).
+
+    Lève OSError si inotify n'est pas disponible.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init = libc.inotify_init1
+        except AttributeError:
+            raise OSError(errno.ENOSYS, "inotify non disponible sur ce système")
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = init(os.O_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def add_watch(self, path, mask):
+        """Surveille path ; retourne le descripteur de surveillance (le même pour un dossier déjà surveillé)."""
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def rm_watch(self, wd):
+        # Échoue sans conséquence si le noyau a déjà retiré la surveillance (dossier supprimé)
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Attend et retourne les événements suivants : [(descripteur, masque, nom)]."""
+        data = os.read(self.fd, EVENT_BUFFER_SIZE)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+
+class FolderIndex:
+    """Contenu et tailles des dossiers déjà lus, invalidés par inotify et par folder_changed.
+
+    Même interface que folder_tree.DiskListing (entries, tree_size).
+    """
+
+    def __init__(self, reconcile_interval):
+        self._inotify = Inotify()
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._sizes = {}
+        self._watches = {}
+        self._watched = {}
+        # Incrémenté à chaque invalidation : une lecture concurrente n'est alors pas mémorisée
+        self._epoch = 0
+        # Générations : dernière invalidation sous chaque dossier, et remises à zéro de sous-arbres
+        self._stamps = {}
+        self._resets = {}
+        self._cleared = 0
+        # Identifie les générations de cet index (propres au processus)
+        self.instance_id = uuid.uuid4().hex
+        # Faux si un dossier n'a pas pu être surveillé ou si les événements ne sont plus lus
+        self._complete = True
+        self._watch_limit_reached = False
+        threading.Thread(target=self._read_events, name="folder-index-inotify", daemon=True).start()
+        threading.Thread(target=self._reconcile_loop, args=(reconcile_interval,),
+                         name="folder-index-reconcile", daemon=True).start()
+
+    def _watch(self, path):
+        """Surveille un dossier ; retourne False si c'est impossible (limite atteinte, droits)."""
+        with self._lock:
+            if path in self._watched:
+                return True
+        try:
+            wd = self._inotify.add_watch(path, WATCH_MASK)
+        except OSError as e:
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                # Modifications de ce dossier invisibles : les générations ne sont plus fiables
+                self._complete = False
+            if e.errno == errno.ENOSPC and not self._watch_limit_reached:
+                self._watch_limit_reached = True
+                logger.warning("Limite de surveillances inotify atteinte (fs.inotify.max_user_watches) : "
+                               "les dossiers suivants seront relus à chaque requête")
+            return False
+        with self._lock:
+            previous = self._watches.get(wd)
+            if previous is not None and previous != path:
+                # Même dossier déjà surveillé sous son ancien chemin (renommé) : celui-ci est obsolète
+                self._watched.pop(previous, None)
+            self._watches[wd] = path
+            self._watched[path] = wd
+        return True
+
+    def entries(self, path):
+        """Entrées du dossier path (voir folder_tree.scan_directory), depuis l'index si possible."""
+        path = os.path.abspath(path)
+        with self._lock:
+            snapshot = self._snapshots.get(path)
+            if snapshot is not None:
+                return snapshot
+            epoch = self._epoch
+        # Surveillé avant d'être lu : une modification pendant la lecture produit un événement
+        watched = self._watch(path)
+        entries = DISK_LISTING.entries(path)
+        if watched:
+            with self._lock:
+                if self._epoch == epoch:
+                    self._snapshots[path] = entries
+        return entries
+
+    def _tree_size(self, path):
+        """Retourne (taille du sous-arbre, vrai si tous ses dossiers sont mémorisés)."""
+        with self._lock:
+            size = self._sizes.get(path)
+            if size is not None:
+                return size, True
+            epoch = self._epoch
+        size = 0
+        complete = True
+        for entry in self.entries(path):
+            if entry.is_dir:
+                child_size, child_complete = self._tree_size(entry.path)
+                size += child_size
+                complete = complete and child_complete
+            else:
+                size += entry.size
+        with self._lock:
+            complete = complete and path in self._snapshots
+            if complete and self._epoch == epoch:
+                self._sizes[path] = size
+        return size, complete
+
+    def tree_size(self, path):
+        """Taille totale des fichiers d'un dossier et de ses sous-dossiers, en octets."""
+        return self._tree_size(os.path.abspath(path))[0]
+
+    def invalidate(self, path, recursive=False):
+        """Oublie path (fichier ou dossier créé, écrit ou supprimé), son dossier, le parent de
+        celui-ci (où son entrée a changé de date) et la taille de tous ses ancêtres.
+
+        recursive oublie aussi tout le contenu mémorisé sous path (dossier
+        supprimé, renommé ou déplacé) et ses surveillances.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            self._epoch += 1
+            if recursive:
+                self._resets[path] = self._epoch
+            elif path in self._watched:
+                self._stamps[path] = self._epoch
+            folder = os.path.dirname(path)
+            for key in (path, folder, os.path.dirname(folder)):
+                self._snapshots.pop(key, None)
+            if recursive:
+                prefix = path + os.sep
+                for key in [key for key in self._snapshots if key.startswith(prefix)]:
+                    del self._snapshots[key]
+                for key in [key for key in self._sizes if key.startswith(prefix)]:
+                    del self._sizes[key]
+                # Un dossier renommé garde sa surveillance sous son ancien chemin : elle est retirée
+                for key in [key for key in self._watched if key == path or key.startswith(prefix)]:
+                    wd = self._watched.pop(key)
+                    if self._watches.get(wd) == key:
+                        del self._watches[wd]
+                        self._inotify.rm_watch(wd)
+            ancestor = path
+            while True:
+                self._sizes.pop(ancestor, None)
+                parent = os.path.dirname(ancestor)
+                if parent == ancestor:
+                    break
+                self._stamps[parent] = self._epoch
+                ancestor = parent
+
+    def clear(self):
+        """Oublie tout le contenu mémorisé (les surveillances restent en place)."""
+        with self._lock:
+            self._epoch += 1
+            self._cleared = self._epoch
+            self._snapshots.clear()
+            self._sizes.clear()
+
+    def generation(self, path):
+        """Génération du dossier path : change à chaque modification vue dans son sous-arbre.
+
+        Deux lectures de même génération donnent le même contenu, à condition
+        que le sous-arbre ait été lu par l'index (et donc surveillé). Retourne
+        None si ce n'est pas garanti (dossier non surveillable, lecture des
+        événements interrompue).
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if not self._complete:
+                return None
+            generation = max(self._stamps.get(path, 0), self._cleared)
+            ancestor = path
+            while True:
+                generation = max(generation, self._resets.get(ancestor, 0))
+                parent = os.path.dirname(ancestor)
+                if parent == ancestor:
+                    return generation
+                ancestor = parent
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("File d'événements inotify saturée : index des dossiers vidé")
+            self.clear()
+            return
+        with self._lock:
+            path = self._watches.get(wd)
+        if path is None:
+            return
+        if mask & IN_IGNORED:
+            # Surveillance retirée par le noyau (dossier supprimé) ou par invalidate
+            with self._lock:
+                self._watches.pop(wd, None)
+                if self._watched.get(path) == wd:
+                    del self._watched[path]
+            self.invalidate(path, recursive=True)
+        elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self.invalidate(path, recursive=True)
+        else:
+            moved_directory = mask & IN_ISDIR and mask & (IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO)
+            self.invalidate(os.path.join(path, name) if name else path, recursive=bool(moved_directory))
+
+    def _read_events(self):
+        while True:
+            try:
+                events = self._inotify.read_events()
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                logger.error("Lecture des événements inotify interrompue : %s", e, exc_info=True)
+                self._complete = False
+                self.clear()
+                return
+            for wd, mask, name in events:
+                try:
+                    self._handle_event(wd, mask, name)
+                except Exception as e:
+                    logger.error("Erreur lors du traitement d'un événement inotify : %s", e, exc_info=True)
+
+    def reconcile(self):
+        """Compare le contenu mémorisé de chaque dossier au disque et oublie ceux qui diffèrent.
+
+        Retourne le nombre de dossiers corrigés.
+        """
+        with self._lock:
+            snapshots = list(self._snapshots.items())
+        changed = 0
+        for path, snapshot in snapshots:
+            try:
+                current = scan_directory(path)
+            except OSError:
+                current = None
+            with self._lock:
+                # Déjà invalidé entre-temps : rien à corriger
+                stale = self._snapshots.get(path) is snapshot and current != snapshot
+            if stale:
+                changed += 1
+                self.invalidate(path, recursive=current is None)
+        if changed:
+            logger.warning("Index des dossiers : %s dossier(s) corrigé(s) par la réconciliation", changed)
+        return changed
+
+    def _reconcile_loop(self, interval):
+        stopped = threading.Event()
+        while not stopped.wait(interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error("Erreur lors de la réconciliation de l'index des dossiers : %s", e, exc_info=True)
+
+
+def get_folder_index():
+    """Retourne l'index des dossiers de l'application courante, ou None s'il est désactivé
+    ou si inotify n'est pas disponible.
+    """
+    if "folder_index" not in current_app.extensions:
+        index = None
+        if current_app.config["FOLDER_INDEX"]:
+            try:
+                index = FolderIndex(current_app.config["FOLDER_INDEX_RECONCILE_INTERVAL"])
+            except OSError as e:
+                logger.warning("Index des dossiers désactivé, lecture directe du disque : %s", e)
+        current_app.extensions["folder_index"] = index
+    return current_app.extensions["folder_index"]
+
+
+def get_folder_listing():
+    """Source des lectures de dossiers (voir folder_tree) : l'index, ou le disque à défaut."""
+    return get_folder_index() or DISK_LISTING
+
+
+def tree_generation(path):
+    """(index, génération) du dossier path (voir FolderIndex.generation), ou None si l'index
+    est désactivé ou ne peut pas la garantir. À lire avant de décrire le dossier.
+    """
+    index = get_folder_index()
+    generation = index.generation(path) if index is not None else None
+    return None if generation is None else (index.instance_id, generation)
+
+
+def folder_changed(path, recursive=False):
+    """À appeler après toute écriture de l'application sous Ressources (fichier ou dossier
+    créé, écrit, renommé, supprimé) : l'index la voit immédiatement.
+
+    recursive pour un dossier supprimé, renommé ou créé avec son contenu.
+    """
+    index = current_app.extensions.get("folder_index") if has_app_context() else None
+    if index is not None:
+        index.invalidate(path, recursive)
@@ -1,11 +1,11 @@
 from app import db
 from app.models.folder import Folder
+from app.services.folder_index import folder_changed, get_folder_listing
 import os
 import shutil
 from datetime import datetime
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def create_folder(id_user, nom_dossier):
@@ -43,11 +43,11 @@ def delete_folder_with_physical(folder_id, folder_name=None, user_email=None):
         if user_email:
             expected_name = user_email.split('@')[0].replace('.', '_')
             if folder_name != expected_name:
-                logger.error(f"Tentative de suppression d'un dossier non autorisé: {folder_name}")
+                logger.error("Tentative de suppression d'un dossier non autorisé: %s", folder_name)
                 raise Exception("Vous n'êtes pas autorisé à supprimer ce dossier")
         db.session.delete(folder)
         db.session.commit()
-        logger.info(f"Entrée du dossier {folder_name} supprimée de la base de données")
+        logger.info("Entrée du dossier %s supprimée de la base de données", folder_name)
     elif user_email:
         folder_name = user_email.split('@')[0].replace('.', '_')
     else:
@@ -57,71 +57,73 @@ def delete_folder_with_physical(folder_id, folder_name=None, user_email=None):
     if os.path.exists(folder_path):
         try:
             shutil.rmtree(folder_path)
-            logger.info(f"Dossier physique {folder_path} supprimé avec succès")
+            folder_changed(folder_path, recursive=True)
+            logger.info("Dossier physique %s supprimé avec succès", folder_path)
         except Exception as e:
-            logger.error(f"Erreur lors de la suppression du dossier physique {folder_path}: {str(e)}")
+            logger.error("Erreur lors de la suppression du dossier physique %s: %s", folder_path, e)
             raise Exception(f"Erreur lors de la suppression du dossier physique: {str(e)}")
     else:
-        logger.warning(f"Dossier physique {folder_path} n'existe pas")
+        logger.warning("Dossier physique %s n'existe pas", folder_path)
 
 def populate_folders_from_resources(base_resource_path):
     from app.models.user import User
-    logger.info(f"Base resource path: {base_resource_path}")
+    logger.debug("Base resource path: %s", base_resource_path)
     
-    # Step 1: Get all users and existing folders in the database
-    users = User.query.all()
-    existing_folders = Folder.query.all()
-    existing_folder_names = {f.nom_dossier for f in existing_folders}  # Folder names in DB
-    existing_folder_users = {f.id_user: f.nom_dossier for f in existing_folders}  # Map user_id to folder name
+    # Step 1: Get all users and existing folders in the database (colonnes utiles seulement)
+    users_by_folder_name = {}  # Map expected folder name to (user id, email), first user wins
+    for user_id, email in db.session.query(User.id, User.email).order_by(User.id):
+        users_by_folder_name.setdefault(email.split('@')[0].replace('.', '_'), (user_id, email))
+    existing_folders = db.session.query(Folder.id, Folder.id_user, Folder.nom_dossier).order_by(Folder.id).all()
+    existing_folder_users = {}  # Map user_id to (folder id, folder name) of the user's first folder
+    for folder_id, id_user, nom_dossier in existing_folders:
+        existing_folder_users.setdefault(id_user, (folder_id, nom_dossier))
 
     # Step 2: Get all folders in the Ressources/Utilisateur directory
     if not os.path.exists(base_resource_path):
-        logger.error(f"Le répertoire {base_resource_path} n'existe pas.")
+        logger.error("Le répertoire %s n'existe pas.", base_resource_path)
         return
 
-    resource_dirs = [d for d in os.listdir(base_resource_path) if os.path.isdir(os.path.join(base_resource_path, d))]
-    logger.info(f"Found directories in Ressources: {resource_dirs}")
+    # Lu par l'index des dossiers : Ressources est alors surveillé (voir users_with_folders_etag)
+    resource_dirs = {entry.name for entry in get_folder_listing().entries(base_resource_path) if entry.is_dir}
+    logger.debug("Found directories in Ressources: %s", resource_dirs)
 
     # Step 3: Remove entries from the folder table if the folder no longer exists in Ressources
-    for folder in existing_folders:
-        if folder.nom_dossier not in resource_dirs:
-            logger.info(f"Folder {folder.nom_dossier} no longer exists in Ressources, removing from database.")
-            db.session.delete(folder)
+    for folder_id, _, nom_dossier in existing_folders:
+        if nom_dossier not in resource_dirs:
+            logger.info("Folder %s no longer exists in Ressources, removing from database.", nom_dossier)
+            db.session.delete(db.session.get(Folder, folder_id))
 
     # Step 4: Add or update folders in the database based on Ressources
-    for folder_name in resource_dirs:
-        matching_user = None
-        for user in users:
-            user_folder_name = user.email.split('@')[0].replace('.', '_')
-            if user_folder_name == folder_name:
-                matching_user = user
-                break
+    for folder_name in sorted(resource_dirs):
+        matching_user = users_by_folder_name.get(folder_name)
 
         if matching_user:
-            folder_path = os.path.join(base_resource_path, folder_name)
-            creation_time = datetime.fromtimestamp(os.path.getctime(folder_path))
-            logger.info(f"Processing folder for user {matching_user.email}, folder: {folder_name}, creation: {creation_time}")
-
+            user_id, email = matching_user
             # Only create/update if the folder doesn't exist in the database or has a different name
-            if matching_user.id not in existing_folder_users or existing_folder_users[matching_user.id] != folder_name:
+            existing_folder_id, existing_folder_name = existing_folder_users.get(user_id, (None, None))
+            if existing_folder_name != folder_name:
+                folder_path = os.path.join(base_resource_path, folder_name)
+                creation_time = datetime.fromtimestamp(os.path.getctime(folder_path))
+                logger.debug("Processing folder for user %s, folder: %s, creation: %s", email, folder_name, creation_time)
+
                 # Delete existing folder entry for this user to avoid duplicates
-                existing_folder = Folder.query.filter_by(id_user=matching_user.id).first()
-                if existing_folder:
+                existing_folder = db.session.get(Folder, existing_folder_id) if existing_folder_id else None
+                if existing_folder and existing_folder not in db.session.deleted:
                     db.session.delete(existing_folder)
-                    logger.info(f"Removed old folder entry for user {matching_user.email} from database.")
+                    logger.info("Removed old folder entry for user %s from database.", email)
 
-                new_folder = Folder(id_user=matching_user.id, nom_dossier=folder_name)
+                new_folder = Folder(id_user=user_id, nom_dossier=folder_name)
                 new_folder.date_creation = creation_time
                 db.session.add(new_folder)
-                logger.info(f"Created/Updated folder entry for user {matching_user.email}, folder: {folder_name}")
+                logger.info("Created/Updated folder entry for user %s, folder: %s", email, folder_name)
             else:
-                logger.info(f"Folder {folder_name} already exists for user {matching_user.email}, skipping")
+                logger.debug("Folder %s already exists for user %s, skipping", folder_name, email)
         else:
-            logger.warning(f"No matching user found for folder: {folder_name}")
+            logger.warning("No matching user found for folder: %s", folder_name)
 
     try:
         db.session.commit()
-        logger.info("Folder population completed successfully")
+        logger.debug("Folder population completed successfully")
     except Exception as e:
-        logger.error(f"Error during folder population commit: {str(e)}")
+        logger.error("Error during folder population commit: %s", e)
         db.session.rollback()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""Arborescence des dossiers utilisateurs (dossiers de transfert et fichiers .dxf).
+
+Un dossier est lu en une passe avec os.scandir : le type de chaque entrée
+vient du répertoire lui-même et sa taille et sa date de modification d'un
+seul stat, mis en cache dans son DirEntry. La taille d'un dossier est la
+taille totale des fichiers de tout son sous-arbre, calculée en remontant la
+récursion.
+
+Les lectures passent par une « source » (entries, tree_size) : le disque
+(DISK_LISTING) ou l'index des dossiers (voir folder_index), qui garde en
+mémoire le contenu des dossiers déjà lus.
+
+Les liens symboliques ne sont pas suivis : un lien ne peut ni faire sortir
+du dossier utilisateur ni créer une boucle.
+"""
+import base64
+import binascii
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Entrée d'un dossier : sous-dossier (taille 0, voir tree_size) ou fichier ordinaire
+DirectoryEntry = namedtuple("DirectoryEntry", "name path is_dir size mtime")
+
+
+def encode_cursor(name):
+    """Curseur de pagination opaque : nom de la dernière entrée de la page."""
+    return base64.urlsafe_b64encode(name.encode("utf-8", "surrogateescape")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Nom encodé dans un curseur ; lève ValueError si le curseur est invalide."""
+    try:
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8", "surrogateescape")
+    except (binascii.Error, UnicodeError):
+        raise ValueError("Curseur de pagination invalide")
+
+
+def scan_directory(path):
+    """Lit un dossier : sous-dossiers et fichiers ordinaires, triés par nom.
+
+    Lève OSError si le dossier est illisible.
+    """
+    entries = []
+    with os.scandir(path) as scanned:
+        for entry in scanned:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    is_dir = True
+                elif entry.is_file(follow_symlinks=False):
+                    is_dir = False
+                else:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                # Supprimée pendant la lecture
+                continue
+            entries.append(DirectoryEntry(entry.name, entry.path, is_dir, 0 if is_dir else stat.st_size,
+                                          stat.st_mtime))
+    entries.sort()
+    return entries
+
+
+class DiskListing:
+    """Lecture directe du disque, à chaque appel."""
+
+    def entries(self, path):
+        """Entrées du dossier path, ou aucune s'il est illisible (supprimé entre-temps, droits...)."""
+        try:
+            return scan_directory(path)
+        except OSError as e:
+            logger.warning("Dossier illisible ignoré : %s (%s)", path, e)
+            return []
+
+    def tree_size(self, path):
+        """Taille totale des fichiers d'un dossier et de ses sous-dossiers, en octets."""
+        return sum(self.tree_size(entry.path) if entry.is_dir else entry.size for entry in self.entries(path))
+
+
+DISK_LISTING = DiskListing()
+
+
+def _last_modified(entry):
+    return datetime.fromtimestamp(entry.mtime).isoformat()
+
+
+def _is_listed(entry):
+    """Vrai pour les sous-dossiers et les fichiers .dxf, seules entrées décrites."""
+    return entry.is_dir or entry.name.lower().endswith(".dxf")
+
+
+def _describe(listing, entry, relative_path, depth):
+    """Décrit une entrée listée : retourne (clé "folders" ou "files", description)."""
+    rel_item_path = os.path.join(relative_path, entry.name) if relative_path else entry.name
+    if not entry.is_dir:
+        return "files", {
+            "name": entry.name,
+            "path": rel_item_path,
+            "size": entry.size,
+            "last_modified": _last_modified(entry)
+        }
+
+    folder_info = {"name": entry.name, "path": rel_item_path, "last_modified": _last_modified(entry)}
+    if depth is None or depth > 1:
+        folder_info["sub_structure"], folder_info["size"] = _scan(
+            listing, entry.path, rel_item_path, None if depth is None else depth - 1
+        )
+    else:
+        # Limite de profondeur atteinte : contenu à demander séparément (paramètre path)
+        folder_info["sub_structure"] = {"folders": [], "files": []}
+        folder_info["size"] = listing.tree_size(entry.path)
+        folder_info["truncated"] = True
+    return "folders", folder_info
+
+
+def _scan(listing, path, relative_path, depth):
+    """Décrit un dossier : retourne (structure, taille totale des fichiers de son sous-arbre)."""
+    structure = {"folders": [], "files": []}
+    total = 0
+    for entry in listing.entries(path):
+        if _is_listed(entry):
+            key, info = _describe(listing, entry, relative_path, depth)
+            structure[key].append(info)
+            total += info["size"]
+        else:
+            total += entry.size
+    return structure, total
+
+
+def get_folder_structure(base_path, relative_path="", max_depth=None, limit=None, cursor=None, listing=None):
+    """Structure du dossier relative_path de base_path : sous-dossiers et fichiers .dxf.
+
+    Les entrées sont triées par nom. max_depth limite les niveaux décrits (1 :
+    contenu direct seulement) ; au-delà, un dossier est marqué "truncated" mais
+    sa taille reste celle de tout son sous-arbre. limit pagine le contenu
+    direct : la réponse contient alors "next_cursor" (None à la dernière page),
+    à renvoyer comme cursor pour la page suivante. Seuls les sous-dossiers de
+    la page sont parcourus. listing est la source des dossiers (disque par défaut).
+
+    Lève ValueError si le curseur est invalide.
+    """
+    listing = listing or DISK_LISTING
+    after = decode_cursor(cursor) if cursor else None
+    entries = [entry for entry in listing.entries(os.path.join(base_path, relative_path))
+               if _is_listed(entry) and (after is None or entry.name > after)]
+    page = entries[:limit]
+
+    structure = {"folders": [], "files": []}
+    for entry in page:
+        key, info = _describe(listing, entry, relative_path, max_depth)
+        structure[key].append(info)
+    if limit is not None:
+        structure["next_cursor"] = encode_cursor(page[-1].name) if len(entries) > limit else None
+    return structure
@@ -0,0 +1,291 @@
+"""Stockage persistant de la géométrie DXF en base (fichiers, calques, entités).
+
+Chaque fichier du dossier d'un utilisateur est enregistré une fois par contenu :
+ses calques, puis ses entités avec leur emprise en colonnes et leurs
+coordonnées en blob float64 petit-boutiste :
+
+  - POLYLINE / LWPOLYLINE : x0, y0, x1, y1, ...
+  - LINE : x1, y1, x2, y2
+  - CIRCLE : cx, cy, r
+  - ARC : cx, cy, r, angle de début, angle de fin
+  - TEXT : x, y, hauteur (le texte lui-même est dans la colonne texte)
+
+Les entités sont insérées par lots (COPY sous PostgreSQL, INSERT multi-lignes
+sinon) : les requêtes transverses (« polylignes fermées du calque X dans tout
+le dossier ») sont ensuite de simples requêtes SQL indexées, sans relire les
+fichiers.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import struct
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models.dxf import DxfFile, DxfLayer, DxfEntity
+from app.services.extraction_cache import get_extraction_cache
+from app.services.extraction_engine import projection_variant, ENTITY_GROUPS, EXTRACTED_TYPES
+from app.services.extraction_jobs import run_extraction
+from app.services.extraction_pool import get_extraction_pool
+from app.services.spatial_service import entity_bbox
+
+logger = logging.getLogger(__name__)
+
+# Colonnes insérées en masse, dans l'ordre des lignes produites par _entity_rows
+ENTITY_COLUMNS = (
+    "id_fichier", "id_calque", "type_entite", "ferme", "couleur", "epaisseur_trait",
+    "nb_sommets", "minx", "miny", "maxx", "maxy", "geometrie", "texte"
+)
+GROUP_OF_TYPE = {dxftype: group for group, dxftypes in ENTITY_GROUPS.items() for dxftype in dxftypes}
+
+
+def _color(value):
+    return None if value == "N/A" else value
+
+
+def encode_geometry(group, entity):
+    """Coordonnées d'une entité sérialisée : retourne (blob, nombre de sommets)."""
+    if group == "polylines":
+        coords = [c for v in entity["vertices"] for c in (v["x"], v["y"])]
+        count = len(entity["vertices"])
+    elif group == "lines":
+        start, end = entity["start"], entity["end"]
+        coords = [start["x"], start["y"], end["x"], end["y"]]
+        count = 2
+    elif group == "circles":
+        coords = [entity["center"]["x"], entity["center"]["y"], entity["radius"]]
+        count = 1
+    elif group == "arcs":
+        coords = [entity["center"]["x"], entity["center"]["y"], entity["radius"],
+                  entity["start_angle"], entity["end_angle"]]
+        count = 1
+    else:
+        coords = [entity["position"]["x"], entity["position"]["y"], entity["height"] or 0.0]
+        count = 1
+    return struct.pack(f"<{len(coords)}d", *coords), count
+
+
+def decode_geometry(type_entite, geometrie, ferme=False, texte=None):
+    """Inverse de encode_geometry : champs géométriques de l'entité, au format de l'extraction."""
+    values = struct.unpack(f"<{len(geometrie) // 8}d", geometrie)
+    group = GROUP_OF_TYPE[type_entite]
+    if group == "polylines":
+        return {
+            "vertices": [{"x": values[i], "y": values[i + 1]} for i in range(0, len(values), 2)],
+            "closed": bool(ferme)
+        }
+    if group == "lines":
+        return {"start": {"x": values[0], "y": values[1]}, "end": {"x": values[2], "y": values[3]}}
+    if group == "circles":
+        return {"center": {"x": values[0], "y": values[1]}, "radius": values[2]}
+    if group == "arcs":
+        return {"center": {"x": values[0], "y": values[1]}, "radius": values[2],
+                "start_angle": values[3], "end_angle": values[4]}
+    return {"text": texte or "", "position": {"x": values[0], "y": values[1]}, "height": values[2]}
+
+
+def _entity_rows(result, file_id, layer_ids):
+    """Lignes (dans l'ordre de ENTITY_COLUMNS) des entités d'un résultat d'extraction.
+
+    Les entités sans géométrie (polyligne sans sommet) ne sont pas enregistrées.
+    """
+    for group in ENTITY_GROUPS:
+        for entity in result.get(group, ()):
+            bbox = entity_bbox(group, entity)
+            if bbox is None:
+                continue
+            geometrie, count = encode_geometry(group, entity)
+            yield (
+                file_id, layer_ids[entity["layer"]], entity["type"], bool(entity.get("closed", False)),
+                _color(entity["color"]), entity["lineweight"], count, *bbox,
+                geometrie, entity["text"] if group == "texts" else None
+            )
+
+
+def _copy_rows(rows, batch_size):
+    """Insère les lignes avec COPY ... FROM STDIN (PostgreSQL / psycopg2), par lots."""
+    cursor = db.session.connection().connection.cursor()
+    sql = f"COPY {DxfEntity.__tablename__} ({', '.join(ENTITY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    blob = ENTITY_COLUMNS.index("geometrie")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    try:
+        for row in rows:
+            row = list(row)
+            row[blob] = "\\x" + row[blob].hex()
+            writer.writerow(row)
+            pending += 1
+            if pending >= batch_size:
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if pending:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_rows(rows, batch_size):
+    """Insère les lignes par lots d'INSERT multi-lignes (autres bases)."""
+    table = DxfEntity.__table__
+    batch = []
+    for row in rows:
+        batch.append(dict(zip(ENTITY_COLUMNS, row)))
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def _bulk_insert(rows):
+    batch_size = current_app.config["GEOMETRY_STORE_BATCH_SIZE"]
+    dialect = db.session.get_bind().dialect
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        _copy_rows(rows, batch_size)
+    else:
+        _insert_rows(rows, batch_size)
+
+
+def _delete_content(file_id):
+    DxfEntity.query.filter_by(id_fichier=file_id).delete(synchronize_session=False)
+    DxfLayer.query.filter_by(id_fichier=file_id).delete(synchronize_session=False)
+
+
+def relative_name(root, file_path):
+    """Chemin d'un fichier relatif au dossier utilisateur, séparateur "/"."""
+    return os.path.relpath(file_path, root).replace(os.sep, "/")
+
+
+def ingest_file(user_id, root, file_path, payload=None):
+    """Enregistre la géométrie d'un fichier du dossier utilisateur root.
+
+    payload est le résultat d'extraction complet déjà encodé, s'il est connu ;
+    sinon il est lu dans le cache d'extraction (ou extrait). Retourne
+    (DxfFile, True) si le fichier a été (ré)enregistré, (DxfFile, False) s'il
+    l'était déjà avec le même contenu.
+    """
+    cache = get_extraction_cache()
+    content_hash = cache.content_hash(file_path)
+    chemin = relative_name(root, file_path)
+    dxf_file = DxfFile.query.filter_by(id_user=user_id, chemin=chemin).first()
+    if dxf_file is not None and dxf_file.hash_contenu == content_hash:
+        return dxf_file, False
+
+    if payload is None:
+        variant = projection_variant(EXTRACTED_TYPES, "full")
+        payload = cache.get(content_hash, variant)
+        if payload is None:
+            payload = run_extraction(cache, get_extraction_pool(), content_hash, file_path,
+                                     EXTRACTED_TYPES, "full", variant)
+    result = json.loads(payload)
+
+    try:
+        if dxf_file is None:
+            dxf_file = DxfFile(user_id, chemin, content_hash, os.path.getsize(file_path))
+            db.session.add(dxf_file)
+            db.session.flush()
+        else:
+            _delete_content(dxf_file.id)
+            dxf_file.hash_contenu = content_hash
+            dxf_file.taille = os.path.getsize(file_path)
+            dxf_file.date_ingestion = datetime.utcnow()
+
+        # Calques de la table LAYER, puis ceux référencés par les entités seulement
+        layers = {}
+        for layer in result.get("layers", ()):
+            layers.setdefault(layer["name"], DxfLayer(dxf_file.id, layer["name"], _color(layer["color"]),
+                                                      layer["lineweight"]))
+        for group in ENTITY_GROUPS:
+            for entity in result.get(group, ()):
+                if entity["layer"] not in layers:
+                    layers[entity["layer"]] = DxfLayer(dxf_file.id, entity["layer"])
+        db.session.add_all(layers.values())
+        db.session.flush()
+        layer_ids = {name: layer.id for name, layer in layers.items()}
+
+        extent = [float("inf"), float("inf"), float("-inf"), float("-inf")]
+        count = 0
+
+        def rows():
+            nonlocal count
+            for row in _entity_rows(result, dxf_file.id, layer_ids):
+                count += 1
+                extent[0] = min(extent[0], row[7])
+                extent[1] = min(extent[1], row[8])
+                extent[2] = max(extent[2], row[9])
+                extent[3] = max(extent[3], row[10])
+                yield row
+
+        _bulk_insert(rows())
+        dxf_file.nb_entites = count
+        dxf_file.minx, dxf_file.miny, dxf_file.maxx, dxf_file.maxy = extent if count else (None,) * 4
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.debug("Géométrie enregistrée : %s (%s entités)", chemin, count)
+    return dxf_file, True
+
+
+def prune_folder(user_id, root, folder_path, paths):
+    """Supprime les fichiers enregistrés sous folder_path qui n'y existent plus (paths : fichiers présents)."""
+    present = {relative_name(root, path) for path in paths}
+    query = DxfFile.query.filter_by(id_user=user_id)
+    prefix = relative_name(root, folder_path)
+    if prefix != ".":
+        query = query.filter(DxfFile.chemin.startswith(prefix + "/", autoescape=True))
+    removed = 0
+    for dxf_file in query.all():
+        if dxf_file.chemin not in present:
+            _delete_content(dxf_file.id)
+            db.session.delete(dxf_file)
+            removed += 1
+    db.session.commit()
+    return removed
+
+
+def query_entities(user_id, folder=None, layers=None, types=None, closed=None, bbox=None, limit=1000):
+    """Entités enregistrées d'un utilisateur selon les filtres, en une requête SQL indexée.
+
+    folder restreint aux fichiers d'un sous-dossier (relatif au dossier
+    utilisateur), layers aux noms de calques, types aux types DXF, closed aux
+    polylignes fermées (True) ou ouvertes (False), bbox [minx, miny, maxx, maxy]
+    aux entités dont l'emprise l'intersecte. Retourne (entités, tronqué).
+    """
+    query = (
+        db.session.query(DxfEntity, DxfLayer.nom, DxfFile.chemin)
+        .join(DxfLayer, DxfEntity.id_calque == DxfLayer.id)
+        .join(DxfFile, DxfEntity.id_fichier == DxfFile.id)
+        .filter(DxfFile.id_user == user_id)
+    )
+    folder = (folder or "").strip("/")
+    if folder:
+        query = query.filter(DxfFile.chemin.startswith(folder + "/", autoescape=True))
+    if layers:
+        query = query.filter(DxfLayer.nom.in_(layers))
+    if types:
+        query = query.filter(DxfEntity.type_entite.in_(types))
+    if closed is not None:
+        query = query.filter(DxfEntity.ferme == closed)
+    if bbox is not None:
+        query = query.filter(
+            DxfEntity.minx <= bbox[2], DxfEntity.maxx >= bbox[0],
+            DxfEntity.miny <= bbox[3], DxfEntity.maxy >= bbox[1]
+        )
+    rows = query.order_by(DxfFile.chemin, DxfEntity.id).limit(limit + 1).all()
+
+    entities = []
+    for entity, layer, chemin in rows[:limit]:
+        data = {"file": chemin, "type": entity.type_entite, "layer": layer}
+        data.update(decode_geometry(entity.type_entite, entity.geometrie, entity.ferme, entity.texte))
+        data["color"] = entity.couleur if entity.couleur is not None else "N/A"
+        data["lineweight"] = entity.epaisseur_trait
+        entities.append(data)
+    return entities, len(rows) > limit
@@ -0,0 +1,252 @@
+"""Tâches d'extraction asynchrones : soumission, suivi de l'avancement et résultats stockés.
+
+Les plans volumineux dépassent souvent le délai des proxys en extraction
+synchrone. Une tâche est enregistrée dans un index SQLite local (partagé entre
+les workers Flask), exécutée en arrière-plan par le pool d'extraction, et son
+résultat est conservé sur le disque pendant EXTRACTION_JOB_RETENTION secondes :
+il peut être relu autant de fois que nécessaire sans nouvelle extraction.
+
+États : queued -> running -> done | error.
+"""
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from app.services.extraction_cache import get_extraction_cache
+from app.services.extraction_jobs import run_extraction
+from app.services.extraction_pool import get_extraction_pool, PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+# Délai avant une nouvelle tentative quand le pool d'extraction est saturé
+SATURATED_RETRY_DELAY = 1.0
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobStore:
+    """Index SQLite des tâches et fichiers associés (uploads en attente, résultats)."""
+
+    def __init__(self, jobs_dir, retention):
+        self.jobs_dir = jobs_dir
+        self.upload_dir = os.path.join(jobs_dir, "uploads")
+        self.result_dir = os.path.join(jobs_dir, "results")
+        self.retention = retention
+        self.db_path = os.path.join(jobs_dir, "jobs.sqlite3")
+        self._local = threading.local()
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.result_dir, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        """Retourne une connexion SQLite propre au thread courant."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, owner TEXT NOT NULL, filename TEXT NOT NULL, "
+            "source_path TEXT NOT NULL, owns_source INTEGER NOT NULL, "
+            "types TEXT NOT NULL, fields TEXT NOT NULL, "
+            "content_hash TEXT NOT NULL, variant TEXT NOT NULL, "
+            "status TEXT NOT NULL, processed INTEGER NOT NULL DEFAULT 0, "
+            "result_size INTEGER, error TEXT, pid INTEGER, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+
+    def upload_path(self, job_id):
+        return os.path.join(self.upload_dir, f"{job_id}.dxf")
+
+    def result_path(self, job_id):
+        return os.path.join(self.result_dir, f"{job_id}.json")
+
+    def create(self, job_id, owner, filename, source_path, owns_source, types, fields, content_hash, variant):
+        self._connect().execute(
+            "INSERT INTO jobs (id, owner, filename, source_path, owns_source, types, fields, "
+            "content_hash, variant, status, pid, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, str(owner), filename, source_path, int(owns_source), ",".join(types), fields,
+             content_hash, variant, os.getpid(), time.time())
+        )
+
+    def get(self, job_id):
+        """Retourne la tâche (dictionnaire) ou None.
+
+        Une tâche restée en cours alors que le processus qui l'exécutait n'existe
+        plus (redémarrage du serveur) est marquée en erreur.
+        """
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] in ("queued", "running") and not _pid_alive(job["pid"]):
+            self.fail(job_id, "Tâche interrompue par un redémarrage du serveur")
+            return self.get(job_id)
+        return job
+
+    def update(self, job_id, **values):
+        columns = ", ".join(f"{name} = ?" for name in values)
+        self._connect().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*values.values(), job_id))
+
+    def store_result(self, job_id, payload):
+        """Enregistre le résultat de manière atomique et marque la tâche terminée."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.result_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.result_path(job_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.update(job_id, status="done", result_size=len(payload), finished_at=time.time())
+
+    def fail(self, job_id, error):
+        self.update(job_id, status="error", error=error, finished_at=time.time())
+
+    def read_result(self, job_id):
+        try:
+            with open(self.result_path(job_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def purge(self):
+        """Supprime les tâches terminées depuis plus de retention secondes."""
+        conn = self._connect()
+        expired = conn.execute(
+            "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - self.retention,)
+        ).fetchall()
+        for row in expired:
+            for path in (self.result_path(row["id"]), self.upload_path(row["id"])):
+                if os.path.exists(path):
+                    os.unlink(path)
+            conn.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        if expired:
+            logger.debug("%s tâches d'extraction expirées supprimées", len(expired))
+
+
+class JobService:
+    """Soumet les tâches d'extraction et les exécute en arrière-plan."""
+
+    def __init__(self, app, store, max_running):
+        self.app = app
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max(max_running, 1), thread_name_prefix="extraction-job")
+
+    def submit(self, owner, filename, types, fields, variant, file_path=None, upload=None):
+        """Crée une tâche pour un fichier du disque ou un upload, et retourne la tâche.
+
+        Si le résultat est déjà dans le cache d'extraction, la tâche est
+        terminée immédiatement, sans nouvelle extraction.
+        """
+        self.store.purge()
+        job_id = uuid.uuid4().hex
+        cache = get_extraction_cache()
+
+        if upload is not None:
+            # L'upload doit survivre à la requête : il est conservé jusqu'à la fin de la tâche
+            source_path = self.store.upload_path(job_id)
+            content_hash = cache.stream_hash(upload.stream)
+            with open(source_path, "wb") as f:
+                shutil.copyfileobj(upload.stream, f)
+        else:
+            source_path = file_path
+            content_hash = cache.content_hash(file_path)
+
+        self.store.create(job_id, owner, filename, source_path, upload is not None,
+                          types, fields, content_hash, variant)
+
+        payload = cache.get(content_hash, variant)
+        if payload is not None:
+            logger.debug("Tâche %s servie depuis le cache d'extraction", job_id)
+            self.store.store_result(job_id, payload)
+            self._release_source(job_id)
+        else:
+            self._executor.submit(self._run, job_id)
+        return self.store.get(job_id)
+
+    def _release_source(self, job_id):
+        job = self.store.get(job_id)
+        if job["owns_source"] and os.path.exists(job["source_path"]):
+            os.unlink(job["source_path"])
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            store = self.store
+            job = store.get(job_id)
+            types = tuple(job["types"].split(","))
+            store.update(job_id, status="running", started_at=time.time())
+            logger.debug("Tâche d'extraction démarrée : %s", job_id)
+            try:
+                while True:
+                    try:
+                        payload = run_extraction(
+                            get_extraction_cache(), get_extraction_pool(), job["content_hash"],
+                            job["source_path"], types, job["fields"], job["variant"],
+                            progress=lambda processed: store.update(job_id, processed=processed)
+                        )
+                        break
+                    except PoolSaturatedError:
+                        time.sleep(SATURATED_RETRY_DELAY)
+                store.store_result(job_id, payload)
+                logger.debug("Tâche d'extraction terminée : %s", job_id)
+            except Exception as e:
+                logger.error("Échec de la tâche d'extraction %s : %s", job_id, e)
+                store.fail(job_id, str(e))
+            finally:
+                self._release_source(job_id)
+
+
+def get_job_service():
+    """Retourne le service de tâches associé à l'application courante."""
+    service = current_app.extensions.get("extraction_jobs")
+    if service is None:
+        store = JobStore(
+            current_app.config["EXTRACTION_JOBS_FOLDER"],
+            current_app.config["EXTRACTION_JOB_RETENTION"]
+        )
+        service = JobService(current_app._get_current_object(), store, current_app.config["EXTRACTION_POOL_SIZE"])
+        current_app.extensions["extraction_jobs"] = service
+    return service
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def job_status(job):
+    """Représentation publique d'une tâche pour l'API."""
+    return {
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "processed_entities": job["processed"],
+        "result_size": job["result_size"],
+        "error": job["error"],
+        "created_at": _isoformat(job["created_at"]),
+        "started_at": _isoformat(job["started_at"]),
+        "finished_at": _isoformat(job["finished_at"])
+    }
@@ -0,0 +1,174 @@
+"""Statistiques par calque calculées en une seule passe, sans entités sérialisées.
+
+Les entités lues dans le flux sont converties par lots en géométrie compacte
+(BlockGeometry, comme les références de blocs) dont les colonnes sont
+accumulées telles quelles ; les totaux par calque sont calculés à la fin avec
+NumPy (bincount, reduceat) :
+  - nombre d'entités de chaque groupe ;
+  - longueur des lignes, périmètre des polylignes (segments en arc compris),
+    longueur des arcs ;
+  - aire des polylignes fermées, des cercles et des secteurs d'arc ;
+  - emprise des entités du calque (sommets des polylignes, cercles et arcs
+    exacts, point d'insertion des textes).
+"""
+import math
+import numpy as np
+from app.services.blocks import BlockGeometry, GROUP_ARRAYS
+from app.services.surface_service import ring_areas, CLOSURE_TOLERANCE
+
+# Nombre d'entités converties ensemble en géométrie compacte
+ENTITY_BATCH_SIZE = 10000
+
+# Clé du nombre d'entités de chaque groupe (mêmes clés que les statistiques globales)
+COUNT_KEYS = {
+    "polylines": "polyline_count",
+    "lines": "line_count",
+    "circles": "circle_count",
+    "arcs": "arc_count",
+    "texts": "text_count"
+}
+
+
+class LayerStatistics:
+    """Accumule les entités d'un fichier et calcule les mesures de chaque calque."""
+
+    def __init__(self):
+        self.layer_index = {}
+        self.pending = []
+        self.columns = {group: {name: [] for name in GROUP_ARRAYS[group] + ("layer",)} for group in GROUP_ARRAYS}
+
+    def _layer(self, name):
+        index = self.layer_index.get(name)
+        if index is None:
+            index = self.layer_index[name] = len(self.layer_index)
+        return index
+
+    def add_layer(self, name):
+        """Déclare un calque de la table LAYER (présent dans le résultat même sans entité)."""
+        self._layer(name)
+
+    def add_entity(self, entity):
+        self.pending.append(entity)
+        if len(self.pending) >= ENTITY_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.add_geometry(BlockGeometry.from_entities(self.pending))
+            self.pending = []
+
+    def add_geometry(self, geometry):
+        """Ajoute une géométrie compacte (lot d'entités ou référence de bloc développée)."""
+        for group, data in geometry.groups.items():
+            if not data["type"]:
+                continue
+            columns = self.columns[group]
+            columns["layer"].append(np.fromiter((self._layer(name) for name in data["layer"]),
+                                                dtype=np.int64, count=len(data["layer"])))
+            for name in GROUP_ARRAYS[group]:
+                columns[name].append(data[name])
+
+    def _column(self, group, name):
+        parts = self.columns[group][name]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def summary(self):
+        """Mesures de chaque calque, dans l'ordre de première apparition."""
+        self._flush()
+        count = len(self.layer_index)
+        totals = {
+            key: np.bincount(self._column(group, "layer"), minlength=count) for group, key in COUNT_KEYS.items()
+        }
+        sums = {key: np.zeros(count) for key in
+                ("line_length", "polyline_length", "polyline_area", "circle_area", "arc_length", "arc_area")}
+        closed_counts = np.zeros(count, dtype=np.int64)
+        extent = np.array([[np.inf] * count, [np.inf] * count, [-np.inf] * count, [-np.inf] * count])
+
+        def add_extent(layers, minx, miny, maxx, maxy):
+            np.minimum.at(extent[0], layers, minx)
+            np.minimum.at(extent[1], layers, miny)
+            np.maximum.at(extent[2], layers, maxx)
+            np.maximum.at(extent[3], layers, maxy)
+
+        layers = self._column("lines", "layer")
+        if len(layers):
+            coords = self._column("lines", "coords").reshape(-1, 4)
+            lengths = np.hypot(coords[:, 2] - coords[:, 0], coords[:, 3] - coords[:, 1])
+            sums["line_length"] = np.bincount(layers, lengths, minlength=count)
+            add_extent(layers, np.minimum(coords[:, 0], coords[:, 2]), np.minimum(coords[:, 1], coords[:, 3]),
+                       np.maximum(coords[:, 0], coords[:, 2]), np.maximum(coords[:, 1], coords[:, 3]))
+
+        layers = self._column("polylines", "layer")
+        sizes = self._column("polylines", "lengths")
+        if (sizes > 0).any():
+            # Les polylignes sans sommet sont comptées mais n'ont aucune mesure
+            keep = sizes > 0
+            layers, sizes = layers[keep], sizes[keep]
+            closed = self._column("polylines", "closed")[keep]
+            coords = self._column("polylines", "coords")
+            bulges = self._column("polylines", "bulges")
+            offsets = np.concatenate(([0], np.cumsum(sizes)))
+            starts, ends = offsets[:-1], offsets[1:]
+
+            following = np.arange(1, len(coords) + 1)
+            following[ends - 1] = starts
+            chords = np.hypot(*(coords[following] - coords).T)
+            # Longueur d'un segment en arc : corde * θ / (2 sin(θ/2)), θ = 4 atan(bulge)
+            arc_mask = bulges != 0
+            theta = 4.0 * np.arctan(np.abs(bulges[arc_mask]))
+            chords[arc_mask] *= theta / (2.0 * np.sin(theta / 2.0))
+            # Une polyligne ouverte n'a pas de segment de retour au premier sommet
+            chords[(ends - 1)[~closed]] = 0.0
+            perimeters = np.add.reduceat(chords, starts)
+            sums["polyline_length"] = np.bincount(layers, perimeters, minlength=count)
+
+            # Fermée par son drapeau ou « à la main » (dernier sommet sur le premier)
+            closed = closed | ((sizes > 2) & (np.abs(coords[starts] - coords[ends - 1]).max(axis=1)
+                                              <= CLOSURE_TOLERANCE))
+            areas = np.abs(ring_areas(coords, bulges, offsets)) * closed
+            sums["polyline_area"] = np.bincount(layers, areas, minlength=count)
+            closed_counts = np.bincount(layers[closed], minlength=count)
+            add_extent(layers, np.minimum.reduceat(coords[:, 0], starts), np.minimum.reduceat(coords[:, 1], starts),
+                       np.maximum.reduceat(coords[:, 0], starts), np.maximum.reduceat(coords[:, 1], starts))
+
+        layers = self._column("circles", "layer")
+        if len(layers):
+            center = self._column("circles", "center")
+            radius = self._column("circles", "radius")
+            sums["circle_area"] = np.bincount(layers, math.pi * radius ** 2, minlength=count)
+            add_extent(layers, center[:, 0] - radius, center[:, 1] - radius,
+                       center[:, 0] + radius, center[:, 1] + radius)
+
+        layers = self._column("arcs", "layer")
+        if len(layers):
+            center = self._column("arcs", "center")
+            radius = self._column("arcs", "radius")
+            start = self._column("arcs", "start_angle") % 360.0
+            sweep = (self._column("arcs", "end_angle") - start) % 360.0
+            sums["arc_length"] = np.bincount(layers, radius * np.radians(sweep), minlength=count)
+            sums["arc_area"] = np.bincount(layers, radius ** 2 * np.radians(sweep) / 2.0, minlength=count)
+            # Emprise : extrémités de l'arc et points cardinaux qu'il traverse
+            angles = [start, start + sweep] + [np.where((quadrant - start) % 360.0 <= sweep, quadrant, start)
+                                               for quadrant in (0.0, 90.0, 180.0, 270.0)]
+            xs = center[:, 0] + radius * np.cos(np.radians(angles))
+            ys = center[:, 1] + radius * np.sin(np.radians(angles))
+            add_extent(layers, xs.min(axis=0), ys.min(axis=0), xs.max(axis=0), ys.max(axis=0))
+
+        layers = self._column("texts", "layer")
+        if len(layers):
+            position = self._column("texts", "position")
+            add_extent(layers, position[:, 0], position[:, 1], position[:, 0], position[:, 1])
+
+        entries = []
+        for name, index in self.layer_index.items():
+            entry = {"name": name}
+            for key, values in totals.items():
+                entry[key] = int(values[index])
+            entry["entity_count"] = sum(entry[key] for key in COUNT_KEYS.values())
+            entry["closed_polyline_count"] = int(closed_counts[index])
+            for key, values in sums.items():
+                entry[key] = float(values[index])
+            bounds = extent[:, index]
+            entry["extent"] = bounds.tolist() if bounds[0] <= bounds[2] else None
+            entries.append(entry)
+        return entries
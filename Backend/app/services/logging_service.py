@@ -0,0 +1,172 @@
+"""Journalisation de l'application, configurée une fois par init_logging (dans create_app).
+
+- Les modules se contentent de logging.getLogger(__name__) et passent leurs
+  valeurs en arguments ("... : %s", valeur) : un message sous le niveau du
+  module ne coûte qu'une comparaison, rien n'est formaté.
+- Les enregistrements sont mis en file (QueueHandler) ; un thread dédié
+  (QueueListener) les formate et les écrit sur la sortie d'erreur ou dans
+  LOG_FILE. Une requête n'attend jamais une écriture de journal. Avec
+  LOG_QUEUE désactivé, l'écriture se fait dans le thread appelant.
+- LOG_LEVEL fixe le niveau par défaut, LOG_LEVELS celui de modules
+  particuliers ("app.services.file_service=DEBUG,werkzeug=WARNING").
+- Les messages DEBUG répétés sont échantillonnés : pour chaque message (même
+  texte avant formatage), seul un sur LOG_DEBUG_SAMPLE_RATE est gardé.
+
+Après un fork (workers préchargés du serveur WSGI, processus du pool
+d'extraction), le thread d'écriture est redémarré dans le processus enfant.
+"""
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(process)d] %(name)s : %(message)s"
+
+# Nombre maximal de messages distincts suivis par l'échantillonnage (au-delà, les compteurs repartent)
+SAMPLING_MAX_MESSAGES = 10000
+
+# Configuration en place dans ce processus : (handler installé sur la racine, listener ou None)
+_installed = None
+_lock = threading.Lock()
+
+
+def parse_levels(value):
+    """Lit LOG_LEVELS : {module: niveau}. Lève ValueError si un niveau est inconnu."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, sep, level = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Niveau de journalisation invalide : {item} (attendu : module=NIVEAU)")
+        levels[name.strip()] = parse_level(level)
+    return levels
+
+
+def parse_level(value):
+    """Niveau de journalisation d'après son nom (DEBUG, INFO...) ou sa valeur numérique."""
+    value = str(value).strip().upper()
+    level = int(value) if value.isdigit() else logging.getLevelName(value)
+    if not isinstance(level, int):
+        raise ValueError(f"Niveau de journalisation inconnu : {value}")
+    return level
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Garde le premier enregistrement DEBUG de chaque message puis un sur rate.
+
+    Le message est identifié par son texte avant formatage (record.msg) : les
+    appels paresseux ("... : %s", valeur) forment un seul message quelle que
+    soit la valeur.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.name, record.msg)
+        counter = self._counters.get(key)
+        if counter is None:
+            if len(self._counters) >= SAMPLING_MAX_MESSAGES:
+                self._counters.clear()
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.rate == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Met les enregistrements en file tels quels : le formatage (message, trace
+    d'exception) se fait dans le thread d'écriture.
+
+    La file ne quitte pas le processus : rien n'a besoin d'être sérialisé. Les
+    arguments sont formatés après coup ; les appelants passent des valeurs qui
+    ne changent plus (chaînes, nombres, exceptions).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _output_handlers(config):
+    handler = logging.FileHandler(config["LOG_FILE"], encoding="utf-8") if config["LOG_FILE"] \
+        else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return [handler]
+
+
+def _uninstall():
+    """Retire la configuration en place (handler de la racine, thread d'écriture)."""
+    global _installed
+    if _installed is None:
+        return
+    handler, listener = _installed
+    logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for output in listener.handlers:
+            output.close()
+    else:
+        handler.close()
+    _installed = None
+
+
+def init_logging(app):
+    """Configure la journalisation du processus d'après la configuration de app.
+
+    Remplace toute configuration précédente (appel répété de create_app), y
+    compris les handlers posés par logging.basicConfig.
+    """
+    global _installed
+    config = app.config
+    level = parse_level(config["LOG_LEVEL"])
+    levels = parse_levels(config["LOG_LEVELS"])
+
+    with _lock:
+        _uninstall()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(level)
+        for name, module_level in levels.items():
+            logging.getLogger(name).setLevel(module_level)
+
+        outputs = _output_handlers(config)
+        if config["LOG_QUEUE"]:
+            handler = DeferredQueueHandler(queue.SimpleQueue())
+            listener = logging.handlers.QueueListener(handler.queue, *outputs, respect_handler_level=True)
+            listener.start()
+        else:
+            handler, listener = outputs[0], None
+        if config["LOG_DEBUG_SAMPLE_RATE"] > 1:
+            handler.addFilter(DebugSamplingFilter(config["LOG_DEBUG_SAMPLE_RATE"]))
+        root.addHandler(handler)
+        _installed = (handler, listener)
+
+
+def flush_logging():
+    """Attend l'écriture des enregistrements en file (fin du processus)."""
+    with _lock:
+        _uninstall()
+
+
+def _restart_after_fork():
+    # Le thread d'écriture n'existe pas dans l'enfant : nouvelle file, nouveau thread
+    global _installed, _lock
+    _lock = threading.Lock()
+    if _installed is None or _installed[1] is None:
+        return
+    handler, listener = _installed
+    handler.queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(handler.queue, *listener.handlers, respect_handler_level=True)
+    listener.start()
+    _installed = (handler, listener)
+
+
+atexit.register(flush_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,134 @@
+"""Pré-extraction en arrière-plan des fichiers DXF déposés (upload, transfert).
+
+Dès qu'un fichier est enregistré, son extraction complète, ses variantes
+calques et statistiques, son index spatial et sa pyramide de tuiles sont
+calculés en une seule lecture et mis en cache par contenu : la première
+ouverture est aussi rapide qu'une ouverture suivante. Si le propriétaire du
+fichier est connu, sa géométrie est aussi enregistrée en base (geometry_store).
+
+La concurrence est bornée (EXTRACTION_PREFETCH_WORKERS tâches, en dessous de la
+taille du pool d'extraction) et la file d'attente limitée : une rafale de
+dépôts ne prive pas les requêtes interactives de processus d'extraction. Les
+fichiers au-delà de la file sont simplement extraits à leur première ouverture.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.services.extraction_cache import get_extraction_cache
+from app.services.extraction_engine import projection_variant, EXTRACTED_TYPES
+from app.services.extraction_jobs import prefetch_file
+from app.services.extraction_pool import get_extraction_pool, ExtractionPoolError, ExtractionJobError, PoolSaturatedError
+from app.services.geometry_store import ingest_file
+from app.services.spatial_service import SPATIAL_VARIANT
+from app.services.tile_service import archive_path, open_tile_archive
+
+logger = logging.getLogger(__name__)
+
+# Délai avant une nouvelle tentative quand le pool d'extraction est saturé
+SATURATED_RETRY_DELAY = 1.0
+
+FULL_VARIANT = projection_variant(EXTRACTED_TYPES, "full")
+PREFETCH_VARIANTS = (
+    FULL_VARIANT,
+    projection_variant(EXTRACTED_TYPES, "layers"),
+    projection_variant(EXTRACTED_TYPES, "stats"),
+    SPATIAL_VARIANT
+)
+
+
+class PrefetchService:
+    """File bornée de pré-extractions exécutées dans le pool d'extraction."""
+
+    def __init__(self, app, max_workers, max_pending, tiles, tiles_max_zoom, tiles_timeout, ingest):
+        self.app = app
+        self.max_pending = max_pending
+        self.tiles = tiles
+        self.tiles_max_zoom = tiles_max_zoom
+        self.tiles_timeout = tiles_timeout
+        self.ingest = ingest
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="extraction-prefetch")
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, file_path, owner=None, root=None):
+        """Met un fichier en file de pré-extraction ; retourne False si la file est pleine.
+
+        owner (identifiant utilisateur) et root (dossier de l'utilisateur)
+        permettent d'enregistrer la géométrie du fichier en base.
+        """
+        with self._lock:
+            if file_path in self._pending:
+                return True
+            if len(self._pending) >= self.max_pending:
+                logger.warning("File de pré-extraction pleine, fichier ignoré : %s", file_path)
+                return False
+            self._pending.add(file_path)
+        self._executor.submit(self._run, file_path, owner, root)
+        return True
+
+    def is_pending(self, file_path):
+        with self._lock:
+            return file_path in self._pending
+
+    def _run(self, file_path, owner, root):
+        with self.app.app_context():
+            try:
+                payloads = self._prefetch(file_path)
+                if self.ingest and owner is not None:
+                    ingest_file(owner, root, file_path, payloads.get(FULL_VARIANT))
+            except (ExtractionPoolError, ExtractionJobError) as e:
+                logger.error("Échec de la pré-extraction de %s : %s", file_path, e)
+            except Exception as e:
+                logger.error("Erreur lors de la pré-extraction de %s : %s", file_path, e, exc_info=True)
+            finally:
+                with self._lock:
+                    self._pending.discard(file_path)
+
+    def _prefetch(self, file_path):
+        """Calcule et met en cache les variantes manquantes ; retourne les résultats calculés."""
+        cache = get_extraction_cache()
+        content_hash = cache.content_hash(file_path)
+        missing = [variant for variant in PREFETCH_VARIANTS if not cache.contains(content_hash, variant)]
+        tiles_path = None
+        if self.tiles:
+            archive = open_tile_archive(archive_path(file_path))
+            if archive is None or archive.content_hash != content_hash:
+                tiles_path = archive_path(file_path)
+        if not missing and tiles_path is None:
+            logger.debug("Pré-extraction inutile, déjà en cache : %s", file_path)
+            return {}
+
+        started = time.monotonic()
+        while True:
+            try:
+                payloads = get_extraction_pool().run(
+                    prefetch_file, file_path, tiles_path, content_hash, self.tiles_max_zoom,
+                    timeout=self.tiles_timeout if tiles_path else None
+                )
+                break
+            except PoolSaturatedError:
+                time.sleep(SATURATED_RETRY_DELAY)
+        for variant, payload in payloads.items():
+            cache.put(content_hash, variant, payload)
+        logger.debug("Pré-extraction terminée en %.1f s : %s", time.monotonic() - started, file_path)
+        return payloads
+
+
+def get_prefetch_service():
+    """Retourne le service de pré-extraction associé à l'application courante."""
+    service = current_app.extensions.get("extraction_prefetch")
+    if service is None:
+        config = current_app.config
+        service = PrefetchService(
+            current_app._get_current_object(),
+            config["EXTRACTION_PREFETCH_WORKERS"],
+            config["EXTRACTION_PREFETCH_QUEUE"],
+            config["EXTRACTION_PREFETCH_TILES"],
+            config["TILES_MAX_ZOOM"],
+            config["TILES_BUILD_TIMEOUT"],
+            config["GEOMETRY_STORE_INGEST"]
+        )
+        current_app.extensions["extraction_prefetch"] = service
+    return service
@@ -0,0 +1,219 @@
+"""Couche de réponse HTTP : JSON rapide, compression négociée et requêtes conditionnelles.
+
+- jsonify, les ressources Flask-RESTx et les résultats d'extraction mis en
+  cache sont encodés avec orjson s'il est installé (json sinon).
+- Les réponses compressibles sont compressées selon l'en-tête Accept-Encoding
+  (zstd, br ou gzip, selon les bibliothèques installées), au fil de l'eau pour
+  les réponses en flux (NDJSON).
+- Les résultats d'extraction servis depuis le cache ne sont compressés qu'une
+  fois : les octets compressés sont eux-mêmes mis en cache (voir cache_response).
+- Les réponses dont le contenu est connu d'avance (résultat d'extraction d'un
+  contenu donné, arborescence d'une génération donnée) portent un ETag fort :
+  une requête GET avec If-None-Match reçoit 304 sans que le corps soit calculé
+  (voir not_modified).
+"""
+import gzip
+import hashlib
+import json
+import zlib
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+from app.services.timing_service import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Types de contenu compressés (les tuiles, lues par plages dans leur archive, ne le sont pas)
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "application/vnd.gexpertise.columnar"}
+
+# Niveaux de compression : rapides, la compression se fait pendant la requête
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+# Encodages proposés, par ordre de préférence à qualité égale côté client
+ENCODINGS = tuple(
+    encoding for encoding, available in (("zstd", zstandard), ("br", brotli), ("gzip", zlib)) if available
+)
+
+if orjson is not None:
+    ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                      | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def dumps(obj):
+    """Sérialise obj en JSON compact (octets UTF-8)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Type non pris en charge par orjson (entier hors 64 bits...) : json décide
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON de Flask (jsonify) encodant avec orjson quand il est disponible.
+
+    Les dates et dataclasses restent confiées à DefaultJSONProvider.default,
+    pour un résultat identique au fournisseur par défaut.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with stage("serialize"):
+            return self._dumps(obj, **kwargs)
+
+    def _dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"separators", "indent"}:
+            return super().dumps(obj, **kwargs)
+        option = ORJSON_OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+
+def output_json(data, code, headers=None):
+    """Représentation JSON des ressources Flask-RESTx, par le fournisseur JSON de l'application."""
+    response = current_app.response_class(
+        current_app.json.dumps(data) + "\n", status=code, mimetype="application/json"
+    )
+    response.headers.extend(headers or {})
+    return response
+
+
+def negotiate_encoding(mimetype, size=None):
+    """Encodage à appliquer à une réponse de ce type (et de cette taille), ou None.
+
+    À appeler pendant une requête : dépend de son en-tête Accept-Encoding.
+    """
+    config = current_app.config
+    if not config["RESPONSE_COMPRESSION"] or mimetype not in COMPRESSIBLE_MIMETYPES:
+        return None
+    if size is not None and size < config["RESPONSE_COMPRESSION_MIN_SIZE"]:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def compress(data, encoding):
+    """Compresse des octets en une fois (sortie déterministe, réutilisable depuis le cache)."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _stream_compressor(encoding):
+    """Retourne (compresser un paquet, vider le bloc en cours, terminer) pour encoding."""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        return (compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush)
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def iter_compressed(chunks, encoding):
+    """Compresse une réponse en flux paquet par paquet.
+
+    Chaque paquet est vidé aussitôt : le client reçoit les données au même
+    rythme que sans compression.
+    """
+    process, flush, finish = _stream_compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def set_content_encoding(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+
+def compress_response(response):
+    """Hook after_request : compresse la réponse si le client l'accepte et qu'elle s'y prête."""
+    if (request.method == "HEAD" or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    if response.mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add("Accept-Encoding")
+
+    if response.is_streamed:
+        encoding = negotiate_encoding(response.mimetype)
+        if encoding is not None:
+            response.response = iter_compressed(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+            set_content_encoding(response, encoding)
+        return response
+
+    encoding = negotiate_encoding(response.mimetype, response.content_length or 0)
+    if encoding is not None:
+        with stage("compress"):
+            response.set_data(compress(response.get_data(), encoding))
+        set_content_encoding(response, encoding)
+    return response
+
+
+def init_response_layer(app):
+    """Installe le fournisseur JSON rapide et la compression des réponses sur l'application."""
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
+
+
+def make_etag(mimetype, *parts):
+    """ETag fort d'une représentation déterminée par parts (hash de contenu, variante, génération...).
+
+    L'encodage que négocierait la requête en fait partie : deux encodages ne
+    donnent pas les mêmes octets, et un ETag fort désigne des octets précis.
+    """
+    digest = hashlib.sha256()
+    for part in parts + (negotiate_encoding(mimetype) or "identity",):
+        digest.update(f"{part}\0".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()[:40]
+
+
+def set_validators(response, etag):
+    """Ajoute l'ETag à la réponse ; le navigateur la garde mais doit la revalider à chaque usage."""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Authorization")
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def not_modified(etag):
+    """Réponse 304 si la requête GET (If-None-Match) porte déjà etag, sinon None.
+
+    Les requêtes POST ne sont pas conditionnelles : leur en-tête est ignoré.
+    """
+    if request.method not in ("GET", "HEAD") or not request.if_none_match.contains_weak(etag):
+        return None
+    return set_validators(current_app.response_class(status=304), etag)
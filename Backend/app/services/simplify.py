@@ -0,0 +1,145 @@
+"""Simplification des polylignes (Douglas–Peucker) pour les aperçus.
+
+La tolérance est exprimée dans les unités du dessin : aucun sommet supprimé ne
+s'écarte de plus de tolerance de la polyligne simplifiée. Les distances sont
+calculées avec NumPy, un segment entier à la fois.
+"""
+import numpy as np
+
+
+def _segment_distances(points, start, end):
+    """Distances des sommets strictement entre start et end au segment [start, end]."""
+    a = points[start]
+    b = points[end]
+    inner = points[start + 1:end]
+    ab = b - a
+    length_sq = ab @ ab
+    if length_sq == 0.0:
+        return np.hypot(*(inner - a).T)
+    t = np.clip((inner - a) @ ab / length_sq, 0.0, 1.0)
+    projection = a + t[:, None] * ab
+    return np.hypot(*(inner - projection).T)
+
+
+def _douglas_peucker(points, tolerance, keep, start, end):
+    """Marque dans keep les sommets à conserver entre start et end (inclus)."""
+    stack = [(start, end)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(points, start, end)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+
+def simplify_points(points, tolerance, closed=False):
+    """Simplifie une polyligne : retourne le tableau (m, 2) des sommets conservés.
+
+    Une polyligne fermée reste un contour valide d'au moins trois sommets non
+    alignés (si l'original en comptait au moins trois).
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    count = len(points)
+    if count < 3 or not tolerance:
+        return points
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = True
+    if not closed:
+        keep[-1] = True
+        _douglas_peucker(points, tolerance, keep, 0, count - 1)
+        return points[keep]
+
+    # Contour fermé : coupé au sommet le plus éloigné du premier, chaque moitié
+    # étant simplifiée séparément (le sommet 0 est repris en fin de tableau)
+    ring = np.vstack((points, points[:1]))
+    split = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    if split == 0:
+        return points[:1]
+    keep[split] = True
+    ring_keep = np.append(keep, True)
+    _douglas_peucker(ring, tolerance, ring_keep, 0, split)
+    _douglas_peucker(ring, tolerance, ring_keep, split, count)
+    keep = ring_keep[:-1]
+
+    if keep.sum() < 3:
+        # Trop simplifié pour rester un contour : on garde le sommet le plus
+        # éloigné de la corde [0, split]
+        distances = np.zeros(count)
+        distances[1:split] = _segment_distances(ring, 0, split)
+        distances[split + 1:] = _segment_distances(ring, split, count)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > 0.0:
+            keep[farthest] = True
+    return points[keep]
+
+
+def _significance(points, significance, start, end):
+    """Douglas–Peucker sans tolérance : chaque sommet reçoit la plus petite des
+    distances de sa subdivision et de celles qui la précèdent.
+    """
+    stack = [(start, end, np.inf)]
+    while stack:
+        start, end, bound = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(points, start, end)
+        farthest = int(np.argmax(distances))
+        index = start + 1 + farthest
+        value = min(float(distances[farthest]), bound)
+        significance[index] = value
+        stack.append((start, index, value))
+        stack.append((index, end, value))
+
+
+def vertex_significance(points, closed=False):
+    """Tolérance jusqu'à laquelle chaque sommet est conservé (inf : toujours).
+
+    simplify_points(points, t, closed) garde exactement les sommets dont la
+    valeur dépasse t : une polyligne se simplifie ainsi à plusieurs niveaux de
+    détail sans refaire le calcul.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    count = len(points)
+    significance = np.full(count, np.inf)
+    if count < 3:
+        return significance
+
+    significance[1:] = 0.0
+    if not closed:
+        significance[-1] = np.inf
+        _significance(points, significance, 0, count - 1)
+        return significance
+
+    # Même découpage du contour que simplify_points
+    ring = np.vstack((points, points[:1]))
+    split = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    if split == 0:
+        return significance
+    significance[split] = np.inf
+    ring_significance = np.append(significance, np.inf)
+    _significance(ring, ring_significance, 0, split)
+    _significance(ring, ring_significance, split, count)
+    significance = ring_significance[:-1]
+
+    # Troisième sommet du contour : le plus éloigné de la corde, toujours conservé
+    distances = np.zeros(count)
+    distances[1:split] = _segment_distances(ring, 0, split)
+    distances[split + 1:] = _segment_distances(ring, split, count)
+    farthest = int(np.argmax(distances))
+    if distances[farthest] > 0.0:
+        significance[farthest] = np.inf
+    return significance
+
+
+def simplify_vertices(vertices, tolerance, closed=False):
+    """Variante de simplify_points pour les sommets sérialisés [{"x", "y"}, ...]."""
+    if len(vertices) < 3 or not tolerance:
+        return vertices
+    points = simplify_points([(v["x"], v["y"]) for v in vertices], tolerance, closed)
+    return [{"x": x, "y": y} for x, y in points.tolist()]
@@ -0,0 +1,236 @@
+"""Index spatial des entités extraites et requêtes par emprise (viewport).
+
+L'index est construit lors d'une extraction complète et conservé dans le cache
+d'extraction (variante SPATIAL_VARIANT), au format colonnaire :
+
+  - entities.bbox        float64, minx, miny, maxx, maxy par entité
+  - entities.group       uint8, index dans header["groups"] (polylines, lines, ...)
+  - entities.layer       index dans header["layer_names"]
+  - entities.json        JSON compact de chaque entité, concaténé
+  - entities.json_offsets  début du JSON de chaque entité (n + 1 valeurs)
+  - grid.cell_offsets    grille uniforme : début des entités de chaque cellule
+  - grid.entity_ids      entités triées par cellule (une entité par cellule touchée)
+  - grid.large_ids       entités trop étendues pour la grille, toujours testées
+
+Le fichier en cache est ouvert en mmap : une requête ne lit que les cellules
+concernées et le JSON des entités retenues.
+"""
+import json
+import logging
+import math
+import mmap
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.services.columnar import pack_columns, decode_columnar
+from app.services.extraction_engine import ENTITY_GROUPS
+
+logger = logging.getLogger(__name__)
+
+SPATIAL_VARIANT = "spatial"
+GROUPS = list(ENTITY_GROUPS)
+
+# Nombre moyen visé d'entités par cellule de la grille
+ENTITIES_PER_CELL = 4
+MAX_CELLS = 1 << 22
+
+# Au-delà de ce nombre de cellules touchées, une entité est rangée à part
+LARGE_SPAN = 64
+
+# Largeur estimée d'un caractère, en hauteur de texte (emprise des TEXT)
+TEXT_CHAR_WIDTH = 1.0
+
+# Index ouverts gardés en mémoire par processus
+MAX_OPEN_INDEXES = 8
+
+
+def entity_bbox(group, entity):
+    """Emprise (minx, miny, maxx, maxy) d'une entité sérialisée, ou None."""
+    if group == "polylines":
+        if not entity["vertices"]:
+            return None
+        xs = [v["x"] for v in entity["vertices"]]
+        ys = [v["y"] for v in entity["vertices"]]
+        return min(xs), min(ys), max(xs), max(ys)
+    if group == "lines":
+        start, end = entity["start"], entity["end"]
+        return (min(start["x"], end["x"]), min(start["y"], end["y"]),
+                max(start["x"], end["x"]), max(start["y"], end["y"]))
+    if group in ("circles", "arcs"):
+        # Cercle complet, y compris pour les arcs : emprise conservatrice
+        center, radius = entity["center"], entity["radius"]
+        return center["x"] - radius, center["y"] - radius, center["x"] + radius, center["y"] + radius
+    if group == "texts":
+        position, height = entity["position"], entity["height"] or 0.0
+        width = height * max(len(entity["text"]), 1) * TEXT_CHAR_WIDTH
+        return position["x"], position["y"], position["x"] + width, position["y"] + height
+    return None
+
+
+def _build_grid(bboxes, extent):
+    """Grille uniforme sur l'emprise : retourne (nx, ny, cell_offsets, entity_ids, large_ids)."""
+    count = len(bboxes)
+    width = max(extent[2] - extent[0], 1e-9)
+    height = max(extent[3] - extent[1], 1e-9)
+    cells = min(max(count // ENTITIES_PER_CELL, 1), MAX_CELLS)
+    nx = max(1, int(round(math.sqrt(cells * width / height))))
+    ny = max(1, int(round(cells / nx)))
+
+    scale = np.array([nx / width, ny / height, nx / width, ny / height])
+    origin = np.array([extent[0], extent[1], extent[0], extent[1]])
+    spans = np.floor((bboxes - origin) * scale).astype(np.int64)
+    np.clip(spans, 0, [nx - 1, ny - 1, nx - 1, ny - 1], out=spans)
+    ix0, iy0, ix1, iy1 = spans.T
+    span_x = ix1 - ix0 + 1
+    span_y = iy1 - iy0 + 1
+    span = span_x * span_y
+
+    large = span > LARGE_SPAN
+    large_ids = np.flatnonzero(large).astype(np.uint32)
+    ids = np.flatnonzero(~large)
+
+    # Une entrée par cellule touchée : (entité, cellule)
+    repeats = span[ids]
+    entry_ids = np.repeat(ids, repeats)
+    first_entry = np.cumsum(repeats) - repeats
+    k = np.arange(len(entry_ids)) - np.repeat(first_entry, repeats)
+    cx = ix0[entry_ids] + k % span_x[entry_ids]
+    cy = iy0[entry_ids] + k // span_x[entry_ids]
+    cell = cy * nx + cx
+
+    order = np.argsort(cell, kind="stable")
+    cell_offsets = np.zeros(nx * ny + 1, dtype=np.uint64)
+    np.cumsum(np.bincount(cell, minlength=nx * ny), out=cell_offsets[1:])
+    return nx, ny, cell_offsets, entry_ids[order].astype(np.uint32), large_ids
+
+
+def build_spatial_index(result):
+    """Construit l'index spatial d'un résultat d'extraction complet (dictionnaire)."""
+    bboxes = []
+    groups = []
+    layers = []
+    layer_index = {}
+    json_parts = []
+    for group_id, group in enumerate(GROUPS):
+        for entity in result.get(group, ()):
+            bbox = entity_bbox(group, entity)
+            if bbox is None:
+                continue
+            bboxes.append(bbox)
+            groups.append(group_id)
+            layers.append(layer_index.setdefault(entity["layer"], len(layer_index)))
+            json_parts.append(json.dumps(entity, separators=(",", ":")).encode("utf-8"))
+
+    bbox_array = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    if len(bbox_array):
+        extent = [float(bbox_array[:, 0].min()), float(bbox_array[:, 1].min()),
+                  float(bbox_array[:, 2].max()), float(bbox_array[:, 3].max())]
+    else:
+        extent = [0.0, 0.0, 0.0, 0.0]
+    nx, ny, cell_offsets, entity_ids, large_ids = _build_grid(bbox_array, extent)
+
+    json_offsets = np.zeros(len(json_parts) + 1, dtype=np.uint64)
+    np.cumsum([len(part) for part in json_parts], out=json_offsets[1:])
+    arrays = {
+        "entities.bbox": bbox_array.ravel(),
+        "entities.group": np.asarray(groups, dtype=np.uint8),
+        "entities.layer": np.asarray(layers, dtype=np.uint32),
+        "entities.json_offsets": json_offsets,
+        "entities.json": np.frombuffer(b"".join(json_parts), dtype=np.uint8),
+        "grid.cell_offsets": cell_offsets,
+        "grid.entity_ids": entity_ids,
+        "grid.large_ids": large_ids
+    }
+    header = {
+        "version": 1,
+        "kind": "spatial-index",
+        "extent": extent,
+        "grid": {"nx": nx, "ny": ny},
+        "groups": GROUPS,
+        "layer_names": list(layer_index),
+        "entity_count": len(json_parts)
+    }
+    logger.debug("Index spatial construit : %s entités, grille %s x %s", len(json_parts), nx, ny)
+    return pack_columns(header, arrays)
+
+
+class SpatialIndex:
+    """Index spatial ouvert en mmap depuis le cache."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header, arrays = decode_columnar(self._mmap)
+        self.bboxes = arrays["entities.bbox"].reshape(-1, 4)
+        self.groups = arrays["entities.group"]
+        self.layers = arrays["entities.layer"]
+        self.json = arrays["entities.json"]
+        self.json_offsets = arrays["entities.json_offsets"]
+        self.cell_offsets = arrays["grid.cell_offsets"]
+        self.entity_ids = arrays["grid.entity_ids"]
+        self.large_ids = arrays["grid.large_ids"]
+        self.layer_index = {name: i for i, name in enumerate(self.header["layer_names"])}
+
+    def candidates(self, bbox):
+        """Entités des cellules de la grille touchées par bbox (sur-ensemble du résultat)."""
+        extent = self.header["extent"]
+        nx, ny = self.header["grid"]["nx"], self.header["grid"]["ny"]
+        width = max(extent[2] - extent[0], 1e-9)
+        height = max(extent[3] - extent[1], 1e-9)
+        if bbox[2] < extent[0] or bbox[0] > extent[2] or bbox[3] < extent[1] or bbox[1] > extent[3]:
+            return self.large_ids[:0]
+
+        cx0, cx1 = (int(min(max((v - extent[0]) * nx / width, 0), nx - 1)) for v in (bbox[0], bbox[2]))
+        cy0, cy1 = (int(min(max((v - extent[1]) * ny / height, 0), ny - 1)) for v in (bbox[1], bbox[3]))
+        # Les cellules d'une même rangée sont contiguës dans entity_ids
+        parts = [self.large_ids]
+        for cy in range(cy0, cy1 + 1):
+            start = int(self.cell_offsets[cy * nx + cx0])
+            end = int(self.cell_offsets[cy * nx + cx1 + 1])
+            parts.append(self.entity_ids[start:end])
+        return np.unique(np.concatenate(parts))
+
+    def query(self, bbox, layers=None, groups=None):
+        """Identifiants des entités dont l'emprise intersecte bbox, filtrés par calque et groupe."""
+        ids = self.candidates(bbox)
+        boxes = self.bboxes[ids]
+        mask = (boxes[:, 0] <= bbox[2]) & (boxes[:, 2] >= bbox[0]) & (boxes[:, 1] <= bbox[3]) & (boxes[:, 3] >= bbox[1])
+        if layers is not None:
+            wanted = [self.layer_index[name] for name in layers if name in self.layer_index]
+            mask &= np.isin(self.layers[ids], wanted)
+        if groups is not None:
+            mask &= np.isin(self.groups[ids], [GROUPS.index(group) for group in groups])
+        return ids[mask]
+
+    def entity_json(self, entity_id):
+        return self.json[int(self.json_offsets[entity_id]):int(self.json_offsets[entity_id + 1])].tobytes()
+
+    def encode(self, ids, bbox, groups=None):
+        """Réponse JSON d'une requête : entités par groupe, à partir du JSON stocké."""
+        groups = groups or GROUPS
+        by_group = {group: [] for group in groups}
+        for entity_id, group_id in zip(ids.tolist(), self.groups[ids].tolist()):
+            by_group[GROUPS[group_id]].append(self.entity_json(entity_id))
+        parts = [
+            b'"bbox":' + json.dumps(list(bbox)).encode("utf-8"),
+            b'"count":' + str(len(ids)).encode("ascii")
+        ]
+        for group in groups:
+            parts.append(json.dumps(group).encode("utf-8") + b":[" + b",".join(by_group[group]) + b"]")
+        return b"{" + b",".join(parts) + b"}"
+
+
+_open_indexes = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def open_spatial_index(path):
+    """Retourne l'index spatial du fichier en cache, en gardant les plus récents ouverts."""
+    with _open_lock:
+        index = _open_indexes.pop(path, None)
+        if index is None:
+            index = SpatialIndex(path)
+        _open_indexes[path] = index
+        while len(_open_indexes) > MAX_OPEN_INDEXES:
+            _open_indexes.popitem(last=False)
+        return index
@@ -0,0 +1,244 @@
+import logging
+import math
+import numpy as np
+from app.services.blocks import BlockLibrary
+from app.services.dxf_stream import iter_dxf
+
+logger = logging.getLogger(__name__)
+
+SURFACE_TYPES = ('LWPOLYLINE', 'POLYLINE', 'CIRCLE', 'INSERT')
+
+# Tolérance pour considérer qu'une polyligne ouverte revient à son point de départ
+CLOSURE_TOLERANCE = 1e-9
+
+# Précision (en décimales) des clés de dédoublonnage des contours superposés
+DEDUP_DECIMALS = 6
+
+
+def _ring_points(entity):
+    """Retourne les sommets (x, y, bulge) d'une polyligne fermée, ou None."""
+    dxftype = entity.dxftype()
+    if dxftype == 'LWPOLYLINE':
+        points = np.asarray(entity.get_points('xyb'), dtype=np.float64).reshape(-1, 3)
+        closed = entity.closed
+    elif entity.is_2d_polyline or entity.is_3d_polyline:
+        points = np.array(
+            [(v.dxf.location[0], v.dxf.location[1], v.dxf.bulge) for v in entity.vertices],
+            dtype=np.float64
+        ).reshape(-1, 3)
+        closed = entity.is_closed
+    else:
+        return None
+    return _close_ring(points, closed)
+
+
+def _close_ring(points, closed):
+    """Sommets d'un contour fermé (dernier sommet répété retiré), ou None si la polyligne est ouverte."""
+    if len(points) > 2 and np.abs(points[0, :2] - points[-1, :2]).max() <= CLOSURE_TOLERANCE:
+        # Contour fermé « à la main » : le dernier sommet répète le premier
+        points = points[:-1]
+        closed = True
+    if not closed or len(points) < 2:
+        return None
+    return points
+
+
+def ring_areas(coords, bulges, offsets):
+    """Aire signée de chaque contour, segments en arc (bulge) compris.
+
+    coords : tableau (n, 2) des sommets de tous les contours mis bout à bout ;
+    bulges : bulge de chaque sommet (segment vers le sommet suivant du contour) ;
+    offsets : index de début de chaque contour, suivi du nombre total de sommets.
+    """
+    starts = offsets[:-1]
+    ends = offsets[1:]
+    # Coordonnées relatives au premier sommet de chaque contour : aux grandeurs des
+    # coordonnées projetées (~1e6), les produits du lacet perdraient leur précision
+    sizes = np.diff(offsets)
+    x = coords[:, 0] - np.repeat(coords[starts, 0], sizes)
+    y = coords[:, 1] - np.repeat(coords[starts, 1], sizes)
+
+    # Index du sommet suivant, en rebouclant chaque contour sur son premier sommet
+    following = np.arange(1, len(x) + 1)
+    following[ends - 1] = starts
+    x_next = x[following]
+    y_next = y[following]
+
+    # Formule du lacet (shoelace) sur tous les contours à la fois
+    signed = np.add.reduceat(x * y_next - x_next * y, starts) / 2.0
+
+    # Segment circulaire entre la corde et l'arc : r²/2 (θ - sin θ)
+    arc_mask = bulges != 0
+    if arc_mask.any():
+        theta = 4.0 * np.arctan(np.abs(bulges[arc_mask]))
+        chord_sq = (x_next[arc_mask] - x[arc_mask]) ** 2 + (y_next[arc_mask] - y[arc_mask]) ** 2
+        segment = chord_sq * (theta - np.sin(theta)) / (8.0 * np.sin(theta / 2.0) ** 2)
+        segments = np.zeros(len(x))
+        segments[arc_mask] = np.sign(bulges[arc_mask]) * segment
+        signed = signed + np.add.reduceat(segments, starts)
+    return signed
+
+
+def _ring_key(points):
+    """Clé d'un contour (sommets et bulges arrondis à DEDUP_DECIMALS), indépendante
+    du sommet de départ et du sens de parcours.
+    """
+    rounded = points.round(DEDUP_DECIMALS) + 0.0  # + 0.0 : -0.0 devient 0.0
+    # Sens inverse : sommets dans l'ordre inverse, chaque bulge passant au sommet
+    # de départ du segment parcouru à l'envers, avec son signe opposé
+    reverse = rounded[::-1].copy()
+    reverse[:, 2] = -np.roll(rounded[::-1, 2], -1) + 0.0
+    candidates = []
+    for ring in (rounded, reverse):
+        vertices = [tuple(vertex) for vertex in ring[:, :2].tolist()]
+        smallest = min(vertices)
+        for start in (i for i, vertex in enumerate(vertices) if vertex == smallest):
+            candidates.append(np.roll(ring, -start, axis=0).tobytes())
+    return min(candidates)
+
+
+def _unique_rings(points, offsets):
+    """Masque des contours à garder : un contour identique à un précédent est ignoré.
+
+    points : tableau (n, 3) des sommets (x, y, bulge) de tous les contours.
+    Deux contours sont identiques s'ils ont les mêmes sommets et les mêmes arcs
+    (à DEDUP_DECIMALS près), quels que soient le sommet de départ et le sens de
+    parcours. Les contours ne sont comparés sommet par sommet que s'ils ont le
+    même nombre de sommets et la même emprise.
+    """
+    starts = offsets[:-1]
+    keys = np.column_stack((
+        np.diff(offsets),
+        np.minimum.reduceat(points[:, 0], starts),
+        np.minimum.reduceat(points[:, 1], starts),
+        np.maximum.reduceat(points[:, 0], starts),
+        np.maximum.reduceat(points[:, 1], starts)
+    )).round(DEDUP_DECIMALS)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[first] = True
+
+    # Emprises partagées par plusieurs contours : comparaison des sommets
+    shared = np.flatnonzero(np.bincount(inverse.ravel()) > 1)
+    if len(shared):
+        seen = set()
+        for ring in np.flatnonzero(np.isin(inverse.ravel(), shared)):
+            key = _ring_key(points[offsets[ring]:offsets[ring + 1]])
+            keep[ring] = key not in seen
+            seen.add(key)
+    return keep
+
+
+def compute_surface_areas(stream):
+    """Calcule l'aire totale et par calque d'un flux DXF binaire.
+
+    Les polylignes fermées (arcs compris) et les cercles sont comptés, y compris
+    ceux des références de blocs, chaque contour superposé à l'identique
+    n'étant compté qu'une fois. Les contours qui se recouvrent en partie (ou
+    dont l'un contient l'autre) sont comptés chacun en entier : l'aire de leur
+    union n'est pas calculée.
+    """
+    blocks = BlockLibrary()
+    layer_index = {}
+    ring_parts = []
+    ring_layers = []
+    ring_sizes = []
+    circle_keys = []
+    circle_layers = []
+    total_entities = 0
+
+    for kind, value in iter_dxf(stream, types=SURFACE_TYPES):
+        if kind == "end":
+            total_entities = value["total_entities"]
+        elif kind == "block":
+            blocks.add(value)
+        if kind != "entity":
+            continue
+        if value.dxftype() == 'INSERT':
+            geometry = blocks.expand(value)
+            if geometry is None:
+                continue
+            polylines = geometry.groups["polylines"]
+            ends = np.cumsum(polylines["lengths"]).tolist()
+            for start, end, closed, name in zip([0] + ends[:-1], ends, polylines["closed"].tolist(),
+                                                polylines["layer"]):
+                points = _close_ring(np.column_stack((polylines["coords"][start:end],
+                                                      polylines["bulges"][start:end])), closed)
+                if points is not None:
+                    ring_parts.append(points)
+                    ring_layers.append(layer_index.setdefault(name, len(layer_index)))
+                    ring_sizes.append(len(points))
+            circles = geometry.groups["circles"]
+            for (x, y), radius, name in zip(circles["center"].tolist(), circles["radius"].tolist(),
+                                            circles["layer"]):
+                circle_keys.append((x, y, radius))
+                circle_layers.append(layer_index.setdefault(name, len(layer_index)))
+            continue
+        layer = layer_index.setdefault(value.dxf.layer, len(layer_index))
+        if value.dxftype() == 'CIRCLE':
+            center = value.dxf.center
+            circle_keys.append((center[0], center[1], value.dxf.radius))
+            circle_layers.append(layer)
+            continue
+        points = _ring_points(value)
+        if points is not None:
+            ring_parts.append(points)
+            ring_layers.append(layer)
+            ring_sizes.append(len(points))
+
+    layer_names = list(layer_index)
+    layer_area = np.zeros(len(layer_names))
+    layer_polygons = np.zeros(len(layer_names), dtype=np.int64)
+    layer_circles = np.zeros(len(layer_names), dtype=np.int64)
+    polyline_area = 0.0
+    circle_area = 0.0
+    duplicates = 0
+
+    if ring_parts:
+        packed = np.concatenate(ring_parts)
+        offsets = np.concatenate(([0], np.cumsum(ring_sizes)))
+        areas = np.abs(ring_areas(packed[:, :2], packed[:, 2], offsets))
+        keep = _unique_rings(packed, offsets)
+        layers = np.asarray(ring_layers)
+        duplicates += int((~keep).sum())
+        np.add.at(layer_area, layers[keep], areas[keep])
+        np.add.at(layer_polygons, layers[keep], 1)
+        polyline_area = float(areas[keep].sum())
+
+    if circle_keys:
+        circles = np.asarray(circle_keys, dtype=np.float64)
+        _, first = np.unique(circles.round(DEDUP_DECIMALS), axis=0, return_index=True)
+        layers = np.asarray(circle_layers)[first]
+        areas = math.pi * circles[first, 2] ** 2
+        duplicates += len(circles) - len(first)
+        np.add.at(layer_area, layers, areas)
+        np.add.at(layer_circles, layers, 1)
+        circle_area = float(areas.sum())
+
+    logger.debug("Surface calculée : %s contours, %s cercles", len(ring_sizes), len(circle_keys))
+    return {
+        "total_area": polyline_area + circle_area,
+        "polyline_area": polyline_area,
+        "circle_area": circle_area,
+        "polygon_count": int(layer_polygons.sum()),
+        "circle_count": int(layer_circles.sum()),
+        "duplicates_ignored": duplicates,
+        "total_entities": total_entities,
+        "layers": [
+            {
+                "name": name,
+                "area": float(layer_area[i]),
+                "polygon_count": int(layer_polygons[i]),
+                "circle_count": int(layer_circles[i])
+            }
+            for i, name in enumerate(layer_names)
+        ]
+    }
+
+
+def check_threshold(surface, threshold):
+    """Ajoute au résultat la comparaison de l'aire totale avec un seuil minimal."""
+    result = dict(surface)
+    result["threshold"] = threshold
+    result["meets_threshold"] = None if threshold is None else surface["total_area"] >= threshold
+    return result
@@ -0,0 +1,102 @@
+"""Construction en arrière-plan des archives de tuiles (voir tile_service).
+
+La première demande de tuiles d'un dessin lance la construction de sa
+pyramide dans le pool d'extraction ; l'API répond « en cours » jusqu'à ce que
+l'archive, écrite à côté du dessin, corresponde au contenu actuel du fichier.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.services.extraction_cache import get_extraction_cache
+from app.services.extraction_jobs import build_tiles
+from app.services.extraction_pool import get_extraction_pool, ExtractionPoolError, ExtractionJobError, PoolSaturatedError
+from app.services.prefetch_service import get_prefetch_service
+from app.services.tile_service import archive_path, open_tile_archive
+
+logger = logging.getLogger(__name__)
+
+# Délai avant une nouvelle tentative quand le pool d'extraction est saturé
+SATURATED_RETRY_DELAY = 1.0
+
+
+class TileBuildService:
+    """Lance les constructions d'archives de tuiles et mémorise leur état."""
+
+    def __init__(self, app, max_zoom, timeout):
+        self.app = app
+        self.max_zoom = max_zoom
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tile-build")
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._errors = {}
+
+    def status(self, dxf_path):
+        """État des tuiles d'un dessin : ("ready", archive), ("building", None) ou ("error", message).
+
+        Une archive absente ou périmée est (re)construite en arrière-plan, sauf
+        si la pré-extraction du fichier (qui la construit aussi) est en cours.
+        """
+        content_hash = get_extraction_cache().content_hash(dxf_path)
+        archive = open_tile_archive(archive_path(dxf_path))
+        if archive is not None and archive.content_hash == content_hash:
+            return "ready", archive
+        with self._lock:
+            error = self._errors.get(dxf_path)
+            if error is not None and error[0] == content_hash:
+                return "error", error[1]
+        if not get_prefetch_service().is_pending(dxf_path):
+            self.schedule(dxf_path, content_hash)
+        return "building", None
+
+    def schedule(self, dxf_path, content_hash):
+        """Lance la construction de l'archive si elle n'est pas déjà en cours dans ce processus."""
+        with self._lock:
+            if dxf_path in self._pending:
+                return
+            self._pending.add(dxf_path)
+        self._executor.submit(self._build, dxf_path, content_hash)
+
+    def _build(self, dxf_path, content_hash):
+        with self.app.app_context():
+            logger.debug("Construction des tuiles : %s", dxf_path)
+            started = time.monotonic()
+            try:
+                while True:
+                    try:
+                        count = get_extraction_pool().run(
+                            build_tiles, dxf_path, archive_path(dxf_path), content_hash, self.max_zoom,
+                            timeout=self.timeout
+                        )
+                        break
+                    except PoolSaturatedError:
+                        time.sleep(SATURATED_RETRY_DELAY)
+                with self._lock:
+                    self._errors.pop(dxf_path, None)
+                logger.debug("%s tuiles construites en %.1f s : %s", count, time.monotonic() - started, dxf_path)
+            except (ExtractionPoolError, ExtractionJobError) as e:
+                logger.error("Échec de la construction des tuiles pour %s : %s", dxf_path, e)
+                with self._lock:
+                    self._errors[dxf_path] = (content_hash, str(e))
+            except Exception as e:
+                logger.error("Erreur lors de la construction des tuiles pour %s : %s", dxf_path, e, exc_info=True)
+                with self._lock:
+                    self._errors[dxf_path] = (content_hash, f"Erreur lors de la construction des tuiles : {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending.discard(dxf_path)
+
+
+def get_tile_build_service():
+    """Retourne le service de construction des tuiles associé à l'application courante."""
+    service = current_app.extensions.get("tile_build")
+    if service is None:
+        service = TileBuildService(
+            current_app._get_current_object(),
+            current_app.config["TILES_MAX_ZOOM"],
+            current_app.config["TILES_BUILD_TIMEOUT"]
+        )
+        current_app.extensions["tile_build"] = service
+    return service
@@ -0,0 +1,598 @@
+"""Pyramide de tuiles vectorielles z/x/y précalculée pour les grands plans DXF.
+
+Pour les plans trop volumineux pour être extraits en entier, le dessin est
+découpé hors requête en tuiles : au niveau z, l'emprise carrée du dessin est
+divisée en 2^z x 2^z tuiles, numérotées x de gauche à droite et y de haut en
+bas. Chaque tuile contient la géométrie simplifiée (tolérance d'un pixel pour
+une tuile affichée sur TILE_PIXELS pixels) et découpée à ses bords, plus une
+marge de TILE_BUFFER, au format colonnaire (voir columnar) :
+
+  - coordonnées entières en unités de tuile : 0..TILE_EXTENT depuis le coin
+    haut gauche, y vers le bas ;
+  - polylines.coords (int16), polylines.offsets, polylines.closed : un contour
+    fermé reste fermé après découpage, une polyligne ouverte peut être coupée
+    en plusieurs morceaux ;
+  - lines.coords (int16) : x0, y0, x1, y1 ;
+  - circles.center, arcs.center, texts.position (int32, le centre ou le point
+    d'insertion pouvant être hors de la tuile), *.radius et texts.height
+    (float32, unités de tuile), arcs.start_angle / end_angle (float32, degrés) ;
+  - <groupe>.layer et <groupe>.color : index dans "layer_names" et "colors" de
+    l'archive ; seuls les groupes présents dans la tuile ont des colonnes.
+
+Les entités plus petites qu'un pixel et les textes de moins de MIN_TEXT_PIXELS
+pixels de haut sont omis au niveau considéré. Les tuiles sont rangées dans une
+archive unique, à côté du dessin (plan.dxf.tiles) :
+
+    magic (8 octets)  b"GXTILES1"
+    uint64, uint64    position et longueur du répertoire
+    tuiles            contenus colonnaires concaténés
+    répertoire        contenu colonnaire : en-tête (emprise, niveaux, calques,
+                      empreinte du dessin) et colonnes tiles.key (triées),
+                      tiles.offset, tiles.length
+
+Une tuile est servie en lisant directement sa plage d'octets dans l'archive
+(sendfile lorsque le serveur WSGI le permet). Les tuiles vides sont absentes.
+"""
+import logging
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+import numpy as np
+from app.services.columnar import pack_columns, decode_columnar
+from app.services.simplify import vertex_significance
+from app.services.spatial_service import entity_bbox
+
+logger = logging.getLogger(__name__)
+
+TILE_MIMETYPE = "application/vnd.gexpertise.tile"
+ARCHIVE_MAGIC = b"GXTILES1"
+ARCHIVE_SUFFIX = ".tiles"
+ARCHIVE_HEADER = struct.Struct("<8sQQ")
+
+# Résolution des tuiles : coordonnées entières, marge autour des bords
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# Taille d'affichage d'une tuile : fixe la tolérance de simplification
+TILE_PIXELS = 256
+MIN_TEXT_PIXELS = 4
+
+MAX_ZOOM_LIMIT = 20
+
+GROUPS = ("polylines", "lines", "circles", "arcs", "texts")
+
+# Archives ouvertes gardées en mémoire par processus
+MAX_OPEN_ARCHIVES = 8
+
+
+def archive_path(dxf_path):
+    """Chemin de l'archive de tuiles d'un dessin."""
+    return dxf_path + ARCHIVE_SUFFIX
+
+
+def tile_key(z, x, y):
+    """Clé de tri d'une tuile dans le répertoire de l'archive."""
+    return (z << 58) | (x << 29) | y
+
+
+def _clip_segments(start, delta, rect):
+    """Liang–Barsky sur des segments start -> start + delta, tous à la fois.
+
+    rect (xmin, ymin, xmax, ymax) : scalaires ou un tableau par segment.
+    Retourne (t0, t1, valid) : la partie [t0, t1] de chaque segment valide est
+    dans le rectangle.
+    """
+    t0 = np.zeros(len(start))
+    t1 = np.ones(len(start))
+    valid = np.ones(len(start), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-delta[:, 0], start[:, 0] - rect[0]), (delta[:, 0], rect[2] - start[:, 0]),
+                     (-delta[:, 1], start[:, 1] - rect[1]), (delta[:, 1], rect[3] - start[:, 1])):
+            parallel = p == 0
+            valid &= ~(parallel & (q < 0))
+            ratio = q / p
+            t0 = np.where(~parallel & (p < 0), np.maximum(t0, ratio), t0)
+            t1 = np.where(~parallel & (p > 0), np.minimum(t1, ratio), t1)
+    return t0, t1, valid & (t0 <= t1)
+
+
+def _clip_polylines(lengths, vertices, rects):
+    """Découpe des polylignes ouvertes concaténées, chacune à son rectangle.
+
+    Retourne (lignes, longueurs, sommets) des morceaux restant à l'intérieur,
+    lignes étant l'index de la polyligne d'origine.
+    """
+    row = np.repeat(np.arange(len(lengths)), lengths)
+    segments = np.flatnonzero(row[:-1] == row[1:])
+    start = vertices[segments]
+    delta = vertices[segments + 1] - start
+    t0, t1, valid = _clip_segments(start, delta, rects[row[segments]].T)
+    ids = np.flatnonzero(valid)
+    a = start[ids] + t0[ids, None] * delta[ids]
+    b = start[ids] + t1[ids, None] * delta[ids]
+    # Deux segments consécutifs restent reliés si leur sommet commun est dans le rectangle
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = ~((np.diff(segments[ids]) == 1) & (t1[ids[:-1]] == 1.0) & (t0[ids[1:]] == 0.0))
+    # Chaque morceau : début du premier segment, puis fin de chaque segment
+    pieces = np.stack((a, b), axis=1).reshape(-1, 2)[np.stack((first, np.ones_like(first)), axis=1).ravel()]
+    piece_lengths = np.bincount(np.cumsum(first) - 1, minlength=int(first.sum())) + 1
+    return row[segments[ids[first]]], piece_lengths, pieces
+
+
+def _clip_rings(lengths, vertices, rects):
+    """Découpe des contours fermés concaténés, chacun à son rectangle (Sutherland–Hodgman).
+
+    Retourne (longueurs, sommets) : un contour par rectangle, éventuellement vide.
+    """
+    row = np.repeat(np.arange(len(lengths)), lengths)
+    for axis, column, lower in ((0, 0, True), (0, 2, False), (1, 1, True), (1, 3, False)):
+        offsets = _offsets(lengths)
+        nonempty = lengths > 0
+        previous_index = np.arange(len(vertices)) - 1
+        previous_index[offsets[:-1][nonempty]] = offsets[1:][nonempty] - 1
+        previous = vertices[previous_index]
+        values = vertices[:, axis]
+        bound = rects[row, column]
+        inside = values >= bound if lower else values <= bound
+        crossing = inside != inside[previous_index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (bound - previous[:, axis]) / (values - previous[:, axis])
+            intersections = previous + t[:, None] * (vertices - previous)
+        # Pour chaque sommet : l'intersection du côté qui le précède, puis le sommet lui-même
+        keep = np.stack((crossing, inside), axis=1).ravel()
+        vertices = np.stack((intersections, vertices), axis=1).reshape(-1, 2)[keep]
+        row = np.repeat(row, 2)[keep]
+        lengths = np.bincount(row, minlength=len(lengths))
+    return lengths, vertices
+
+
+def _ragged_gather(values, offsets, ids):
+    """Concatène les tranches values[offsets[i]:offsets[i + 1]] des ids : retourne (longueurs, valeurs)."""
+    starts = offsets[ids]
+    lengths = offsets[ids + 1] - starts
+    index = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+    return lengths, values[index]
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class _Grid:
+    """Découpage d'un niveau de zoom : 2^z x 2^z tuiles sur l'emprise carrée du dessin."""
+
+    def __init__(self, extent, z):
+        side = max(extent[2] - extent[0], extent[3] - extent[1], 1e-9)
+        self.left = extent[0]
+        self.top = extent[1] + side
+        self.count = 1 << z
+        self.size = side / self.count
+        self.tolerance = self.size / TILE_PIXELS
+        self.margin = self.size * TILE_BUFFER / TILE_EXTENT
+        self.scale = TILE_EXTENT / self.size
+
+    def pairs(self, bboxes):
+        """Couples (entité, tuile) : une entrée par tuile (marge comprise) touchée par chaque emprise.
+
+        Retourne (ids, tx, ty).
+        """
+        def cell(values):
+            return np.clip(np.floor(values / self.size), 0, self.count - 1).astype(np.int64)
+
+        x0 = cell(bboxes[:, 0] - self.margin - self.left)
+        x1 = cell(bboxes[:, 2] + self.margin - self.left)
+        y0 = cell(self.top - bboxes[:, 3] - self.margin)
+        y1 = cell(self.top - bboxes[:, 1] + self.margin)
+        span_x = x1 - x0 + 1
+        span = span_x * (y1 - y0 + 1)
+        ids = np.repeat(np.arange(len(bboxes)), span)
+        k = np.arange(len(ids)) - np.repeat(np.cumsum(span) - span, span)
+        return ids, x0[ids] + k % span_x[ids], y0[ids] + k // span_x[ids]
+
+    def origins(self, tx, ty):
+        """Coin haut gauche des tuiles, en coordonnées du dessin."""
+        return self.left + tx * self.size, self.top - ty * self.size
+
+    def to_tile(self, points, ox, oy, dtype):
+        """Coordonnées du dessin -> unités de tuile (origine en haut à gauche, y vers le bas)."""
+        coords = np.column_stack(((points[:, 0] - ox) * self.scale, (oy - points[:, 1]) * self.scale))
+        info = np.iinfo(dtype)
+        return np.clip(np.rint(coords), info.min, info.max).astype(dtype)
+
+
+class _Tile:
+    """Contenu d'une tuile en cours de construction : morceaux de colonnes par groupe."""
+
+    def __init__(self):
+        self.parts = defaultdict(list)
+
+    def encode(self, z, x, y):
+        """Contenu colonnaire de la tuile, limité aux groupes présents."""
+        arrays = {}
+        for name, parts in self.parts.items():
+            values = np.concatenate(parts)
+            if name.endswith("lengths"):
+                # Longueurs -> débuts (n + 1 valeurs), comme dans le format colonnaire
+                name = name.replace("lengths", "offsets")
+                values = _offsets(values).astype(np.uint32)
+            arrays[name] = values.ravel()
+        return pack_columns({"kind": "tile", "z": z, "x": x, "y": y, "extent": TILE_EXTENT}, arrays)
+
+
+def _distribute(tiles, tile_ids, rows, ragged=None):
+    """Répartit dans les tuiles des entrées triées par tuile.
+
+    rows : {colonne: tableau, une ligne par entrée} ; ragged : {colonne:
+    (longueurs, valeurs)} pour les colonnes de longueur variable.
+    """
+    if not len(tile_ids):
+        return
+    ragged = {name: (_offsets(lengths), values) for name, (lengths, values) in (ragged or {}).items()}
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(tile_ids)) + 1, [len(tile_ids)]))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        tile = tiles[int(tile_ids[start])]
+        for name, values in rows.items():
+            tile.parts[name].append(values[start:end])
+        for name, (offsets, values) in ragged.items():
+            tile.parts[name].append(values[offsets[start]:offsets[end]])
+
+
+def _visible(columns, grid):
+    """Entités d'au moins un pixel au niveau considéré."""
+    bbox = columns["bbox"]
+    return np.flatnonzero(np.maximum(bbox[:, 2] - bbox[:, 0], bbox[:, 3] - bbox[:, 1]) >= grid.tolerance)
+
+
+def _tile_polylines(tiles, grid, columns):
+    visible = _visible(columns, grid)
+    if not len(visible):
+        return
+    # Simplification au niveau : sommets dont la significativité dépasse la tolérance
+    keep = columns["significance"] > grid.tolerance
+    offsets = _offsets(np.add.reduceat(keep.astype(np.int64), columns["offsets"][:-1]))
+    points = columns["points"][keep]
+    closed = columns["closed"]
+
+    ids, tx, ty = grid.pairs(columns["bbox"][visible])
+    ids = visible[ids]
+    ox, oy = grid.origins(tx, ty)
+    bbox = columns["bbox"][ids]
+    margin, size = grid.margin, grid.size
+    inside = ((bbox[:, 0] >= ox - margin) & (bbox[:, 2] <= ox + size + margin)
+              & (bbox[:, 1] >= oy - size - margin) & (bbox[:, 3] <= oy + margin))
+
+    # Polylignes entières, puis contours et morceaux découpés aux bords des tuiles
+    inner = np.flatnonzero(inside)
+    lengths, vertices = _ragged_gather(points, offsets, ids[inner])
+    rects = np.column_stack((ox - margin, oy - size - margin, ox + size + margin, oy + margin))
+    rings = np.flatnonzero(~inside & closed[ids])
+    ring_lengths, ring_vertices = _clip_rings(*_ragged_gather(points, offsets, ids[rings]), rects[rings])
+    opened = np.flatnonzero(~inside & ~closed[ids])
+    piece_rows, piece_lengths, piece_vertices = _clip_polylines(
+        *_ragged_gather(points, offsets, ids[opened]), rects[opened]
+    )
+    pairs = np.concatenate((inner, rings, opened[piece_rows]))
+    lengths = np.concatenate((lengths, ring_lengths, piece_lengths))
+    vertices = np.concatenate((vertices, ring_vertices, piece_vertices))
+    if not len(pairs):
+        return
+
+    # Quantification, puis suppression des sommets confondus une fois arrondis
+    row_of_vertex = np.repeat(np.arange(len(pairs)), lengths)
+    coords = grid.to_tile(vertices, ox[pairs][row_of_vertex], oy[pairs][row_of_vertex], np.int16)
+    distinct = np.ones(len(coords), dtype=bool)
+    distinct[1:] = (coords[1:] != coords[:-1]).any(axis=1) | (row_of_vertex[1:] != row_of_vertex[:-1])
+    lengths = np.bincount(row_of_vertex[distinct], minlength=len(pairs))
+    rows_closed = closed[ids[pairs]]
+    valid = lengths >= np.where(rows_closed, 3, 2)
+    coords = coords[distinct & valid[row_of_vertex]]
+    pairs, lengths, rows_closed = pairs[valid], lengths[valid], rows_closed[valid]
+
+    tile_ids = tx[pairs] * grid.count + ty[pairs]
+    order = np.argsort(tile_ids, kind="stable")
+    lengths, coords = _ragged_gather(coords, _offsets(lengths), order)
+    entities = ids[pairs[order]]
+    _distribute(tiles, tile_ids[order], {
+        "polylines.layer": columns["layer"][entities],
+        "polylines.color": columns["color"][entities],
+        "polylines.closed": rows_closed[order].astype(np.uint8),
+        "polylines.lengths": lengths
+    }, {"polylines.coords": (lengths, coords)})
+
+
+def _tile_lines(tiles, grid, columns):
+    visible = _visible(columns, grid)
+    if not len(visible):
+        return
+    ids, tx, ty = grid.pairs(columns["bbox"][visible])
+    ids = visible[ids]
+    ox, oy = grid.origins(tx, ty)
+    margin, size = grid.margin, grid.size
+    start = columns["coords"][ids, :2]
+    delta = columns["coords"][ids, 2:] - start
+    t0, t1, valid = _clip_segments(start, delta, (ox - margin, oy - size - margin, ox + size + margin, oy + margin))
+
+    ids, tx, ty, ox, oy = ids[valid], tx[valid], ty[valid], ox[valid], oy[valid]
+    a = start[valid] + t0[valid, None] * delta[valid]
+    b = start[valid] + t1[valid, None] * delta[valid]
+    coords = np.hstack((grid.to_tile(a, ox, oy, np.int16), grid.to_tile(b, ox, oy, np.int16)))
+
+    tile_ids = tx * grid.count + ty
+    order = np.argsort(tile_ids, kind="stable")
+    _distribute(tiles, tile_ids[order], {
+        "lines.layer": columns["layer"][ids[order]],
+        "lines.color": columns["color"][ids[order]],
+        "lines.coords": coords[order]
+    })
+
+
+def _tile_circles(tiles, grid, columns, group):
+    visible = _visible(columns, grid)
+    if not len(visible):
+        return
+    ids, tx, ty = grid.pairs(columns["bbox"][visible])
+    ids = visible[ids]
+    tile_ids = tx * grid.count + ty
+    order = np.argsort(tile_ids, kind="stable")
+    ids, tx, ty = ids[order], tx[order], ty[order]
+    ox, oy = grid.origins(tx, ty)
+    rows = {
+        f"{group}.layer": columns["layer"][ids],
+        f"{group}.color": columns["color"][ids],
+        f"{group}.center": grid.to_tile(columns["center"][ids], ox, oy, np.int32),
+        f"{group}.radius": (columns["radius"][ids] * grid.scale).astype(np.float32)
+    }
+    if group == "arcs":
+        rows["arcs.start_angle"] = columns["start_angle"][ids].astype(np.float32)
+        rows["arcs.end_angle"] = columns["end_angle"][ids].astype(np.float32)
+    _distribute(tiles, tile_ids[order], rows)
+
+
+def _tile_texts(tiles, grid, columns):
+    # Un texte est lisible à partir de MIN_TEXT_PIXELS pixels de haut
+    visible = np.flatnonzero(columns["height"] * TILE_PIXELS / grid.size >= MIN_TEXT_PIXELS)
+    if not len(visible):
+        return
+    ids, tx, ty = grid.pairs(columns["bbox"][visible])
+    ids = visible[ids]
+    tile_ids = tx * grid.count + ty
+    order = np.argsort(tile_ids, kind="stable")
+    ids, tx, ty = ids[order], tx[order], ty[order]
+    ox, oy = grid.origins(tx, ty)
+    lengths, text = _ragged_gather(columns["text"], columns["text_offsets"], ids)
+    _distribute(tiles, tile_ids[order], {
+        "texts.layer": columns["layer"][ids],
+        "texts.color": columns["color"][ids],
+        "texts.position": grid.to_tile(columns["position"][ids], ox, oy, np.int32),
+        "texts.height": (columns["height"][ids] * grid.scale).astype(np.float32),
+        "texts.text_lengths": lengths
+    }, {"texts.text": (lengths, text)})
+
+
+def prepare_columns(result):
+    """Colonnes NumPy des entités d'un résultat d'extraction complet, par groupe.
+
+    Retourne (colonnes, noms des calques, couleurs) ; layer et color sont des
+    index dans ces deux listes.
+    """
+    layer_index = {layer["name"]: i for i, layer in enumerate(result.get("layers", ()))}
+    color_index = {}
+    rows = {group: defaultdict(list) for group in GROUPS}
+    for group in GROUPS:
+        values = rows[group]
+        for entity in result.get(group, ()):
+            bbox = entity_bbox(group, entity)
+            if bbox is None:
+                continue
+            values["bbox"].append(bbox)
+            values["layer"].append(layer_index.setdefault(entity["layer"], len(layer_index)))
+            values["color"].append(color_index.setdefault(entity["color"], len(color_index)))
+            if group == "polylines":
+                points = np.array([(v["x"], v["y"]) for v in entity["vertices"]], dtype=np.float64).reshape(-1, 2)
+                values["points"].append(points)
+                values["significance"].append(vertex_significance(points, entity["closed"]))
+                values["closed"].append(bool(entity["closed"]))
+            elif group == "lines":
+                values["coords"].append((entity["start"]["x"], entity["start"]["y"], entity["end"]["x"], entity["end"]["y"]))
+            elif group == "texts":
+                values["position"].append((entity["position"]["x"], entity["position"]["y"]))
+                values["height"].append(entity["height"] or 0.0)
+                values["text"].append(entity["text"].encode("utf-8", errors="surrogateescape"))
+            else:
+                values["center"].append((entity["center"]["x"], entity["center"]["y"]))
+                values["radius"].append(entity["radius"])
+                if group == "arcs":
+                    values["start_angle"].append(entity["start_angle"])
+                    values["end_angle"].append(entity["end_angle"])
+
+    layer_dtype = np.uint16 if len(layer_index) <= 0xFFFF else np.uint32
+    color_dtype = np.uint16 if len(color_index) <= 0xFFFF else np.uint32
+    columns = {}
+    for group, values in rows.items():
+        data = {
+            "bbox": np.array(values["bbox"], dtype=np.float64).reshape(-1, 4),
+            "layer": np.array(values["layer"], dtype=layer_dtype),
+            "color": np.array(values["color"], dtype=color_dtype)
+        }
+        if group == "polylines":
+            data["offsets"] = _offsets([len(points) for points in values["points"]])
+            data["points"] = np.concatenate(values["points"]) if values["points"] else np.zeros((0, 2))
+            data["significance"] = np.concatenate(values["significance"]) if values["significance"] else np.zeros(0)
+            data["closed"] = np.array(values["closed"], dtype=bool)
+        elif group == "lines":
+            data["coords"] = np.array(values["coords"], dtype=np.float64).reshape(-1, 4)
+        elif group == "texts":
+            data["position"] = np.array(values["position"], dtype=np.float64).reshape(-1, 2)
+            data["height"] = np.array(values["height"], dtype=np.float64)
+            data["text_offsets"] = _offsets([len(text) for text in values["text"]])
+            data["text"] = np.frombuffer(b"".join(values["text"]), dtype=np.uint8)
+        else:
+            data["center"] = np.array(values["center"], dtype=np.float64).reshape(-1, 2)
+            data["radius"] = np.array(values["radius"], dtype=np.float64)
+            if group == "arcs":
+                data["start_angle"] = np.array(values["start_angle"], dtype=np.float64)
+                data["end_angle"] = np.array(values["end_angle"], dtype=np.float64)
+        columns[group] = data
+    return columns, list(layer_index), list(color_index)
+
+
+def iter_tiles(columns, extent, max_zoom):
+    """Génère (z, x, y, contenu) pour chaque tuile non vide, dans l'ordre des clés."""
+    for z in range(max_zoom + 1):
+        grid = _Grid(extent, z)
+        tiles = defaultdict(_Tile)
+        _tile_polylines(tiles, grid, columns["polylines"])
+        _tile_lines(tiles, grid, columns["lines"])
+        _tile_circles(tiles, grid, columns["circles"], "circles")
+        _tile_circles(tiles, grid, columns["arcs"], "arcs")
+        _tile_texts(tiles, grid, columns["texts"])
+        logger.debug("Tuiles de niveau %s : %s tuiles non vides", z, len(tiles))
+        for tile_id in sorted(tiles):
+            x, y = divmod(tile_id, grid.count)
+            yield z, x, y, tiles[tile_id].encode(z, x, y)
+
+
+def write_tile_archive(path, result, content_hash, max_zoom):
+    """Construit la pyramide de tuiles d'un résultat d'extraction complet et
+    l'écrit de manière atomique dans l'archive path. Retourne le nombre de tuiles.
+    """
+    max_zoom = min(max(int(max_zoom), 0), MAX_ZOOM_LIMIT)
+    columns, layer_names, colors = prepare_columns(result)
+    boxes = np.concatenate([columns[group]["bbox"] for group in GROUPS])
+    if len(boxes):
+        extent = [float(boxes[:, 0].min()), float(boxes[:, 1].min()), float(boxes[:, 2].max()), float(boxes[:, 3].max())]
+    else:
+        extent = [0.0, 0.0, 0.0, 0.0]
+
+    keys, offsets, lengths = [], [], []
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, 0, 0))
+            for z, x, y, data in iter_tiles(columns, extent, max_zoom):
+                keys.append(tile_key(z, x, y))
+                offsets.append(f.tell())
+                lengths.append(len(data))
+                f.write(data)
+
+            side = max(extent[2] - extent[0], extent[3] - extent[1])
+            header = {
+                "version": 1,
+                "kind": "tile-archive",
+                "source": {"content_hash": content_hash},
+                "extent": extent,
+                "tile_origin": [extent[0], extent[1] + side],
+                "tile_side": side,
+                "min_zoom": 0,
+                "max_zoom": max_zoom,
+                "tile_extent": TILE_EXTENT,
+                "tile_buffer": TILE_BUFFER,
+                "layer_names": layer_names,
+                "colors": colors,
+                "entity_count": len(boxes)
+            }
+            directory = pack_columns(header, {
+                "tiles.key": np.array(keys, dtype=np.uint64),
+                "tiles.offset": np.array(offsets, dtype=np.uint64),
+                "tiles.length": np.array(lengths, dtype=np.uint32)
+            })
+            directory_offset = f.tell()
+            f.write(directory)
+            f.seek(0)
+            f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, directory_offset, len(directory)))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    logger.debug("Archive de tuiles écrite : %s (%s tuiles, niveaux 0 à %s)", path, len(keys), max_zoom)
+    return len(keys)
+
+
+class TileArchive:
+    """Répertoire d'une archive de tuiles : position de chaque tuile dans le fichier."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, offset, length = ARCHIVE_HEADER.unpack(f.read(ARCHIVE_HEADER.size))
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"Archive de tuiles invalide : {path}")
+            f.seek(offset)
+            self.header, arrays = decode_columnar(f.read(length))
+        self.keys = arrays["tiles.key"]
+        self.offsets = arrays["tiles.offset"]
+        self.lengths = arrays["tiles.length"]
+
+    @property
+    def content_hash(self):
+        return self.header["source"]["content_hash"]
+
+    def locate(self, z, x, y):
+        """Position (début, longueur) de la tuile dans l'archive, ou None si elle est vide."""
+        if not 0 <= z <= self.header["max_zoom"] or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+            return None
+        key = np.uint64(tile_key(z, x, y))
+        index = int(np.searchsorted(self.keys, key))
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        return int(self.offsets[index]), int(self.lengths[index])
+
+    def metadata(self):
+        """Description publique de la pyramide pour l'API."""
+        header = self.header
+        return {key: header[key] for key in ("extent", "tile_origin", "tile_side", "min_zoom", "max_zoom",
+                                             "tile_extent", "tile_buffer", "layer_names", "colors", "entity_count")}
+
+
+class ArchiveRange:
+    """Plage d'octets d'une archive lue comme un fichier.
+
+    fileno() et la position courante permettent au wsgi.file_wrapper du serveur
+    d'utiliser sendfile ; read() ne dépasse jamais la fin de la plage.
+    """
+
+    def __init__(self, path, offset, length):
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self.remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+_open_archives = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def open_tile_archive(path):
+    """Retourne l'archive de tuiles path (None si absente), en gardant les plus récentes ouvertes.
+
+    Une archive réécrite depuis son ouverture est relue.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _open_lock:
+        archive = _open_archives.pop(path, None)
+        if archive is None or archive[0] != mtime_ns:
+            archive = (mtime_ns, TileArchive(path))
+        _open_archives[path] = archive
+        while len(_open_archives) > MAX_OPEN_ARCHIVES:
+            _open_archives.popitem(last=False)
+        return archive[1]
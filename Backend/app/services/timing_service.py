@@ -0,0 +1,328 @@
+"""Mesure des étapes des requêtes : en-tête Server-Timing, histogrammes et profilage.
+
+- stage(nom) chronomètre une étape (réception de l'upload, hachage, lecture du
+  cache, attente du pool, analyse, encodage, compression...) ; les durées
+  d'une même étape s'additionnent. Les étapes exécutées dans un processus du
+  pool sont renvoyées avec le résultat de la tâche (voir extraction_pool) et
+  comptent pour la requête qui l'a lancée. Hors requête (tâches de fond),
+  stage ne mesure rien.
+- À la fin de chaque requête, les durées sont envoyées dans l'en-tête
+  Server-Timing (onglet Réseau du navigateur) et ajoutées aux histogrammes du
+  processus, par route et par étape (GET /api/timings/stats). Pour une réponse
+  en flux, seules les étapes antérieures au premier paquet sont comptées.
+- Un administrateur peut profiler une requête avec l'en-tête X-Profile: 1 : la
+  pile du thread de la requête, et celle du processus du pool qui exécute la
+  tâche, sont échantillonnées toutes les PROFILER_INTERVAL secondes. Les piles
+  cumulées sont écrites au format « collapsed » (flamegraph.pl, speedscope)
+  dans PROFILES_FOLDER ; l'en-tête X-Profile-Id de la réponse identifie le
+  profil à télécharger (GET /api/timings/profiles/<id>).
+"""
+import bisect
+import functools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+
+logger = logging.getLogger(__name__)
+
+# Durées d'étapes et profileur de la requête (ou de la tâche du pool) en cours dans ce thread
+_current = threading.local()
+
+# Bornes supérieures des classes des histogrammes, en millisecondes
+HISTOGRAM_BOUNDS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Racine des piles échantillonnées dans un processus du pool
+WORKER_STACK_ROOT = "extraction-worker"
+
+
+def start_timings():
+    """Démarre la collecte des durées d'étapes dans ce thread."""
+    _current.stages = {}
+
+
+def finish_timings():
+    """Termine la collecte et retourne les durées mesurées {étape: secondes}."""
+    stages = getattr(_current, "stages", None)
+    _current.stages = None
+    return stages or {}
+
+
+def record(name, seconds):
+    """Ajoute une durée à une étape (sans effet si aucune collecte n'est en cours)."""
+    stages = getattr(_current, "stages", None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+def merge_timings(stages):
+    """Ajoute les durées d'étapes mesurées ailleurs (processus du pool)."""
+    for name, seconds in stages.items():
+        record(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    """Chronomètre le bloc comme étape name de la requête en cours.
+
+    Une étape imbriquée dans elle-même (content_hash appelant stream_hash)
+    n'est comptée qu'une fois.
+    """
+    active = getattr(_current, "active", None)
+    if active is None:
+        active = _current.active = set()
+    if name in active:
+        yield
+        return
+    active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        active.discard(name)
+        record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Décorateur : chronomètre chaque appel de la fonction comme étape name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def format_server_timing(stages):
+    """Valeur de l'en-tête Server-Timing : "étape;dur=<ms>", séparées par des virgules."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items())
+
+
+class TimingHistograms:
+    """Histogrammes des durées d'étapes par route.
+
+    Propres au processus : chaque worker du serveur WSGI a les siens.
+    """
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS):
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, endpoint, name, seconds):
+        milliseconds = seconds * 1000
+        index = bisect.bisect_left(self.bounds, milliseconds)
+        with self._lock:
+            series = self._series.get((endpoint, name))
+            if series is None:
+                series = self._series[(endpoint, name)] = {
+                    "buckets": [0] * (len(self.bounds) + 1), "count": 0, "sum": 0.0, "max": 0.0
+                }
+            series["buckets"][index] += 1
+            series["count"] += 1
+            series["sum"] += milliseconds
+            series["max"] = max(series["max"], milliseconds)
+
+    def _quantile(self, series, q):
+        """Borne supérieure de la classe contenant le quantile q (maximum pour la dernière)."""
+        rank = q * series["count"]
+        seen = 0
+        for index, count in enumerate(series["buckets"]):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else series["max"]
+        return series["max"]
+
+    def snapshot(self):
+        """{route: {étape: count, durées en ms (moyenne, max, p50/p95/p99), classes [borne, effectif]}}."""
+        with self._lock:
+            series_items = [(key, dict(series, buckets=list(series["buckets"])))
+                            for key, series in self._series.items()]
+        labels = list(self.bounds) + ["+Inf"]
+        snapshot = {}
+        for (endpoint, name), series in sorted(series_items):
+            snapshot.setdefault(endpoint, {})[name] = {
+                "count": series["count"],
+                "mean_ms": round(series["sum"] / series["count"], 3),
+                "max_ms": round(series["max"], 3),
+                "p50_ms": self._quantile(series, 0.5),
+                "p95_ms": self._quantile(series, 0.95),
+                "p99_ms": self._quantile(series, 0.99),
+                "buckets": [[label, count] for label, count in zip(labels, series["buckets"])]
+            }
+        return snapshot
+
+
+def get_timing_histograms():
+    """Retourne les histogrammes de durées associés à l'application courante."""
+    histograms = current_app.extensions.get("timing_histograms")
+    if histograms is None:
+        histograms = current_app.extensions["timing_histograms"] = TimingHistograms()
+    return histograms
+
+
+class SamplingProfiler:
+    """Échantillonne à intervalle régulier la pile d'un thread, depuis un thread dédié.
+
+    Les piles sont cumulées au format « collapsed » : "f1;f2;f3" -> nombre d'échantillons.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{getattr(code, 'co_qualname', code.co_name)} "
+                             f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                with self._lock:
+                    self.stacks[";".join(reversed(names))] += 1
+
+    def merge(self, stacks, root):
+        """Ajoute des piles échantillonnées ailleurs, sous la racine root."""
+        with self._lock:
+            for stack, count in stacks.items():
+                self.stacks[f"{root};{stack}"] += count
+
+    def stop(self):
+        """Arrête l'échantillonnage et retourne les piles cumulées."""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            return dict(self.stacks)
+
+
+def start_profiler(interval):
+    """Profile la suite de la tâche en cours dans ce thread."""
+    _current.profiler = SamplingProfiler(threading.get_ident(), interval).start()
+
+
+def stop_profiler():
+    """Arrête le profileur de ce thread et retourne ses piles, ou None s'il n'y en a pas."""
+    profiler = getattr(_current, "profiler", None)
+    _current.profiler = None
+    return profiler.stop() if profiler is not None else None
+
+
+def profiling_interval():
+    """Intervalle d'échantillonnage si la tâche en cours est profilée, sinon None."""
+    profiler = getattr(_current, "profiler", None)
+    return profiler.interval if profiler is not None else None
+
+
+def merge_profile(stacks):
+    """Ajoute au profil en cours les piles d'un processus du pool."""
+    profiler = getattr(_current, "profiler", None)
+    if profiler is not None:
+        profiler.merge(stacks, WORKER_STACK_ROOT)
+
+
+def profile_path(profile_id):
+    """Chemin du profil profile_id, ou None si l'identifiant est invalide."""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    return os.path.join(current_app.config["PROFILES_FOLDER"], f"{profile_id}.folded")
+
+
+def save_profile(stacks):
+    """Écrit un profil au format collapsed et retourne son identifiant.
+
+    Seuls les PROFILES_MAX_FILES profils les plus récents sont conservés.
+    """
+    folder = current_app.config["PROFILES_FOLDER"]
+    os.makedirs(folder, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    with open(profile_path(profile_id), "w", encoding="utf-8") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+    profiles = sorted((entry for entry in os.scandir(folder) if entry.name.endswith(".folded")),
+                      key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:-current_app.config["PROFILES_MAX_FILES"]]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+    return profile_id
+
+
+def _profiling_requested():
+    """Vrai si la requête demande un profil et émane d'un administrateur."""
+    if not request.headers.get(PROFILE_HEADER):
+        return False
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return False
+    return get_jwt().get("role") == "admin"
+
+
+def _before_request():
+    start_timings()
+    _current.request_start = time.perf_counter()
+    if _profiling_requested():
+        start_profiler(current_app.config["PROFILER_INTERVAL"])
+
+
+def _after_request(response):
+    stages = finish_timings()
+    start = getattr(_current, "request_start", None)
+    _current.request_start = None
+    if start is not None:
+        stages["total"] = time.perf_counter() - start
+    stacks = stop_profiler()
+    if stacks is not None:
+        profile_id = save_profile(stacks)
+        response.headers["X-Profile-Id"] = profile_id
+        logger.info("Profil de la requête %s enregistré : %s", request.path, profile_id)
+    if current_app.config["SERVER_TIMING"] and stages:
+        response.headers["Server-Timing"] = format_server_timing(stages)
+    if request.endpoint is not None:
+        histograms = get_timing_histograms()
+        for name, seconds in stages.items():
+            histograms.observe(request.endpoint, name, seconds)
+    return response
+
+
+def _teardown_request(exc):
+    # Requête interrompue avant after_request : rien ne doit survivre dans le thread
+    _current.stages = None
+    stop_profiler()
+
+
+def init_timing(app):
+    """Installe la mesure des étapes sur l'application.
+
+    À appeler avant init_response_layer : les hooks after_request s'exécutant
+    dans l'ordre inverse, la compression est alors mesurée avant l'envoi de
+    l'en-tête Server-Timing.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -1,13 +1,33 @@
 from app.models.user import User
 from app import db
 from app.models.folder import Folder
+from app.services.folder_index import folder_changed
+from sqlalchemy import func, literal, or_, select, tuple_
+from sqlalchemy.orm import aliased
+from datetime import datetime
+import base64
+import binascii
+import json
 import os
 import shutil
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Taille par défaut et maximale d'une page de get_users_with_folders
+USERS_PAGE_SIZE = 50
+USERS_PAGE_MAX_SIZE = 500
+
+# Date de tri des comptes sans dossier (avant tous les dossiers)
+NO_FOLDER_DATE = datetime(1900, 1, 1)
+
+# Colonnes de tri de get_users_with_folders (l'identifiant départage les ex aequo)
+USER_SORTS = {
+    "name": (User.nom, User.prenom),
+    "email": (User.email,),
+    "date": (func.coalesce(Folder.date_creation, NO_FOLDER_DATE),)
+}
+
 def create_user(nom, prenom, email, password, role):
     user = User(nom=nom, prenom=prenom, email=email, password=password, role=role)
     db.session.add(user)
@@ -23,7 +43,7 @@ def get_user_by_id(user_id):
 def update_user(user_id, data):
     user = get_user_by_id(user_id)
     if not user:
-        logger.error(f"Utilisateur avec ID {user_id} non trouvé.")
+        logger.error("Utilisateur avec ID %s non trouvé.", user_id)
         return None
     
     old_folder_name = None
@@ -41,20 +61,22 @@ def update_user(user_id, data):
             new_path = os.path.join(base_resource_path, value)
             if os.path.exists(old_path) and old_folder_name != value:
                 os.rename(old_path, new_path)
+                folder_changed(old_path, recursive=True)
+                folder_changed(new_path, recursive=True)
         else:
             setattr(user, key, value)
     db.session.commit()
     return user
 
 def delete_user(user_id):
-    logger.info(f"Tentative de suppression du dossier pour l'utilisateur ID {user_id}")
+    logger.info("Tentative de suppression du dossier pour l'utilisateur ID %s", user_id)
     user = get_user_by_id(user_id)
     if not user:
-        logger.error(f"Utilisateur avec ID {user_id} non trouvé.")
+        logger.error("Utilisateur avec ID %s non trouvé.", user_id)
         return False
 
     if not user.folders:
-        logger.warning(f"Aucun dossier trouvé pour l'utilisateur ID {user_id}.")
+        logger.warning("Aucun dossier trouvé pour l'utilisateur ID %s.", user_id)
         return True  # Rien à supprimer, mais succès car l'état est cohérent
 
     folder = user.folders[0]
@@ -62,7 +84,7 @@ def delete_user(user_id):
     # Vérification supplémentaire : générer le nom basé sur l'email pour cohérence
     expected_folder_name = user.email.split('@')[0].replace('.', '_')
     if folder_name != expected_folder_name:
-        logger.warning(f"Nom de dossier en base ({folder_name}) différent du nom attendu ({expected_folder_name}). Utilisation du nom attendu.")
+        logger.warning("Nom de dossier en base (%s) différent du nom attendu (%s). Utilisation du nom attendu.", folder_name, expected_folder_name)
         folder_name = expected_folder_name
 
     base_resource_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Ressources'))
@@ -72,22 +94,23 @@ def delete_user(user_id):
     if os.path.exists(folder_path):
         try:
             shutil.rmtree(folder_path)
-            logger.info(f"Dossier {folder_path} supprimé avec succès de Ressources.")
+            folder_changed(folder_path, recursive=True)
+            logger.info("Dossier %s supprimé avec succès de Ressources.", folder_path)
         except PermissionError as e:
-            logger.error(f"Permission refusée pour supprimer {folder_path}: {str(e)}")
+            logger.error("Permission refusée pour supprimer %s: %s", folder_path, e)
             return False
         except Exception as e:
-            logger.error(f"Erreur lors de la suppression du dossier {folder_path}: {str(e)}")
+            logger.error("Erreur lors de la suppression du dossier %s: %s", folder_path, e)
             return False
 
     # Supprimer l'entrée dans la base de données
     try:
         db.session.delete(folder)
         db.session.commit()
-        logger.info(f"Entrée du dossier {folder_name} supprimée de la base de données pour l'utilisateur ID {user_id}.")
+        logger.info("Entrée du dossier %s supprimée de la base de données pour l'utilisateur ID %s.", folder_name, user_id)
         return True
     except Exception as e:
-        logger.error(f"Erreur lors de la suppression de l'entrée folder dans la base de données: {str(e)}")
+        logger.error("Erreur lors de la suppression de l'entrée folder dans la base de données: %s", e)
         db.session.rollback()
         return False
 
@@ -100,34 +123,69 @@ def authenticate_user(email, password):
         if decrypted_password == password:
             return user
     except ValueError as e:
-        print(f"Erreur de déchiffrement: {e}")
+        logger.error("Erreur de déchiffrement: %s", e)
         return None
     return None
 
-def get_users_with_folders():
-    users = User.query.filter_by(role='user').all()
-    result = []
-    for user in users:
-        folders = Folder.query.filter_by(id_user=user.id).all()
-        if folders:
-            folder = folders[0]
-            result.append({
-                "user_id": user.id,
-                "nom": user.nom,
-                "prenom": user.prenom,
-                "email": user.email,
-                "folder_id": folder.id,
-                "nom_dossier": folder.nom_dossier,
-                "date_creation": folder.date_creation.isoformat() if folder.date_creation else None
-            })
-        else:
-            result.append({
-                "user_id": user.id,
-                "nom": user.nom,
-                "prenom": user.prenom,
-                "email": user.email,
-                "folder_id": None,
-                "nom_dossier": None,
-                "date_creation": None
-            })
-    return result
\ No newline at end of file
+def encode_users_cursor(sort, descending, key):
+    """Curseur de pagination opaque : tri, sens et clé (valeurs triées, identifiant) de la dernière ligne."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+    return base64.urlsafe_b64encode(json.dumps([sort, descending, values]).encode("utf-8")).decode("ascii")
+
+def decode_users_cursor(cursor, sort, descending):
+    """Clé encodée dans un curseur ; lève ValueError s'il est invalide ou pris avec un autre tri."""
+    try:
+        cursor_sort, cursor_descending, values = json.loads(
+            base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True)
+        )
+        if (cursor_sort, cursor_descending) != (sort, descending) or len(values) != len(USER_SORTS[sort]) + 1:
+            raise ValueError
+        if sort == "date":
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise ValueError("Curseur de pagination invalide")
+
+def get_users_with_folders(search=None, sort="name", descending=False, limit=USERS_PAGE_SIZE, cursor=None):
+    """Page des comptes 'user' avec leur dossier (le premier s'ils en ont plusieurs), en une requête.
+
+    search filtre sur le nom, le prénom et l'email (chaque mot doit figurer
+    dans l'un d'eux, sans tenir compte de la casse). sort : "name" (nom puis
+    prénom), "email" ou "date" (création du dossier, les comptes sans dossier
+    en premier). La pagination se fait par clé : cursor est le next_cursor
+    de la page précédente (None à la dernière page).
+
+    Retourne (lignes, next_cursor) ; lève ValueError si le curseur est invalide.
+    """
+    first_folder = aliased(Folder)
+    first_folder_id = select(func.min(first_folder.id)).where(first_folder.id_user == User.id).scalar_subquery()
+    sort_columns = list(USER_SORTS[sort]) + [User.id]
+
+    query = db.session.query(
+        User.id, User.nom, User.prenom, User.email, Folder.id, Folder.nom_dossier, Folder.date_creation,
+        *sort_columns[:-1]
+    ).outerjoin(Folder, Folder.id == first_folder_id).filter(User.role == 'user')
+    for term in (search or "").split():
+        pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.filter(or_(User.nom.ilike(pattern, escape="\\"), User.prenom.ilike(pattern, escape="\\"),
+                                 User.email.ilike(pattern, escape="\\")))
+    if cursor:
+        after = tuple_(*[literal(value) for value in decode_users_cursor(cursor, sort, descending)])
+        query = query.filter(tuple_(*sort_columns) < after if descending else tuple_(*sort_columns) > after)
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in sort_columns])
+
+    rows = query.limit(limit + 1).all()
+    result = [{
+        "user_id": user_id,
+        "nom": nom,
+        "prenom": prenom,
+        "email": email,
+        "folder_id": folder_id,
+        "nom_dossier": nom_dossier,
+        "date_creation": date_creation.isoformat() if date_creation else None
+    } for user_id, nom, prenom, email, folder_id, nom_dossier, date_creation, *_ in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_users_cursor(sort, descending, list(last[7:]) + [last[0]])
+    return result, next_cursor
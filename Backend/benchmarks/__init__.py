@@ -0,0 +1,7 @@
+"""Scripts de mesure des performances de l'extraction DXF.
+
+À lancer depuis le dossier Backend, par exemple :
+    python -m benchmarks.extract_io chemin/vers/plan.dxf
+    python -m benchmarks.synthetic 100000 -o plan.dxf
+    python -m benchmarks.extraction --sizes 1000,10000,100000 --baseline reference.json
+"""
@@ -0,0 +1,169 @@
+"""Compare les E/S et la mémoire de l'extraction avec et sans fichier temporaire.
+
+Modes mesurés, chacun dans un processus séparé (le pic de RSS est cumulatif) :
+  - tempfile : ancien chemin de extract_data_from_file (lecture complète,
+    BytesIO, FileStorage, copie dans un NamedTemporaryFile puis relecture) ;
+  - upload   : extract_file_data sur un FileStorage, lu directement depuis son flux ;
+  - mmap     : extract_file_data sur le chemin du fichier, en projection mémoire.
+
+rchar / wchar sont les octets passés par read()/write() (/proc/self/io) et
+« pic anon » le pic de mémoire anonyme (RssAnon de /proc/self/status, échantillonné) :
+les pages lues via mmap n'y figurent pas, car elles restent dans le cache du
+système et sont partagées. Hors Linux, seul le pic de RSS total est disponible. Usage :
+    python -m benchmarks.extract_io plan.dxf [--fields stats] [--repeat 3]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from werkzeug.datastructures import FileStorage
+from app.services.extraction_engine import extract, resolve_projection
+from app.services.file_service import extract_file_data
+
+MODES = ("tempfile", "upload", "mmap")
+
+
+def _io_counters():
+    """Octets lus et écrits par le processus, ou None hors Linux."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return None
+    return {"rchar": int(counters["rchar"]), "wchar": int(counters["wchar"])}
+
+
+def _peak_rss():
+    """Pic de mémoire résidente du processus, en octets."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _AnonSampler(threading.Thread):
+    """Relève périodiquement la mémoire anonyme du processus (Linux)."""
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.baseline = self._read()
+        self.peak = self.baseline
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def _read():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("RssAnon:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def run(self):
+        while self.baseline is not None and not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, self._read())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        if self.baseline is None:
+            return None
+        self.peak = max(self.peak, self._read())
+        return self.peak - self.baseline
+
+
+def _legacy_extract(path, types, fields):
+    """Reproduit l'ancien aller-retour : trois copies du fichier avant l'analyse."""
+    with open(path, "rb") as f:
+        file_obj = FileStorage(stream=io.BytesIO(f.read()), filename=os.path.basename(path))
+    temp_file_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".dxf", mode="wb") as temp_file:
+            file_obj.save(temp_file)
+            temp_file_path = temp_file.name
+        with open(temp_file_path, "rb") as f:
+            return extract(f, types, fields)
+    finally:
+        if temp_file_path:
+            os.unlink(temp_file_path)
+
+
+def run_mode(mode, path, types, fields):
+    """Exécute une extraction dans le processus courant et retourne ses mesures."""
+    before_io = _io_counters()
+    before_rss = _peak_rss()
+    sampler = _AnonSampler()
+    sampler.start()
+    start = time.perf_counter()
+
+    if mode == "tempfile":
+        result = _legacy_extract(path, types, fields)
+    elif mode == "upload":
+        with open(path, "rb") as f:
+            result = extract_file_data(FileStorage(stream=f, filename=os.path.basename(path)), types, fields)
+    else:
+        result = extract_file_data(path, types, fields)
+
+    elapsed = time.perf_counter() - start
+    anon_growth = sampler.stop()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    after_io = _io_counters()
+    measures = {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "peak_rss_growth": _peak_rss() - before_rss,
+        "peak_anon_growth": anon_growth,
+        "total_entities": result.get("statistics", {}).get("total_entities")
+    }
+    if before_io and after_io:
+        measures.update({key: after_io[key] - before_io[key] for key in before_io})
+    return measures
+
+
+def _format_bytes(value):
+    if value is None:
+        return "n/a"
+    return f"{value / (1024 * 1024):.1f} Mo"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Fichier DXF à extraire")
+    parser.add_argument("--types", default=None, help="Types d'entités (liste séparée par des virgules)")
+    parser.add_argument("--fields", default="full", help="Champs produits : full, geometry, layers, stats")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre de mesures par mode")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    types, fields = resolve_projection(args.types, args.fields)
+
+    if args.mode:
+        # Processus enfant : une seule mesure, renvoyée en JSON
+        print(json.dumps(run_mode(args.mode, args.path, types, fields)))
+        return
+
+    size = os.path.getsize(args.path)
+    print(f"{args.path} : {_format_bytes(size)}, champs={fields}")
+    print(f"{'mode':<10}{'temps (s)':>11}{'pic RSS +':>12}{'pic anon +':>12}{'rchar':>12}{'wchar':>12}")
+    for mode in MODES:
+        for _ in range(args.repeat):
+            command = [sys.executable, "-m", "benchmarks.extract_io", args.path,
+                       "--fields", fields, "--mode", mode]
+            if args.types:
+                command += ["--types", args.types]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            measures = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<10}{measures['seconds']:>11}{_format_bytes(measures['peak_rss_growth']):>12}"
+                  f"{_format_bytes(measures['peak_anon_growth']):>12}"
+                  f"{_format_bytes(measures.get('rchar')):>12}{_format_bytes(measures.get('wchar')):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Mesure les chemins d'extraction sur des plans synthétiques et les compare à une référence.
+
+Pour chaque taille de plan (voir benchmarks.synthetic) et chaque cas :
+  - extract     : extract_file_data (résultat complet, encodé comme pour le cache) ;
+  - measures    : extract_file_data en mode "measures" (mesures par calque) ;
+  - columnar    : extraction au format colonnaire ;
+  - surface     : calcul des surfaces ;
+  - user-folder : POST /api/user-folder/extract-data-from-file, cache vide ;
+  - user-folder-cached : même requête, servie depuis le cache ;
+  - upload      : POST /api/extract-data avec le fichier déposé.
+
+Chaque mesure est faite dans un processus séparé (le pic de RSS est
+cumulatif), l'application Flask utilisant un cache et une base SQLite
+temporaires et analysant dans le thread de la requête (pool désactivé).
+Sont relevés : durée, pic de RSS, pic d'allocations Python (tracemalloc,
+dans une exécution séparée car il ralentit l'extraction) et taille du résultat.
+
+--save écrit les mesures dans un fichier JSON de référence ; --baseline les
+compare à une référence et termine en erreur si un cas régresse au-delà de
+la tolérance. Usage :
+    python -m benchmarks.extraction [--sizes 1000,10000,100000] [--cases extract,upload]
+                                    [--repeat 3] [--save reference.json] [--baseline reference.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.synthetic import plan_path
+
+CASES = ("extract", "measures", "columnar", "surface", "user-folder", "user-folder-cached", "upload")
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_DATA_DIR = os.path.join(os.getcwd(), "cache", "benchmarks")
+
+# Utilisateur fictif des mesures d'endpoints (dossier Ressources/benchmark_extraction)
+BENCHMARK_EMAIL = "benchmark.extraction@localhost"
+
+# Régressions : hausse relative tolérée, et hausse absolue en dessous de laquelle l'écart est du bruit
+DEFAULT_TOLERANCE = 0.2
+NOISE_FLOOR = {"seconds": 0.05, "peak_rss": 8 * 1024 * 1024, "alloc_peak": 8 * 1024 * 1024, "payload_bytes": 0}
+METRICS = ("seconds", "peak_rss", "alloc_peak", "payload_bytes")
+
+
+def _peak_rss():
+    """Pic de mémoire résidente du processus, en octets."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _configure_environment(workdir):
+    """Configuration de l'application pour la mesure, avant tout import du paquet app."""
+    os.environ["DATABASE_URL"] = "sqlite://"
+    os.environ["EXTRACTION_CACHE_FOLDER"] = os.path.join(workdir, "extraction")
+    os.environ["EXTRACTION_JOBS_FOLDER"] = os.path.join(workdir, "jobs")
+    os.environ["EXTRACTION_POOL_SIZE"] = "0"
+    os.environ["GEOMETRY_STORE_INGEST"] = "false"
+
+
+def _user_folder(app):
+    return os.path.abspath(os.path.join(app.root_path, "..", "Ressources",
+                                        BENCHMARK_EMAIL.split("@")[0].replace(".", "_")))
+
+
+def _prepare_endpoint(case, path):
+    """Crée l'application et la requête du cas ; retourne (appel mesuré, nettoyage)."""
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        token = create_access_token(identity="0", additional_claims={"email": BENCHMARK_EMAIL})
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+    filename = os.path.basename(path)
+
+    if case == "upload":
+        with open(path, "rb") as f:
+            data = f.read()
+
+        def call():
+            return client.post("/api/extract-data", headers=headers,
+                               data={"file": (io.BytesIO(data), filename)}, content_type="multipart/form-data")
+        return call, lambda: None
+
+    folder = _user_folder(app)
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, filename)
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copyfile(path, target)
+
+    def call():
+        return client.post("/api/user-folder/extract-data-from-file", headers=headers, json={"filename": filename})
+
+    def cleanup():
+        os.unlink(target)
+        if not os.listdir(folder):
+            # Supprime aussi Ressources s'il n'a été créé que pour la mesure
+            os.removedirs(folder)
+
+    if case == "user-folder-cached":
+        call()
+    return call, cleanup
+
+
+def _prepare(case, path):
+    """Retourne (appel mesuré renvoyant la taille du résultat, nettoyage)."""
+    if case in ("user-folder", "user-folder-cached", "upload"):
+        request, cleanup = _prepare_endpoint(case, path)
+
+        def call():
+            response = request()
+            if response.status_code != 200:
+                raise RuntimeError(f"{case} : HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+            return len(response.get_data())
+        return call, cleanup
+
+    from app.services.columnar import extract_columnar
+    from app.services.extraction_cache import encode_json
+    from app.services.file_service import extract_file_data, open_dxf
+    from app.services.surface_service import compute_surface_areas
+
+    def extract(fields):
+        result = extract_file_data(path, fields=fields)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return len(encode_json(result))
+
+    def columnar():
+        with open_dxf(path) as stream:
+            return len(extract_columnar(stream))
+
+    def surface():
+        with open_dxf(path) as stream:
+            return len(json.dumps(compute_surface_areas(stream)))
+
+    calls = {
+        "extract": lambda: extract("full"),
+        "measures": lambda: extract("measures"),
+        "columnar": columnar,
+        "surface": surface
+    }
+    return calls[case], lambda: None
+
+
+def run_case(case, path, allocations=False):
+    """Exécute un cas dans le processus courant et retourne ses mesures."""
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    _configure_environment(workdir)
+    try:
+        call, cleanup = _prepare(case, path)
+        try:
+            if allocations:
+                tracemalloc.start()
+                call()
+                measures = {"alloc_peak": tracemalloc.get_traced_memory()[1]}
+                tracemalloc.stop()
+                return measures
+            before_rss = _peak_rss()
+            start = time.perf_counter()
+            payload_bytes = call()
+            return {
+                "seconds": round(time.perf_counter() - start, 4),
+                "peak_rss": _peak_rss() - before_rss,
+                "payload_bytes": payload_bytes
+            }
+        finally:
+            cleanup()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _measure(case, path, allocations):
+    """Mesure un cas dans un processus enfant."""
+    command = [sys.executable, "-m", "benchmarks.extraction", "--case", case, "--path", path]
+    if allocations:
+        command.append("--allocations")
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def collect(sizes, cases, repeat, data_dir, allocations=True):
+    """Génère (cas@taille, mesures) : meilleure durée et plus petit pic de RSS sur repeat exécutions."""
+    for size in sizes:
+        path = plan_path(data_dir, size)
+        for case in cases:
+            runs = [_measure(case, path, False) for _ in range(max(repeat, 1))]
+            measures = {
+                "entities": size,
+                "seconds": min(run["seconds"] for run in runs),
+                "peak_rss": min(run["peak_rss"] for run in runs),
+                "payload_bytes": runs[0]["payload_bytes"]
+            }
+            if allocations:
+                measures.update(_measure(case, path, True))
+            yield f"{case}@{size}", measures
+
+
+def compare(measures, reference, tolerance):
+    """Écarts d'un cas avec sa référence : {métrique: (rapport, régression)}."""
+    deltas = {}
+    for metric in METRICS:
+        if metric not in measures or not reference.get(metric):
+            continue
+        value, base = measures[metric], reference[metric]
+        regression = value > base * (1 + tolerance) and value - base > NOISE_FLOOR[metric]
+        deltas[metric] = (value / base, regression)
+    return deltas
+
+
+def _format_bytes(value):
+    if value is None:
+        return "n/a"
+    if abs(value) < 1024 * 1024:
+        return f"{value / 1024:.1f} Ko"
+    return f"{value / (1024 * 1024):.1f} Mo"
+
+
+def _format_delta(deltas, metric):
+    if metric not in deltas:
+        return ""
+    ratio, regression = deltas[metric]
+    return f" ({ratio - 1:+.0%}{' !' if regression else ''})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Nombres d'entités des plans, séparés par des virgules")
+    parser.add_argument("--cases", default=",".join(CASES), help="Cas mesurés, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre de mesures par cas")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Dossier des plans générés")
+    parser.add_argument("--no-allocations", action="store_true", help="Ne pas mesurer les allocations")
+    parser.add_argument("--save", help="Écrit les mesures dans ce fichier de référence")
+    parser.add_argument("--baseline", help="Compare les mesures à ce fichier de référence")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Hausse relative tolérée avant de signaler une régression")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--allocations", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        # Processus enfant : une seule mesure, renvoyée en JSON
+        print(json.dumps(run_case(args.case, args.path, args.allocations)))
+        return 0
+
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"Cas inconnus : {', '.join(sorted(unknown))} (cas possibles : {', '.join(CASES)})")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    reference = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            reference = json.load(f)["results"]
+
+    print(f"{'cas':<28}{'temps (s)':>20}{'pic RSS +':>22}{'pic alloc.':>22}{'résultat':>22}")
+    results = {}
+    regressions = []
+    for key, measures in collect(sizes, cases, args.repeat, args.data_dir, not args.no_allocations):
+        results[key] = measures
+        deltas = compare(measures, reference[key], args.tolerance) if key in reference else {}
+        if any(regression for _, regression in deltas.values()):
+            regressions.append(key)
+        print(f"{key:<28}"
+              f"{measures['seconds']:>10.3f}{_format_delta(deltas, 'seconds'):>10}"
+              f"{_format_bytes(measures['peak_rss']):>12}{_format_delta(deltas, 'peak_rss'):>10}"
+              f"{_format_bytes(measures.get('alloc_peak')):>12}{_format_delta(deltas, 'alloc_peak'):>10}"
+              f"{_format_bytes(measures['payload_bytes']):>12}{_format_delta(deltas, 'payload_bytes'):>10}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "results": results
+            }, f, indent=2, sort_keys=True)
+        print(f"Référence écrite : {args.save}")
+    if regressions:
+        print(f"Régressions (> {args.tolerance:.0%}) : {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Mesure le coût de la journalisation par requête selon sa configuration.
+
+Modes comparés (voir logging_service) :
+  - off   : LOG_LEVEL=CRITICAL, rien n'est journalisé (référence) ;
+  - sync  : écriture dans le thread de la requête (LOG_QUEUE=false), comme
+            l'ancienne configuration par logging.basicConfig ;
+  - queue : file d'attente et thread d'écriture (configuration par défaut).
+
+Cas mesurés :
+  - users-with-folders : GET /api/users/users-with-folders avec --users comptes
+    et dossiers (Ressources n'est resynchronisé qu'après un changement) ;
+  - files              : GET /api/user-folder/files sur une arborescence de dossiers et de plans ;
+  - extract-cached     : GET /api/user-folder/extract-data-from-file servi depuis le cache.
+
+Chaque mode s'exécute dans un processus séparé, avec une base SQLite et un
+cache temporaires. Les journaux sont écrits dans un fichier temporaire, ou
+dans --log-file. --sink-rate (qui ignore --log-file) simule une destination lente (disque saturé,
+collecteur de journaux en retard) : les journaux passent par un tube vidé à
+ce débit, et une écriture attend quand le tube est plein. Le surcoût d'un
+mode est l'écart de sa durée moyenne par requête avec le mode off. Usage :
+    python -m benchmarks.request_logging [--cases files,users-with-folders] [--requests 200]
+                                         [--users 200] [--level INFO] [--log-file chemin]
+                                         [--sink-rate 64]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.synthetic import plan_path
+
+MODES = ("off", "sync", "queue")
+CASES = ("users-with-folders", "files", "extract-cached")
+DEFAULT_DATA_DIR = os.path.join(os.getcwd(), "cache", "benchmarks")
+
+# Comptes fictifs (dossiers Ressources/benchmark_logging_<n>)
+BENCHMARK_PREFIX = "benchmark.logging"
+
+# Arborescence du cas files : sous-dossiers et plans par sous-dossier
+TREE_FOLDERS = 20
+TREE_FILES = 10
+
+
+def _configure_environment(workdir, mode, level, log_file):
+    """Configuration de l'application pour la mesure, avant tout import du paquet app."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'app.sqlite3')}"
+    os.environ["EXTRACTION_CACHE_FOLDER"] = os.path.join(workdir, "extraction")
+    os.environ["EXTRACTION_JOBS_FOLDER"] = os.path.join(workdir, "jobs")
+    os.environ["EXTRACTION_POOL_SIZE"] = "0"
+    os.environ["GEOMETRY_STORE_INGEST"] = "false"
+    os.environ["LOG_FILE"] = log_file
+    os.environ["LOG_LEVEL"] = "CRITICAL" if mode == "off" else level
+    os.environ["LOG_QUEUE"] = "false" if mode == "sync" else "true"
+
+
+def _throttled_sink(path, rate):
+    """Tube nommé vidé à rate Ko/s par un thread ; retourne le compteur d'octets lus."""
+    os.mkfifo(path)
+    drained = [0]
+
+    def drain():
+        with open(path, "rb", buffering=0) as fifo:
+            while True:
+                data = fifo.read(4096)
+                if not data:
+                    return
+                drained[0] += len(data)
+                time.sleep(len(data) / (rate * 1024))
+
+    threading.Thread(target=drain, name="benchmark-sink", daemon=True).start()
+    return drained
+
+
+def _folder_name(index):
+    return f"{BENCHMARK_PREFIX}.{index}".replace(".", "_")
+
+
+def _prepare(app, case, users, data_dir):
+    """Crée les comptes, leurs dossiers et le contenu du cas ; retourne (dossiers créés, requête)."""
+    from app import db
+    from app.models.user import User
+
+    resources = os.path.abspath(os.path.join(app.root_path, "..", "Ressources"))
+    folders = []
+    with app.app_context():
+        db.create_all()
+        for index in range(users if case == "users-with-folders" else 1):
+            folder = os.path.join(resources, _folder_name(index))
+            os.makedirs(folder, exist_ok=True)
+            folders.append(folder)
+            db.session.add(User("Benchmark", str(index), f"{BENCHMARK_PREFIX}.{index}@localhost", "benchmark", "user"))
+        db.session.commit()
+
+    if case == "files":
+        for folder_index in range(TREE_FOLDERS):
+            subfolder = os.path.join(folders[0], f"transfert_{folder_index}")
+            os.makedirs(subfolder, exist_ok=True)
+            for file_index in range(TREE_FILES):
+                with open(os.path.join(subfolder, f"plan_{file_index}.dxf"), "wb") as f:
+                    f.write(b"0\nEOF\n")
+        return folders, "/api/user-folder/files"
+    if case == "extract-cached":
+        shutil.copyfile(plan_path(data_dir, 1000), os.path.join(folders[0], "plan.dxf"))
+        return folders, "/api/user-folder/extract-data-from-file?filename=plan.dxf"
+    return folders, "/api/users/users-with-folders"
+
+
+def run_mode(case, mode, requests, users, level, log_file, data_dir, sink_rate=0):
+    """Exécute un cas dans le processus courant et retourne ses mesures."""
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    log_path = os.path.join(workdir, "app.log") if sink_rate or not log_file else log_file
+    drained = _throttled_sink(log_path, sink_rate) if sink_rate else None
+    _configure_environment(workdir, mode, level, log_path)
+    folders = []
+    try:
+        from flask_jwt_extended import create_access_token
+        from app import create_app
+        from app.services.logging_service import flush_logging
+
+        app = create_app()
+        folders, url = _prepare(app, case, users, data_dir)
+        with app.app_context():
+            token = create_access_token(identity="1", additional_claims={
+                "email": f"{BENCHMARK_PREFIX}.0@localhost", "role": "admin"
+            })
+        headers = {"Authorization": f"Bearer {token}"}
+        client = app.test_client()
+        # Préchauffage : cache d'extraction, index des dossiers, synchronisation initiale
+        for _ in range(3):
+            response = client.get(url, headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError(f"{case} : HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+        durations = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(url, headers=headers)
+            durations.append(time.perf_counter() - start)
+        flush_logging()
+        if drained is not None:
+            log_bytes = drained[0]
+        else:
+            log_bytes = os.path.getsize(log_path) if os.path.isfile(log_path) else 0
+        return {
+            "mean_ms": round(statistics.fmean(durations) * 1000, 3),
+            "p95_ms": round(sorted(durations)[int(0.95 * (len(durations) - 1))] * 1000, 3),
+            "log_bytes": log_bytes
+        }
+    finally:
+        for folder in folders:
+            shutil.rmtree(folder, ignore_errors=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _measure(case, mode, args):
+    """Mesure un mode dans un processus enfant."""
+    command = [sys.executable, "-m", "benchmarks.request_logging", "--case", case, "--mode", mode,
+               "--requests", str(args.requests), "--users", str(args.users), "--level", args.level,
+               "--data-dir", args.data_dir]
+    if args.log_file:
+        command += ["--log-file", args.log_file]
+    if args.sink_rate:
+        command += ["--sink-rate", str(args.sink_rate)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default=",".join(CASES), help="Cas mesurés, séparés par des virgules")
+    parser.add_argument("--requests", type=int, default=200, help="Nombre de requêtes mesurées par mode")
+    parser.add_argument("--users", type=int, default=200, help="Nombre de comptes du cas users-with-folders")
+    parser.add_argument("--level", default="INFO", help="Niveau de journalisation des modes sync et queue")
+    parser.add_argument("--log-file", default="", help="Fichier de journal (temporaire par défaut)")
+    parser.add_argument("--sink-rate", type=float, default=0,
+                        help="Débit de la destination des journaux en Ko/s (0 : fichier, sans limite)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Dossier des plans générés")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        # Processus enfant : une seule mesure, renvoyée en JSON
+        print(json.dumps(run_mode(args.case, args.mode, args.requests, args.users, args.level,
+                                  args.log_file, args.data_dir, args.sink_rate)))
+        return 0
+
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"Cas inconnus : {', '.join(sorted(unknown))} (cas possibles : {', '.join(CASES)})")
+
+    print(f"{'cas':<22}{'mode':<8}{'moyenne (ms)':>14}{'p95 (ms)':>12}{'surcoût (ms)':>14}{'journal':>12}")
+    for case in cases:
+        reference = None
+        for mode in MODES:
+            measures = _measure(case, mode, args)
+            if reference is None:
+                reference = measures["mean_ms"]
+            print(f"{case:<22}{mode:<8}{measures['mean_ms']:>14.3f}{measures['p95_ms']:>12.3f}"
+                  f"{measures['mean_ms'] - reference:>+14.3f}{measures['log_bytes'] / 1024:>10.1f} Ko")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Génère des plans DXF synthétiques pour les mesures de performance.
+
+Les entités (LWPOLYLINE, LINE, CIRCLE, ARC, TEXT) sont créées avec ezdxf et
+écrites au fil de l'eau (addon iterdxf) : même un plan d'un million
+d'entités ne réside jamais en mémoire. Le contenu ne dépend que du nombre
+d'entités et de la graine : deux générations donnent les mêmes entités.
+
+La densité reste constante : l'emprise du plan croît avec la racine du
+nombre d'entités. Les polylignes ont de 2 à max_vertices sommets (surtout
+des rectangles et des contours courts, quelques longs tracés). Usage :
+    python -m benchmarks.synthetic 100000 -o plan.dxf [--seed 1] [--max-vertices 200]
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import ezdxf
+from ezdxf.addons import iterdxf
+from ezdxf.entities import factory
+
+# Part de chaque type d'entité dans le plan
+DEFAULT_MIX = {"LWPOLYLINE": 0.35, "LINE": 0.25, "CIRCLE": 0.1, "ARC": 0.1, "TEXT": 0.2}
+
+LAYERS = ("MURS", "CLOISONS", "PORTES", "FENETRES", "MOBILIER", "COTES", "TEXTES", "SURFACES")
+
+# Surface moyenne du plan par entité (unités de dessin au carré)
+AREA_PER_ENTITY = 25.0
+
+DEFAULT_MAX_VERTICES = 200
+
+
+def _polyline_points(rng, x, y, max_vertices):
+    """Sommets d'une polyligne : rectangle, contour court ou long tracé."""
+    kind = rng.random()
+    if kind < 0.5:
+        width, height = rng.uniform(0.5, 8.0), rng.uniform(0.5, 8.0)
+        return [(x, y), (x + width, y), (x + width, y + height), (x, y + height)], True
+    count = 2 + int(rng.paretovariate(1.5)) if kind < 0.97 else rng.randint(50, max_vertices)
+    count = min(count, max_vertices)
+    points = []
+    angle = rng.uniform(0.0, 2.0 * math.pi)
+    for _ in range(count):
+        points.append((x, y))
+        angle += rng.uniform(-1.0, 1.0)
+        step = rng.uniform(0.2, 3.0)
+        x += step * math.cos(angle)
+        y += step * math.sin(angle)
+    return points, rng.random() < 0.3
+
+
+def iter_entities(count, seed=1, max_vertices=DEFAULT_MAX_VERTICES, mix=None):
+    """Génère (type DXF, attributs, données) pour count entités, de façon déterministe."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    types, weights = zip(*mix.items())
+    side = math.sqrt(max(count, 1) * AREA_PER_ENTITY)
+    for dxftype in rng.choices(types, weights, k=count):
+        x, y = rng.uniform(0.0, side), rng.uniform(0.0, side)
+        attribs = {"layer": rng.choice(LAYERS), "color": rng.choice((256, 256, 256, 1, 3, 5))}
+        if dxftype == "LWPOLYLINE":
+            yield dxftype, attribs, _polyline_points(rng, x, y, max_vertices)
+        elif dxftype == "LINE":
+            length, angle = rng.uniform(0.1, 10.0), rng.uniform(0.0, 2.0 * math.pi)
+            attribs.update(start=(x, y), end=(x + length * math.cos(angle), y + length * math.sin(angle)))
+            yield dxftype, attribs, None
+        elif dxftype == "CIRCLE":
+            attribs.update(center=(x, y), radius=rng.uniform(0.05, 3.0))
+            yield dxftype, attribs, None
+        elif dxftype == "ARC":
+            start = rng.uniform(0.0, 360.0)
+            attribs.update(center=(x, y), radius=rng.uniform(0.1, 3.0),
+                           start_angle=start, end_angle=start + rng.uniform(10.0, 300.0))
+            yield dxftype, attribs, None
+        else:
+            attribs.update(insert=(x, y), height=rng.uniform(0.1, 1.0), text=f"Pièce {rng.randint(1, 999)}")
+            yield dxftype, attribs, None
+
+
+def generate_plan(path, count, seed=1, max_vertices=DEFAULT_MAX_VERTICES, mix=None):
+    """Écrit un plan synthétique de count entités dans path (DXF R2010)."""
+    doc = ezdxf.new("R2010")
+    for name in LAYERS:
+        doc.layers.add(name)
+    owner = doc.modelspace().layout_key
+    # Poignées réservées aux entités écrites après coup : $HANDSEED reste cohérent
+    first_handle = int(doc.entitydb.handles.next(), 16)
+    doc.entitydb.handles.reset(f"{first_handle + count + 1:X}")
+
+    fd, template = tempfile.mkstemp(suffix=".dxf")
+    os.close(fd)
+    try:
+        doc.saveas(template)
+        writer = iterdxf.opendxf(template).export(path)
+        try:
+            for handle, (dxftype, attribs, data) in enumerate(iter_entities(count, seed, max_vertices, mix),
+                                                              start=first_handle):
+                attribs.update(handle=f"{handle:X}", owner=owner)
+                entity = factory.new(dxftype, dxfattribs=attribs)
+                if dxftype == "LWPOLYLINE":
+                    points, closed = data
+                    entity.set_points(points, format="xy")
+                    entity.closed = closed
+                writer.write(entity)
+        finally:
+            writer.close()
+    finally:
+        os.unlink(template)
+    return path
+
+
+def plan_path(folder, count, seed=1, max_vertices=DEFAULT_MAX_VERTICES):
+    """Chemin d'un plan synthétique dans folder, généré s'il n'y est pas déjà."""
+    path = os.path.join(folder, f"plan-{count}-s{seed}-v{max_vertices}.dxf")
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        # Écriture dans un fichier temporaire : un plan interrompu n'est jamais réutilisé
+        partial = f"{path}.partial"
+        generate_plan(partial, count, seed, max_vertices)
+        os.replace(partial, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("count", type=int, help="Nombre d'entités")
+    parser.add_argument("-o", "--output", required=True, help="Fichier DXF à écrire")
+    parser.add_argument("--seed", type=int, default=1, help="Graine du générateur")
+    parser.add_argument("--max-vertices", type=int, default=DEFAULT_MAX_VERTICES,
+                        help="Nombre maximal de sommets par polyligne")
+    args = parser.parse_args(argv)
+    generate_plan(args.output, args.count, args.seed, args.max_vertices)
+    print(f"{args.output} : {args.count} entités, {os.path.getsize(args.output) / (1024 * 1024):.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,3 +26,57 @@ class Config:
 
     # Configuration du dossier des ressources
     RESSOURCES_FOLDER = os.path.join(os.getcwd(), "Ressources")
+
+    # Cache disque des extractions DXF (partagé entre les workers)
+    EXTRACTION_CACHE_FOLDER = os.getenv("EXTRACTION_CACHE_FOLDER", os.path.join(os.getcwd(), "cache", "extraction"))
+    EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+    # Pool de processus d'analyse DXF (0 : analyse dans le thread de la requête)
+    EXTRACTION_POOL_SIZE = int(os.getenv("EXTRACTION_POOL_SIZE", os.cpu_count() or 2))
+    EXTRACTION_JOB_TIMEOUT = float(os.getenv("EXTRACTION_JOB_TIMEOUT", 120))
+    EXTRACTION_JOB_MAX_RSS = int(os.getenv("EXTRACTION_JOB_MAX_RSS", 2 * 1024 ** 3))
+    EXTRACTION_WORKER_MAX_JOBS = int(os.getenv("EXTRACTION_WORKER_MAX_JOBS", 50))
+    EXTRACTION_QUEUE_TIMEOUT = float(os.getenv("EXTRACTION_QUEUE_TIMEOUT", 5))
+
+    # Tâches d'extraction asynchrones : index, uploads en attente et résultats conservés
+    EXTRACTION_JOBS_FOLDER = os.getenv("EXTRACTION_JOBS_FOLDER", os.path.join(os.getcwd(), "cache", "jobs"))
+    EXTRACTION_JOB_RETENTION = int(os.getenv("EXTRACTION_JOB_RETENTION", 24 * 3600))
+
+    # Nombre maximal de fichiers par extraction groupée
+    EXTRACTION_BATCH_MAX_FILES = int(os.getenv("EXTRACTION_BATCH_MAX_FILES", 200))
+
+    # Pyramide de tuiles vectorielles : niveau de zoom maximal et durée maximale de construction
+    TILES_MAX_ZOOM = int(os.getenv("TILES_MAX_ZOOM", 6))
+    TILES_BUILD_TIMEOUT = float(os.getenv("TILES_BUILD_TIMEOUT", 900))
+
+    # Pré-extraction en arrière-plan des fichiers déposés : tâches simultanées, file d'attente, tuiles
+    EXTRACTION_PREFETCH_WORKERS = int(os.getenv("EXTRACTION_PREFETCH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    EXTRACTION_PREFETCH_QUEUE = int(os.getenv("EXTRACTION_PREFETCH_QUEUE", 100))
+    EXTRACTION_PREFETCH_TILES = os.getenv("EXTRACTION_PREFETCH_TILES", "true").lower() in ("1", "true", "yes")
+
+    # Stockage de la géométrie en base : taille des lots d'insertion, enregistrement des fichiers déposés, résultats par requête
+    GEOMETRY_STORE_BATCH_SIZE = int(os.getenv("GEOMETRY_STORE_BATCH_SIZE", 5000))
+    GEOMETRY_STORE_INGEST = os.getenv("GEOMETRY_STORE_INGEST", "true").lower() in ("1", "true", "yes")
+    GEOMETRY_QUERY_MAX_RESULTS = int(os.getenv("GEOMETRY_QUERY_MAX_RESULTS", 10000))
+
+    # Compression des réponses selon Accept-Encoding (zstd, br, gzip) et taille minimale compressée
+    RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+    RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+
+    # Mesure des étapes des requêtes : en-tête Server-Timing, profils à la demande (administrateurs, en-tête X-Profile)
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+    PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", 0.005))
+    PROFILES_FOLDER = os.getenv("PROFILES_FOLDER", os.path.join(os.getcwd(), "cache", "profiles"))
+    PROFILES_MAX_FILES = int(os.getenv("PROFILES_MAX_FILES", 50))
+
+    # Index en mémoire des dossiers utilisateurs (inotify) et intervalle de réconciliation avec le disque (secondes)
+    FOLDER_INDEX = os.getenv("FOLDER_INDEX", "true").lower() in ("1", "true", "yes")
+    FOLDER_INDEX_RECONCILE_INTERVAL = float(os.getenv("FOLDER_INDEX_RECONCILE_INTERVAL", 300))
+
+    # Journalisation : niveau par défaut, niveaux par module ("module=NIVEAU,..."), fichier (sortie d'erreur si vide),
+    # écriture dans un thread dédié, échantillonnage des messages DEBUG répétés (un sur N, 1 : tous)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+    LOG_FILE = os.getenv("LOG_FILE", "")
+    LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() in ("1", "true", "yes")
+    LOG_DEBUG_SAMPLE_RATE = int(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1))
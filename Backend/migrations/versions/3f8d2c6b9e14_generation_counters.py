@@ -0,0 +1,29 @@
+"""Generation counters
+
+Revision ID: 3f8d2c6b9e14
+Revises: 7c4e1b9a2d60
+Create Date: 2026-10-18 16:41:07.218340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8d2c6b9e14'
+down_revision = '7c4e1b9a2d60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    generation = op.create_table('generation',
+    sa.Column('nom', sa.String(length=50), nullable=False),
+    sa.Column('valeur', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('nom')
+    )
+    op.bulk_insert(generation, [{'nom': 'users', 'valeur': 0}])
+
+
+def downgrade():
+    op.drop_table('generation')
@@ -0,0 +1,76 @@
+"""DXF geometry store
+
+Revision ID: 7c4e1b9a2d60
+Revises: e2a359007539
+Create Date: 2026-10-18 10:12:31.527604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1b9a2d60'
+down_revision = 'e2a359007539'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dxf_file',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('id_user', sa.Integer(), nullable=False),
+    sa.Column('chemin', sa.String(length=1024), nullable=False),
+    sa.Column('hash_contenu', sa.String(length=64), nullable=False),
+    sa.Column('taille', sa.BigInteger(), nullable=False),
+    sa.Column('nb_entites', sa.Integer(), nullable=False),
+    sa.Column('minx', sa.Float(), nullable=True),
+    sa.Column('miny', sa.Float(), nullable=True),
+    sa.Column('maxx', sa.Float(), nullable=True),
+    sa.Column('maxy', sa.Float(), nullable=True),
+    sa.Column('date_ingestion', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['id_user'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id_user', 'chemin', name='uq_dxf_file_user_chemin')
+    )
+    op.create_table('dxf_layer',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('id_fichier', sa.Integer(), nullable=False),
+    sa.Column('nom', sa.String(length=255), nullable=False),
+    sa.Column('couleur', sa.Integer(), nullable=True),
+    sa.Column('epaisseur_trait', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['id_fichier'], ['dxf_file.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id_fichier', 'nom', name='uq_dxf_layer_fichier_nom')
+    )
+    op.create_index('ix_dxf_layer_nom', 'dxf_layer', ['nom'], unique=False)
+    op.create_table('dxf_entity',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('id_fichier', sa.Integer(), nullable=False),
+    sa.Column('id_calque', sa.Integer(), nullable=False),
+    sa.Column('type_entite', sa.String(length=16), nullable=False),
+    sa.Column('ferme', sa.Boolean(), nullable=False),
+    sa.Column('couleur', sa.Integer(), nullable=True),
+    sa.Column('epaisseur_trait', sa.Integer(), nullable=True),
+    sa.Column('nb_sommets', sa.Integer(), nullable=False),
+    sa.Column('minx', sa.Float(), nullable=False),
+    sa.Column('miny', sa.Float(), nullable=False),
+    sa.Column('maxx', sa.Float(), nullable=False),
+    sa.Column('maxy', sa.Float(), nullable=False),
+    sa.Column('geometrie', sa.LargeBinary(), nullable=False),
+    sa.Column('texte', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['id_calque'], ['dxf_layer.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['id_fichier'], ['dxf_file.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_dxf_entity_calque_type', 'dxf_entity', ['id_calque', 'type_entite', 'ferme'], unique=False)
+    op.create_index('ix_dxf_entity_fichier_emprise', 'dxf_entity', ['id_fichier', 'minx', 'maxx', 'miny', 'maxy'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_dxf_entity_fichier_emprise', table_name='dxf_entity')
+    op.drop_index('ix_dxf_entity_calque_type', table_name='dxf_entity')
+    op.drop_table('dxf_entity')
+    op.drop_index('ix_dxf_layer_nom', table_name='dxf_layer')
+    op.drop_table('dxf_layer')
+    op.drop_table('dxf_file')
@@ -0,0 +1,33 @@
+"""Users listing indexes
+
+Revision ID: 9b5e7a3c1d28
+Revises: 3f8d2c6b9e14
+Create Date: 2026-10-18 18:12:54.731902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b5e7a3c1d28'
+down_revision = '3f8d2c6b9e14'
+branch_labels = None
+depends_on = None
+
+
+def _has_folder_table():
+    # La table folder n'est pas créée par les migrations (db.create_all)
+    return sa.inspect(op.get_bind()).has_table('folder')
+
+
+def upgrade():
+    op.create_index('ix_user_nom_prenom', 'user', ['nom', 'prenom'], unique=False)
+    if _has_folder_table():
+        op.create_index('ix_folder_id_user', 'folder', ['id_user'], unique=False)
+
+
+def downgrade():
+    if _has_folder_table():
+        op.drop_index('ix_folder_id_user', table_name='folder')
+    op.drop_index('ix_user_nom_prenom', table_name='user')
@@ -0,0 +1,77 @@
+"""Configuration commune des tests : base SQLite, caches et dossier utilisateur temporaires.
+
+Les variables d'environnement sont fixées avant tout import du paquet app
+(config.py les lit à l'import). L'analyse DXF se fait dans le thread de la
+requête (EXTRACTION_POOL_SIZE=0).
+"""
+import io
+import os
+import shutil
+import tempfile
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix="tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'app.sqlite3')}"
+os.environ["EXTRACTION_CACHE_FOLDER"] = os.path.join(WORKDIR, "extraction")
+os.environ["EXTRACTION_JOBS_FOLDER"] = os.path.join(WORKDIR, "jobs")
+os.environ["PROFILES_FOLDER"] = os.path.join(WORKDIR, "profiles")
+os.environ["EXTRACTION_POOL_SIZE"] = "0"
+os.environ["GEOMETRY_STORE_INGEST"] = "false"
+os.environ["EXTRACTION_PREFETCH_TILES"] = "false"
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["LOG_QUEUE"] = "false"
+
+# Compte des tests (dossier Ressources/tests_user)
+TEST_EMAIL = "tests.user@localhost"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app, db
+    from app.models.generation import Generation, USERS_GENERATION
+
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        # Compteur créé par la migration 3f8d2c6b9e14
+        db.session.add(Generation(nom=USERS_GENERATION, valeur=0))
+        db.session.commit()
+    yield app
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """En-têtes d'un administrateur dont l'email désigne le dossier user_folder."""
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        token = create_access_token(identity="1", additional_claims={"email": TEST_EMAIL, "role": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def user_folder(app):
+    """Dossier Ressources du compte des tests, supprimé après le test."""
+    resources = os.path.abspath(os.path.join(app.root_path, "..", "Ressources"))
+    created = not os.path.isdir(resources)
+    folder = os.path.join(resources, TEST_EMAIL.split("@")[0].replace(".", "_"))
+    os.makedirs(folder, exist_ok=True)
+    yield folder
+    shutil.rmtree(resources if created else folder, ignore_errors=True)
+
+
+@pytest.fixture
+def dxf_stream():
+    """Convertit un document ezdxf en flux binaire, comme un fichier ouvert en "rb"."""
+    def encode(doc):
+        text = io.StringIO()
+        doc.write(text)
+        return io.BytesIO(text.getvalue().encode(doc.output_encoding))
+    return encode
@@ -0,0 +1,87 @@
+import ezdxf
+import numpy as np
+import pytest
+from app.services.blocks import BlockLibrary
+from app.services.dxf_stream import iter_dxf
+
+
+def _library(stream):
+    library = BlockLibrary()
+    inserts = []
+    for kind, value in iter_dxf(stream, types=("LINE", "CIRCLE", "INSERT")):
+        if kind == "block":
+            library.add(value)
+        elif kind == "entity" and value.dxftype() == "INSERT":
+            inserts.append(value)
+    return library, inserts
+
+
+def test_insert_affine_transform(dxf_stream):
+    doc = ezdxf.new()
+    block = doc.blocks.new("B", base_point=(1, 0))
+    block.add_line((1, 0), (2, 0))
+    block.add_circle((1, 1), 0.5)
+    doc.modelspace().add_blockref("B", (10, 20), dxfattribs={"rotation": 90, "xscale": 2, "yscale": 2})
+    library, (insert,) = _library(dxf_stream(doc))
+
+    geometry = library.expand(insert)
+    # Point de base en (10, 20), rotation d'un quart de tour, échelle 2
+    np.testing.assert_allclose(geometry.groups["lines"]["coords"], [[10, 20], [10, 22]], atol=1e-12)
+    np.testing.assert_allclose(geometry.groups["circles"]["center"], [[8, 20]], atol=1e-12)
+    assert geometry.groups["circles"]["radius"] == pytest.approx([1.0])
+
+
+def test_nested_blocks_and_depth_limit(dxf_stream):
+    doc = ezdxf.new()
+    doc.blocks.new("B0").add_line((0, 0), (1, 0))
+    for level in range(1, 4):
+        doc.blocks.new(f"B{level}").add_blockref(f"B{level - 1}", (1, 0))
+    doc.modelspace().add_blockref("B3", (0, 0))
+    stream = dxf_stream(doc)
+
+    library, (insert,) = _library(stream)
+    np.testing.assert_allclose(library.expand(insert).groups["lines"]["coords"], [[3, 0], [4, 0]])
+
+    stream.seek(0)
+    shallow, (insert,) = _library(stream)
+    shallow.max_depth = 2
+    assert shallow.expand(insert) is None
+
+
+def test_circular_reference_is_ignored(dxf_stream):
+    doc = ezdxf.new()
+    a = doc.blocks.new("A")
+    a.add_line((0, 0), (1, 0))
+    a.add_blockref("C", (0, 0))
+    doc.blocks.new("C").add_blockref("A", (5, 0))
+    doc.modelspace().add_blockref("A", (0, 0))
+    library, (insert,) = _library(dxf_stream(doc))
+    geometry = library.expand(insert)
+    assert len(geometry.groups["lines"]["type"]) == 1
+
+
+def test_block_at_two_depths(dxf_stream):
+    doc = ezdxf.new()
+    doc.blocks.new("Y").add_line((0, 0), (1, 0))
+    x = doc.blocks.new("X")
+    x.add_line((0, 1), (1, 1))
+    x.add_blockref("Y", (0, 0))
+    doc.blocks.new("W").add_blockref("X", (0, 0))
+    msp = doc.modelspace()
+    msp.add_blockref("X", (0, 0))
+    msp.add_blockref("W", (0, 0))
+    x_first = dxf_stream(doc)
+    for insert in list(msp):
+        msp.delete_entity(insert)
+    msp.add_blockref("W", (0, 0))
+    msp.add_blockref("X", (0, 0))
+    w_first = dxf_stream(doc)
+
+    # Profondeur 2 : X complet au premier niveau, Y coupé sous W
+    counts = {}
+    for stream in (x_first, w_first):
+        library, inserts = _library(stream)
+        library.max_depth = 2
+        for insert in inserts:
+            counts.setdefault(insert.dxf.name, set()).add(len(library.expand(insert).groups["lines"]["type"]))
+    assert counts == {"X": {2}, "W": {1}}
@@ -0,0 +1,46 @@
+import ezdxf
+import numpy as np
+from app.services.columnar import COLUMNAR_MIMETYPE, COORD_COLUMNS, decode_columnar, extract_columnar
+
+EXTRACT_URL = "/api/user-folder/extract-data-from-file"
+
+
+def _plan():
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(654321.123, 6543210.457), (654331.5, 6543210.9), (654331.25, 6543220.05)], close=True)
+    msp.add_line((654300.01, 6543200.02), (654310.37, 6543205.81))
+    msp.add_circle((654320.4, 6543230.6), 2.5)
+    msp.add_arc((654340.2, 6543240.8), 1.5, 0, 90)
+    msp.add_text("A", dxfattribs={"insert": (654350.7, 6543250.3)})
+    return doc
+
+
+def test_columnar_round_trip(dxf_stream):
+    header, arrays = decode_columnar(extract_columnar(dxf_stream(_plan())))
+    assert header["coords"] == "float64"
+    assert arrays["polylines.coords"].reshape(-1, 2).tolist() == [
+        [654321.123, 6543210.457], [654331.5, 6543210.9], [654331.25, 6543220.05]
+    ]
+    assert arrays["circles.radius"].tolist() == [2.5]
+
+    quantum = 0.001
+    q_header, q_arrays = decode_columnar(extract_columnar(dxf_stream(_plan()), quantum=quantum))
+    assert q_header["coords"] == "int32-delta" and q_header["quantum"] == quantum
+    for name in COORD_COLUMNS:
+        assert q_arrays[name].dtype == np.int32
+        # Deltas cumulés, remis à l'échelle et décalés de l'origine
+        restored = np.cumsum(q_arrays[name].reshape(-1, 2), axis=0) * quantum + q_header["origin"]
+        np.testing.assert_allclose(restored, arrays[name].reshape(-1, 2), rtol=0, atol=quantum / 2 + 1e-9)
+    assert q_arrays["circles.radius"].tolist() == [2.5]
+
+
+def test_quantum_must_be_finite_positive(client, auth_headers, user_folder):
+    _plan().saveas(f"{user_folder}/plan.dxf")
+    headers = dict(auth_headers, Accept=COLUMNAR_MIMETYPE)
+    for quantum in ("0", "-1", "inf", "nan"):
+        response = client.get(EXTRACT_URL, headers=headers, query_string={"filename": "plan.dxf", "quantum": quantum})
+        assert response.status_code == 400, quantum
+    response = client.get(EXTRACT_URL, headers=headers, query_string={"filename": "plan.dxf", "quantum": "0.01"})
+    assert response.status_code == 200
+    assert decode_columnar(response.data)[0]["quantum"] == 0.01
@@ -0,0 +1,56 @@
+import time
+import ezdxf
+
+EXTRACT_URL = "/api/user-folder/extract-data-from-file"
+
+
+def _save_plan(path, lines):
+    doc = ezdxf.new()
+    for i in range(lines):
+        doc.modelspace().add_line((0, i), (1, i))
+    doc.saveas(path)
+
+
+def _conditional(headers, etag):
+    return dict(headers, **{"If-None-Match": etag})
+
+
+def test_extraction_revalidation(client, auth_headers, user_folder):
+    _save_plan(f"{user_folder}/plan.dxf", 2)
+    query = {"filename": "plan.dxf"}
+    response = client.get(EXTRACT_URL, headers=auth_headers, query_string=query)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    assert client.get(EXTRACT_URL, headers=_conditional(auth_headers, etag), query_string=query).status_code == 304
+    # Autre encodage négocié, autre représentation
+    gzip = client.get(EXTRACT_URL, headers=dict(_conditional(auth_headers, etag), **{"Accept-Encoding": "gzip"}),
+                      query_string=query)
+    assert gzip.status_code == 200 and gzip.headers["ETag"] != etag
+    # POST ne répond jamais 304
+    posted = client.post(EXTRACT_URL, headers=_conditional(auth_headers, etag), json=query)
+    assert posted.status_code == 200
+
+    _save_plan(f"{user_folder}/plan.dxf", 3)
+    changed = client.get(EXTRACT_URL, headers=_conditional(auth_headers, etag), query_string=query)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json["statistics"]["line_count"] == 3
+
+
+def test_listing_revalidation(client, auth_headers, user_folder):
+    _save_plan(f"{user_folder}/a.dxf", 1)
+    response = client.get("/api/user-folder/files", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert client.get("/api/user-folder/files", headers=_conditional(auth_headers, etag)).status_code == 304
+
+    _save_plan(f"{user_folder}/b.dxf", 1)
+    # Ajout vu par l'index des dossiers (inotify) : quelques millisecondes
+    for _ in range(50):
+        response = client.get("/api/user-folder/files", headers=_conditional(auth_headers, etag))
+        if response.status_code == 200:
+            break
+        time.sleep(0.02)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,56 @@
+import ezdxf
+import pytest
+from app.services.diff_service import diff_indexes, diff_results
+from app.services.extraction_engine import extract
+from app.services.spatial_service import SpatialIndex, build_spatial_index
+
+
+def _revision(new):
+    """Deux révisions d'un petit plan : chaque entité illustre un cas de comparaison."""
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (100, 100))
+    msp.add_circle((51, 50) if new else (50, 50), 2)
+    msp.add_lwpolyline([(20, 20), (30, 20), (30, 30), (20, 30)], close=True,
+                       dxfattribs={"layer": "MURS", "color": 1 if new else 7})
+    msp.add_lwpolyline([(60, 60), (70, 60), (70, 66 if new else 65)], dxfattribs={"layer": "RESEAU"})
+    if new:
+        msp.add_line((80, 10), (85, 10), dxfattribs={"layer": "NOUVEAU"})
+    else:
+        msp.add_text("A", dxfattribs={"insert": (90, 90), "height": 2})
+    return doc
+
+
+def _check(diff):
+    assert diff["summary"]["unchanged"] == 1
+    assert [entity["layer"] for entity in diff["added"]] == ["NOUVEAU"]
+    assert [entity["text"] for entity in diff["removed"]] == ["A"]
+    changes = {modification["old"]["layer"]: modification for modification in diff["modified"]}
+    assert set(changes) == {"0", "MURS", "RESEAU"}
+    # Déplacée : même forme, ancrage décalé
+    assert changes["0"]["changes"] == ["position"]
+    assert changes["0"]["offset"]["dx"] == pytest.approx(1.0)
+    assert changes["0"]["offset"]["dy"] == pytest.approx(0.0)
+    # Même géométrie, attribut modifié
+    assert changes["MURS"]["changes"] == ["color"]
+    # Géométrie modifiée
+    assert changes["RESEAU"]["changes"] == ["geometry"]
+
+
+def test_diff_results_classification(dxf_stream):
+    _check(diff_results(extract(dxf_stream(_revision(False))), extract(dxf_stream(_revision(True)))))
+
+
+def test_diff_indexes_classification(dxf_stream, tmp_path):
+    indexes = []
+    for new in (False, True):
+        path = tmp_path / f"revision_{new}.index"
+        path.write_bytes(build_spatial_index(extract(dxf_stream(_revision(new)))))
+        indexes.append(SpatialIndex(str(path)))
+    _check(diff_indexes(*indexes))
+
+
+def test_identical_revisions(dxf_stream):
+    diff = diff_results(extract(dxf_stream(_revision(False))), extract(dxf_stream(_revision(False))))
+    assert diff["summary"]["unchanged"] == 5
+    assert diff["added"] == diff["removed"] == diff["modified"] == []
@@ -0,0 +1,45 @@
+import ezdxf
+import pytest
+from app.services.dxf_stream import iter_dxf
+
+
+def _plan():
+    doc = ezdxf.new()
+    block = doc.blocks.new("PORTE")
+    block.add_line((0, 0), (1, 0))
+    block.add_circle((0, 0), 1)
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (5, 5))
+    msp.add_lwpolyline([(0, 0), (1, 0), (1, 1)], close=True)
+    msp.add_blockref("PORTE", (10, 10))
+    msp.add_blockref("PORTE", (20, 10))
+    return doc
+
+
+def _end(stream, types):
+    return [value for kind, value in iter_dxf(stream, types=types) if kind == "end"][0]
+
+
+@pytest.mark.parametrize("types", [(), ("LINE",), ("LINE", "INSERT"), None])
+def test_counts_do_not_depend_on_requested_types(dxf_stream, types):
+    # Un marqueur SECTION suivant la section BLOCKS ne doit pas devenir une entité
+    end = _end(dxf_stream(_plan()), types)
+    assert end["total_entities"] == 4
+    assert end["type_counts"] == {"LINE": 1, "LWPOLYLINE": 1, "INSERT": 2}
+
+
+def test_blocks_are_read_only_with_insert(dxf_stream):
+    kinds = [kind for kind, _ in iter_dxf(dxf_stream(_plan()), types=("LINE",))]
+    assert "block" not in kinds
+    blocks = [value for kind, value in iter_dxf(dxf_stream(_plan()), types=("LINE", "INSERT")) if kind == "block"]
+    assert [block["name"] for block in blocks] == ["PORTE"]
+    assert [entity.dxftype() for entity in blocks[0]["entities"]] == ["LINE"]
+
+
+
+def test_r12_layer_lineweight_default(dxf_stream):
+    # Valeur par défaut d'ezdxf (-3), comme à la lecture du document complet
+    doc = ezdxf.new("R12")
+    doc.layers.add("MURS", color=3)
+    layers = {value["name"]: value for kind, value in iter_dxf(dxf_stream(doc), types=()) if kind == "layer"}
+    assert layers["MURS"] == {"name": "MURS", "color": 3, "lineweight": -3}
@@ -0,0 +1,19 @@
+from app.services.extraction_cache import cache_response, get_extraction_cache
+
+
+def test_compressed_variant_not_counted(app):
+    payload = b'{"layers": []}' * 1000
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        cache = get_extraction_cache()
+        cache.put("cache-response-test", "full", payload)
+        before = cache.stats()
+        # Une requête : lecture du résultat (comptée), puis de sa version compressée
+        cached = cache.get("cache-response-test", "full")
+        response = cache_response(cached, True, key=("cache-response-test", "full"))
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert cache.contains("cache-response-test", "full.gzip")
+        # Deuxième requête : version compressée resservie depuis le cache
+        cache_response(cache.get("cache-response-test", "full"), True, key=("cache-response-test", "full"))
+        after = cache.stats()
+    assert after["hits"] - before["hits"] == 2
+    assert after["misses"] == before["misses"]
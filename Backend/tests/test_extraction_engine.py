@@ -0,0 +1,46 @@
+import ezdxf
+from app.services.columnar import decode_columnar, extract_columnar
+from app.services.extraction_engine import extract
+
+
+def _plan():
+    doc = ezdxf.new()
+    block = doc.blocks.new("MOBILIER")
+    block.add_lwpolyline([(0, 0), (1, 0), (1, 1)], close=True)
+    block.add_circle((0, 0), 1)
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (10, 0), (10, 10)], close=True)
+    msp.add_line((0, 0), (1, 1))
+    for x in range(3):
+        msp.add_blockref("MOBILIER", (x * 5, 20))
+    return doc
+
+
+def test_statistics_agree_across_modes(dxf_stream):
+    totals = {fields: extract(dxf_stream(_plan()), fields=fields)["statistics"]["total_entities"]
+              for fields in ("full", "geometry", "stats", "measures")}
+    assert set(totals.values()) == {5}
+
+
+def test_expanded_counts_match_returned_lists(dxf_stream):
+    result = extract(dxf_stream(_plan()))
+    statistics = result["statistics"]
+    assert statistics["polyline_count"] == 1
+    assert statistics["circle_count"] == 0
+    assert statistics["insert_count"] == 3
+    assert statistics["expanded_polyline_count"] == 3
+    assert statistics["expanded_circle_count"] == 3
+    for key, count in (("polylines", "polyline_count"), ("lines", "line_count"), ("circles", "circle_count")):
+        assert len(result[key]) == statistics[count] + statistics[f"expanded_{count}"]
+
+
+def test_stats_mode_has_only_raw_counts(dxf_stream):
+    statistics = extract(dxf_stream(_plan()), fields="stats")["statistics"]
+    assert "expanded_polyline_count" not in statistics
+
+
+def test_columnar_expanded_counts(dxf_stream):
+    header, arrays = decode_columnar(extract_columnar(dxf_stream(_plan())))
+    statistics = header["statistics"]
+    assert len(arrays["polylines.closed"]) == statistics["polyline_count"] + statistics["expanded_polyline_count"]
+    assert len(arrays["circles.radius"]) == statistics["circle_count"] + statistics["expanded_circle_count"]
@@ -0,0 +1,46 @@
+import json
+import time
+import ezdxf
+from app.services.extraction_engine import EXTRACTED_TYPES, extract, projection_variant
+from app.services.extraction_jobs import prefetch_file
+
+
+def test_submit_rejects_paths_outside_user_folder(client, auth_headers, user_folder):
+    for body in ({"filename": "../../../config.py"}, {"filename": "config.py", "folder": "../.."}):
+        response = client.post("/api/extraction-jobs", headers=auth_headers, json=body)
+        assert response.status_code == 404
+
+
+def test_submit_user_folder_file(client, auth_headers, user_folder):
+    doc = ezdxf.new()
+    doc.modelspace().add_line((0, 0), (1, 1))
+    doc.saveas(f"{user_folder}/plan.dxf")
+    response = client.post("/api/extraction-jobs", headers=auth_headers, json={"filename": "plan.dxf"})
+    assert response.status_code == 202
+
+    status_url = response.json["status_url"]
+    for _ in range(100):
+        status = client.get(status_url, headers=auth_headers).json
+        if status["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert status["status"] == "done"
+    result = client.get(response.json["result_url"], headers=auth_headers)
+    assert result.json["statistics"]["line_count"] == 1
+
+
+def test_prefetch_matches_on_demand_variants(tmp_path):
+    doc = ezdxf.new()
+    block = doc.blocks.new("MOBILIER")
+    block.add_line((0, 0), (1, 0))
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (1, 1))
+    msp.add_blockref("MOBILIER", (5, 5))
+    path = str(tmp_path / "plan.dxf")
+    doc.saveas(path)
+
+    payloads = prefetch_file(path, None, "hash", 0)
+    for fields in ("full", "layers", "stats"):
+        with open(path, "rb") as stream:
+            on_demand = extract(stream, fields=fields)
+        assert json.loads(payloads[projection_variant(EXTRACTED_TYPES, fields)]) == on_demand
@@ -0,0 +1,27 @@
+import pytest
+from app.controllers.file_controller import pooled_ndjson_response
+from app.services.extraction_engine import EXTRACTED_TYPES
+from app.services.extraction_pool import ExtractionPool, ExtractionJobError
+
+EXTRACT_URL = "/api/user-folder/extract-data-from-file"
+
+
+def _failing_chunks():
+    yield b"premier\n"
+    raise ValueError("plan tronqué")
+
+
+def test_inline_stream_wraps_iteration_errors():
+    pool = ExtractionPool(0, timeout=None, max_rss=None, max_jobs_per_worker=None, queue_timeout=None)
+    chunks = pool.stream(_failing_chunks)
+    assert next(chunks) == b"premier\n"
+    with pytest.raises(ExtractionJobError, match="plan tronqué"):
+        next(chunks)
+
+
+def test_inline_ndjson_missing_source(app, tmp_path):
+    # Source disparue entre la vérification de la route et la lecture : erreur au premier paquet
+    with app.test_request_context(EXTRACT_URL):
+        response = pooled_ndjson_response(str(tmp_path / "absent.dxf"), EXTRACTED_TYPES, "full")
+    assert response.status_code == 400
+    assert "error" in response.json
@@ -0,0 +1,40 @@
+import ezdxf
+import pytest
+from app.services.extraction_engine import extract
+
+# Coordonnées projetées (Lambert 93) : grandes valeurs non entières
+ORIGIN = (654_321.123, 6_543_210.457)
+
+
+def _measures(stream):
+    return {entry["name"]: entry for entry in extract(stream, fields="measures")["layer_statistics"]}
+
+
+def test_polyline_area_with_large_offsets(dxf_stream):
+    doc = ezdxf.new()
+    x, y = ORIGIN
+    doc.layers.add("SURFACES")
+    doc.modelspace().add_lwpolyline([(x, y), (x + 10.1, y), (x + 10.1, y + 9.9), (x, y + 9.9)], close=True,
+                                     dxfattribs={"layer": "SURFACES"})
+    entry = _measures(dxf_stream(doc))["SURFACES"]
+    assert entry["polyline_area"] == pytest.approx(10.1 * 9.9, rel=1e-9)
+    assert entry["polyline_length"] == pytest.approx(2 * (10.1 + 9.9), rel=1e-9)
+    assert entry["closed_polyline_count"] == 1
+
+
+def test_measures_include_bulges_and_block_references(dxf_stream):
+    doc = ezdxf.new()
+    doc.layers.add("MOBILIER")
+    block = doc.blocks.new("TABLE")
+    # Disque de rayon 1 : deux demi-cercles
+    block.add_lwpolyline([(0, 0, 1), (2, 0, 1)], format="xyb", close=True, dxfattribs={"layer": "MOBILIER"})
+    msp = doc.modelspace()
+    msp.add_blockref("TABLE", (0, 0))
+    msp.add_blockref("TABLE", (10, 0))
+    msp.add_line((0, 0), (3, 4), dxfattribs={"layer": "MOBILIER"})
+    entry = _measures(dxf_stream(doc))["MOBILIER"]
+    assert entry["polyline_count"] == 2
+    assert entry["polyline_area"] == pytest.approx(2 * 3.141592653589793)
+    assert entry["line_length"] == pytest.approx(5.0)
+    # Emprise des polylignes : leurs sommets (les arcs n'y sont pas développés)
+    assert entry["extent"] == pytest.approx([0.0, 0.0, 12.0, 4.0])
@@ -0,0 +1,35 @@
+import os
+import ezdxf
+
+USER_FOLDER_EXTRACT_URL = "/api/user-folder/extract-data-from-file"
+
+
+def _outside_plan(user_folder, tmp_path):
+    """Plan hors du dossier utilisateur ; retourne (chemin ../ relatif, chemin absolu)."""
+    path = str(tmp_path / "outside.dxf")
+    doc = ezdxf.new()
+    doc.modelspace().add_line((0, 0), (1, 1))
+    doc.saveas(path)
+    return os.path.relpath(path, user_folder), path
+
+
+def test_user_folder_extract_confined(app, auth_headers, user_folder, tmp_path):
+    relative, absolute = _outside_plan(user_folder, tmp_path)
+    assert relative.startswith("..")
+    # La route du blueprint file masque celle du namespace à la même URL : appel direct de la ressource
+    view = app.view_functions["user-folder_extract_data_from_file"]
+    for filename in (relative, absolute):
+        with app.test_request_context(USER_FOLDER_EXTRACT_URL, method="POST", headers=auth_headers,
+                                      json={"filename": filename}):
+            response = app.make_response(view())
+        assert response.status_code == 404
+        assert response.json == {"message": "Fichier non trouvé"}
+
+
+def test_extract_data_from_file_confined(client, auth_headers, user_folder, tmp_path):
+    relative, absolute = _outside_plan(user_folder, tmp_path)
+    folder, name = os.path.split(relative)
+    for query in ({"filename": relative}, {"folder": folder, "filename": name}, {"filename": absolute}):
+        response = client.get(USER_FOLDER_EXTRACT_URL, headers=auth_headers, query_string=query)
+        assert response.status_code == 404
+        assert "error" in response.json
@@ -0,0 +1,88 @@
+import math
+import ezdxf
+import numpy as np
+import pytest
+from app.services.surface_service import compute_surface_areas, ring_areas
+
+
+def test_ring_areas_with_bulges():
+    # Carré de côté 2 et disque de rayon 1 formé de deux demi-cercles (bulge 1)
+    coords = np.array([[0, 0], [2, 0], [2, 2], [0, 2], [0, 0], [2, 0]], dtype=np.float64)
+    bulges = np.array([0, 0, 0, 0, 1, 1], dtype=np.float64)
+    areas = ring_areas(coords, bulges, np.array([0, 4, 6]))
+    assert areas == pytest.approx([4.0, math.pi])
+
+
+def test_ring_areas_large_offsets():
+    # Coordonnées projetées : la perte de précision du lacet dépasserait 1e-3
+    rectangle = np.array([[0, 0], [10.1, 0], [10.1, 9.9], [0, 9.9]]) + [654_321.123, 6_543_210.457]
+    areas = ring_areas(rectangle, np.zeros(4), np.array([0, 4]))
+    assert areas[0] == pytest.approx(10.1 * 9.9, rel=1e-9)
+
+
+def test_distinct_rings_with_same_extent(dxf_stream):
+    # Deux triangles qui partagent le carré 10×10 : même nombre de sommets, aire et emprise
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (10, 0), (10, 10)], close=True)
+    msp.add_lwpolyline([(0, 0), (10, 10), (0, 10)], close=True)
+    surface = compute_surface_areas(dxf_stream(doc))
+    assert surface["total_area"] == pytest.approx(100.0)
+    assert surface["polygon_count"] == 2
+    assert surface["duplicates_ignored"] == 0
+
+
+def test_duplicate_rings_any_start_and_direction(dxf_stream):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (4, 0), (4, 3), (0, 3)], close=True)
+    msp.add_lwpolyline([(4, 3), (0, 3), (0, 0), (4, 0)], close=True)
+    msp.add_lwpolyline([(0, 0), (0, 3), (4, 3), (4, 0)], close=True)
+    surface = compute_surface_areas(dxf_stream(doc))
+    assert surface["total_area"] == pytest.approx(12.0)
+    assert surface["duplicates_ignored"] == 2
+
+
+def test_duplicate_rings_with_reversed_arc(dxf_stream):
+    # Même contour avec un arc, parcouru dans les deux sens ; l'arc opposé n'est pas un doublon
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0, 0), (2, 0, 0), (2, 2, 0.5), (0, 2, 0)], format="xyb", close=True)
+    msp.add_lwpolyline([(0, 0, 0), (0, 2, -0.5), (2, 2, 0), (2, 0, 0)], format="xyb", close=True)
+    msp.add_lwpolyline([(0, 0, 0), (2, 0, 0), (2, 2, -0.5), (0, 2, 0)], format="xyb", close=True)
+    surface = compute_surface_areas(dxf_stream(doc))
+    assert surface["polygon_count"] == 2
+    assert surface["duplicates_ignored"] == 1
+
+
+def test_overlapping_rings_are_both_counted(dxf_stream):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (10, 0), (10, 10), (0, 10)], close=True)
+    msp.add_lwpolyline([(5, 0), (15, 0), (15, 10), (5, 10)], close=True)
+    assert compute_surface_areas(dxf_stream(doc))["total_area"] == pytest.approx(200.0)
+
+
+def test_surface_area_route_rejects_paths_outside_user_folder(client, auth_headers, user_folder):
+    response = client.post("/api/user-folder/surface-area", headers=auth_headers,
+                           json={"filename": "../../../config.py"})
+    assert response.status_code == 404
+    response = client.post("/api/user-folder/surface-area", headers=auth_headers,
+                           json={"filename": "config.py", "folder": "../.."})
+    assert response.status_code == 404
+
+
+def test_surface_area_route_without_json_body(client, auth_headers, user_folder):
+    response = client.post("/api/user-folder/surface-area", headers=auth_headers, data="filename=plan.dxf")
+    assert response.status_code == 400
+
+
+def test_surface_area_route(client, auth_headers, user_folder):
+    doc = ezdxf.new()
+    doc.modelspace().add_lwpolyline([(0, 0), (4, 0), (4, 3), (0, 3)], close=True)
+    doc.saveas(f"{user_folder}/plan.dxf")
+    response = client.post("/api/user-folder/surface-area", headers=auth_headers,
+                           json={"filename": "plan.dxf", "threshold": 10})
+    assert response.status_code == 200
+    assert response.json["total_area"] == pytest.approx(12.0)
+    assert response.json["meets_threshold"] is True
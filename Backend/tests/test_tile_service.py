@@ -0,0 +1,77 @@
+import ezdxf
+import numpy as np
+import pytest
+from app.services.columnar import decode_columnar
+from app.services.extraction_engine import extract
+from app.services.tile_service import (ARCHIVE_MAGIC, ArchiveRange, TileArchive, _clip_polylines, _clip_rings,
+                                       _clip_segments, write_tile_archive)
+
+RECT = np.array([[0.0, 0.0, 10.0, 10.0]])
+
+
+def _area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def test_clip_segments_liang_barsky():
+    start = np.array([[-5.0, 5.0], [-5.0, -5.0], [-1.0, 2.0], [2.0, 2.0], [10.0, 0.0]])
+    delta = np.array([[20.0, 0.0], [4.0, 4.0], [0.0, 5.0], [3.0, 3.0], [0.0, 10.0]])
+    t0, t1, valid = _clip_segments(start, delta, RECT[0])
+    # Traversant, hors du rectangle, parallèle au bord à l'extérieur, intérieur, sur le bord
+    assert valid.tolist() == [True, False, False, True, True]
+    assert (t0[0], t1[0]) == (0.25, 0.75)
+    assert (t0[3], t1[3]) == (0.0, 1.0)
+    assert (t0[4], t1[4]) == (0.0, 1.0)
+
+
+def test_clip_polylines_splits_at_tile_edges():
+    vertices = np.array([[2.0, -5.0], [2.0, 5.0], [15.0, 5.0], [8.0, 5.0],
+                         [20.0, 20.0], [30.0, 30.0]])
+    rows, lengths, pieces = _clip_polylines(np.array([4, 2]), vertices, np.repeat(RECT, 2, axis=0))
+    # Sortie puis retour dans la tuile : deux morceaux ; la seconde polyligne est hors tuile
+    assert rows.tolist() == [0, 0]
+    assert lengths.tolist() == [3, 2]
+    assert pieces.tolist() == [[2, 0], [2, 5], [10, 5], [10, 5], [8, 5]]
+
+
+def test_clip_rings_sutherland_hodgman():
+    vertices = np.array([[-5.0, -5.0], [5.0, -5.0], [5.0, 5.0], [-5.0, 5.0],
+                         [2.0, 2.0], [4.0, 2.0], [4.0, 4.0],
+                         [20.0, 20.0], [30.0, 20.0], [30.0, 30.0]])
+    lengths, clipped = _clip_rings(np.array([4, 3, 3]), vertices, np.repeat(RECT, 3, axis=0))
+    first, inner = clipped[:lengths[0]], clipped[lengths[0]:lengths[0] + lengths[1]]
+    # Coin recouvrant la tuile : carré (0, 0)-(5, 5) ; triangle intérieur inchangé ; contour extérieur vide
+    assert sorted(map(tuple, first.tolist())) == [(0, 0), (0, 5), (5, 0), (5, 5)]
+    assert _area(first) == pytest.approx(25.0)
+    assert inner.tolist() == [[2, 2], [4, 2], [4, 4]]
+    assert lengths[2] == 0
+
+
+def test_archive_write_and_read(dxf_stream, tmp_path):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (1, 1))
+    msp.add_line((99, 99), (100, 100))
+    path = str(tmp_path / "plan.dxf.tiles")
+
+    count = write_tile_archive(path, extract(dxf_stream(doc)), "empreinte", 1)
+    with open(path, "rb") as f:
+        assert f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+    archive = TileArchive(path)
+    assert archive.content_hash == "empreinte"
+    assert archive.metadata()["extent"] == [0.0, 0.0, 100.0, 100.0]
+    assert len(archive.keys) == count == 3
+    # Niveau 1 : lignes dans les tuiles bas gauche (0, 1) et haut droite (1, 0), les deux autres vides
+    assert archive.locate(1, 0, 0) is None and archive.locate(1, 1, 1) is None
+    assert archive.locate(2, 0, 0) is None and archive.locate(1, 2, 0) is None
+    for z, x, y in ((0, 0, 0), (1, 0, 1), (1, 1, 0)):
+        offset, length = archive.locate(z, x, y)
+        tile = ArchiveRange(path, offset, length)
+        try:
+            header, arrays = decode_columnar(tile.read())
+        finally:
+            tile.close()
+        assert (header["z"], header["x"], header["y"]) == (z, x, y)
+        assert len(arrays["lines.coords"]) == (8 if z == 0 else 4)
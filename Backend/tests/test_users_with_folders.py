@@ -0,0 +1,114 @@
+from datetime import datetime
+import pytest
+from app import db
+from app.models.folder import Folder
+from app.models.user import User
+from app.services.user_service import get_users_with_folders
+
+
+@pytest.fixture
+def accounts(app):
+    """25 comptes "user" (noms et dates de dossier en partie égaux) et un administrateur."""
+    with app.app_context():
+        users = [User(f"Nom{i % 4}", f"Prenom{i:02d}", f"compte.{i:02d}@localhost", "secret", "user")
+                 for i in range(25)]
+        users.append(User("Admin", "Admin", "admin.tests@localhost", "secret", "admin"))
+        db.session.add_all(users)
+        db.session.flush()
+        for i, user in enumerate(users[:20]):
+            folder = Folder(user.id, f"compte_{i:02d}")
+            folder.date_creation = datetime(2024, 1, 1 + i % 3)
+            db.session.add(folder)
+        db.session.commit()
+        ids = [user.id for user in users]
+    yield ids
+    with app.app_context():
+        for folder in Folder.query.filter(Folder.id_user.in_(ids)):
+            db.session.delete(folder)
+        for user in User.query.filter(User.id.in_(ids)):
+            db.session.delete(user)
+        db.session.commit()
+
+
+def _all_pages(**kwargs):
+    rows, cursor = [], None
+    while True:
+        page, cursor = get_users_with_folders(limit=7, cursor=cursor, **kwargs)
+        rows += page
+        if cursor is None:
+            return rows
+
+
+SORT_KEYS = {
+    "name": lambda row: (row["nom"], row["prenom"], row["user_id"]),
+    "email": lambda row: (row["email"], row["user_id"]),
+    "date": lambda row: (row["date_creation"] or "", row["user_id"])
+}
+
+
+@pytest.mark.parametrize("sort", sorted(SORT_KEYS))
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_cover_every_user_once(app, accounts, sort, descending):
+    with app.app_context():
+        rows = _all_pages(sort=sort, descending=descending)
+    assert sorted(row["user_id"] for row in rows) == accounts[:25]
+    keys = [SORT_KEYS[sort](row) for row in rows]
+    assert keys == sorted(keys, reverse=descending)
+    assert sum(1 for row in rows if row["folder_id"] is None) == 5
+
+
+def test_search_terms_and_wildcards(app, accounts):
+    with app.app_context():
+        rows, cursor = get_users_with_folders(search="nom1 prenom0")
+        assert sorted(row["prenom"] for row in rows) == ["Prenom01", "Prenom05", "Prenom09"]
+        assert cursor is None
+        # % et _ sont cherchés tels quels
+        assert get_users_with_folders(search="%")[0] == []
+        assert get_users_with_folders(search="compte_")[0] == []
+
+
+def test_cursor_is_bound_to_its_sort(app, accounts):
+    with app.app_context():
+        _, cursor = get_users_with_folders(sort="date", descending=True, limit=5)
+        with pytest.raises(ValueError):
+            get_users_with_folders(sort="date", limit=5, cursor=cursor)
+        with pytest.raises(ValueError):
+            get_users_with_folders(sort="email", descending=True, limit=5, cursor=cursor)
+        with pytest.raises(ValueError):
+            get_users_with_folders(cursor="pas-un-curseur")
+
+
+def test_route_pages_and_conditional_get(app, client, auth_headers, user_folder, accounts):
+    url = "/api/users/users-with-folders"
+    response = client.get(url, headers=auth_headers, query_string={"limit": 10, "sort": "date", "order": "desc"})
+    assert response.status_code == 200
+    assert len(response.json["items"]) == 10
+    etag = response.headers["ETag"]
+
+    unchanged = client.get(url, headers=dict(auth_headers, **{"If-None-Match": etag}),
+                           query_string={"limit": 10, "sort": "date", "order": "desc"})
+    assert unchanged.status_code == 304
+    # Autres paramètres : autre page, autre ETag
+    other = client.get(url, headers=dict(auth_headers, **{"If-None-Match": etag}), query_string={"limit": 5})
+    assert other.status_code == 200
+
+    next_page = client.get(url, headers=auth_headers, query_string={
+        "limit": 10, "sort": "date", "order": "desc", "cursor": response.json["next_cursor"]
+    })
+    first_ids = {row["user_id"] for row in response.json["items"]}
+    assert not first_ids & {row["user_id"] for row in next_page.json["items"]}
+
+    # Une modification des comptes change l'ETag
+    with app.app_context():
+        db.session.get(User, accounts[0]).nom = "Renomme"
+        db.session.commit()
+    changed = client.get(url, headers=dict(auth_headers, **{"If-None-Match": etag}),
+                         query_string={"limit": 10, "sort": "date", "order": "desc"})
+    assert changed.status_code == 200
+
+
+@pytest.mark.parametrize("params", [{"sort": "role"}, {"order": "up"}, {"limit": 0}, {"limit": 10000},
+                                    {"cursor": "pas-un-curseur"}])
+def test_route_rejects_invalid_parameters(client, auth_headers, user_folder, params):
+    response = client.get("/api/users/users-with-folders", headers=auth_headers, query_string=params)
+    assert response.status_code == 400
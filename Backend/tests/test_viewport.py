@@ -0,0 +1,20 @@
+import ezdxf
+
+
+def test_viewport_rejects_paths_outside_user_folder(client, auth_headers, user_folder):
+    for body in ({"filename": "../../../config.py"}, {"filename": "config.py", "folder": "../.."}):
+        response = client.post("/api/user-folder/viewport", headers=auth_headers,
+                               json=dict(body, bbox=[0, 0, 10, 10]))
+        assert response.status_code == 404
+
+
+def test_viewport_returns_intersecting_entities(client, auth_headers, user_folder):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (1, 1))
+    msp.add_line((50, 50), (51, 51))
+    doc.saveas(f"{user_folder}/plan.dxf")
+    response = client.post("/api/user-folder/viewport", headers=auth_headers,
+                           json={"filename": "plan.dxf", "bbox": [-1, -1, 2, 2]})
+    assert response.status_code == 200
+    assert len(response.json["lines"]) == 1
@@ -28,16 +28,34 @@ const { Title, Text } = Typography;
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
 axios.defaults.baseURL = API_URL;
 
+// Taille d'une page de /api/users/users-with-folders
+const PAGE_SIZE = 50;
+
+// Colonnes triées par le serveur : champ de la table -> paramètre sort
+const SORT_FIELDS = {
+  fullName: 'name',
+  email: 'email',
+  creationDate: 'date',
+};
+
 const GestionRessources = () => {
   const [usersWithFolders, setUsersWithFolders] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [search, setSearch] = useState('');
+  const [sortField, setSortField] = useState('fullName');
+  const [sortOrder, setSortOrder] = useState(1);
   const [isEditModalVisible, setIsEditModalVisible] = useState(false);
   const [editingUser, setEditingUser] = useState(null);
   const [form] = Form.useForm();
 
-  const fetchUsersWithFolders = async () => {
+  // Première page (cursor absent) ou page suivante, ajoutée à la liste ;
+  // recherche et tri sont faits par le serveur
+  const fetchUsersWithFolders = async (cursor = null) => {
+    const setPageLoading = cursor ? setLoadingMore : setLoading;
     try {
-      setLoading(true);
+      setPageLoading(true);
       const token = localStorage.getItem('token');
       if (!token) {
         message.error('Veuillez vous connecter d\'abord.');
@@ -50,10 +68,17 @@ const GestionRessources = () => {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json',
         },
+        params: {
+          limit: PAGE_SIZE,
+          cursor: cursor || undefined,
+          q: search || undefined,
+          sort: SORT_FIELDS[sortField],
+          order: sortOrder === -1 ? 'desc' : 'asc',
+        },
       });
 
       console.log('Fetch response:', response.data);
-      const formattedData = response.data.map(item => ({
+      const formattedData = response.data.items.map(item => ({
         userId: item.user_id,
         fullName: `${item.nom} ${item.prenom}`,
         email: item.email,
@@ -64,12 +89,13 @@ const GestionRessources = () => {
           : 'N/A',
       }));
 
-      setUsersWithFolders(formattedData);
+      setUsersWithFolders(previous => (cursor ? [...previous, ...formattedData] : formattedData));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Erreur lors de fetchUsersWithFolders:', error);
       message.error('Erreur lors du chargement des données: ' + (error.response?.data?.message || error.message));
     } finally {
-      setLoading(false);
+      setPageLoading(false);
     }
   };
 
@@ -198,9 +224,15 @@ const GestionRessources = () => {
     );
   };
 
+  const handleSort = (event) => {
+    setSortField(event.sortField);
+    setSortOrder(event.sortOrder);
+  };
+
+  // Nouvelle recherche ou nouveau tri : la liste repart de la première page
   useEffect(() => {
     fetchUsersWithFolders();
-  }, []);
+  }, [search, sortField, sortOrder]);
 
   return (
     <ConfigProvider
@@ -225,7 +257,7 @@ const GestionRessources = () => {
             <Button
               type="text"
               icon={<ReloadOutlined />}
-              onClick={fetchUsersWithFolders}
+              onClick={() => fetchUsersWithFolders()}
               loading={loading}
               className="refresh-button"
             >
@@ -234,6 +266,12 @@ const GestionRessources = () => {
           }
           className="gestion-card"
         >
+          <Input.Search
+            placeholder="Rechercher par nom, prénom ou email"
+            allowClear
+            onSearch={(value) => setSearch(value.trim())}
+            style={{ marginBottom: 16, maxWidth: 400 }}
+          />
           {loading ? (
             <div className="loading-container">
               <Spin size="large" />
@@ -242,19 +280,24 @@ const GestionRessources = () => {
           ) : (
             <DataTable
               value={usersWithFolders}
-              paginator
-              rows={5}
-              rowsPerPageOptions={[5, 10, 25]}
+              lazy
+              sortField={sortField}
+              sortOrder={sortOrder}
+              onSort={handleSort}
               dataKey="userId"
               responsiveLayout="scroll"
               emptyMessage="Aucune donnée trouvée"
               className="custom-datatable"
               header={<Text strong className="table-header">Liste des utilisateurs et dossiers</Text>}
+              footer={nextCursor && (
+                <Button onClick={() => fetchUsersWithFolders(nextCursor)} loading={loadingMore}>
+                  Charger plus
+                </Button>
+              )}
             >
               <Column
                 field="userId"
                 header="ID Utilisateur"
-                sortable
                 style={{ minWidth: '120px', padding: '12px' }}
                 className="table-column"
               />
@@ -276,7 +319,6 @@ const GestionRessources = () => {
                 field="folderName"
                 header="Nom du Dossier"
                 body={folderNameTemplate}
-                sortable
                 style={{ minWidth: '200px', padding: '12px' }}
                 className="table-column"
               />
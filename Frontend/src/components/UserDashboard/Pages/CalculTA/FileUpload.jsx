@@ -63,19 +63,19 @@ const FileUpload = ({ folderStructure, loading, error, type, setExtractedData, e
         setCurrentProgress(0);
 
         try {
-            const extractResponse = await axios.post('/api/user-folder/extract-data-from-file', 
-                { filename, folder: folderPath },
-                {
-                    headers: {
-                        'Authorization': `Bearer ${localStorage.getItem('token')}`,
-                        'Content-Type': 'application/json',
-                    },
-                    onUploadProgress: (progressEvent) => {
+            // GET : le navigateur garde le résultat et le revalide par son ETag (304 si le plan n'a pas changé)
+            const extractResponse = await axios.get('/api/user-folder/extract-data-from-file', {
+                params: { filename, folder: folderPath },
+                headers: {
+                    'Authorization': `Bearer ${localStorage.getItem('token')}`,
+                },
+                onDownloadProgress: (progressEvent) => {
+                    if (progressEvent.total) {
                         const progress = Math.round((progressEvent.loaded * 100) / progressEvent.total);
                         setCurrentProgress(progress);
                     }
                 }
-            );
+            });
             setExtractedData(extractResponse.data);
             message.success({
                 content: `Données extraites avec succès pour ${filename} !`,
@@ -0,0 +1,62 @@
+// Décodage du format binaire colonnaire renvoyé par les routes d'extraction
+// lorsque l'en-tête Accept vaut COLUMNAR_MIMETYPE (voir Backend/app/services/columnar.py).
+// Chaque colonne est exposée comme un tableau typé, sans objet par sommet.
+
+export const COLUMNAR_MIMETYPE = "application/vnd.gexpertise.columnar";
+
+const TYPED_ARRAYS = {
+    float64: Float64Array,
+    int32: Int32Array,
+    int16: Int16Array,
+    uint8: Uint8Array,
+    uint16: Uint16Array,
+    uint32: Uint32Array,
+    uint64: BigUint64Array,
+};
+
+const MAGIC_LENGTH = 8;
+
+// Reconstruit les coordonnées réelles d'une colonne quantifiée (int32-delta)
+const dequantize = (deltas, header) => {
+    const coords = new Float64Array(deltas.length);
+    const [originX, originY] = header.origin;
+    let x = 0;
+    let y = 0;
+    for (let i = 0; i < deltas.length; i += 2) {
+        x += deltas[i];
+        y += deltas[i + 1];
+        coords[i] = originX + x * header.quantum;
+        coords[i + 1] = originY + y * header.quantum;
+    }
+    return coords;
+};
+
+// Fonction pour décoder un ArrayBuffer colonnaire : retourne { header, columns }
+export const decodeColumnar = (buffer) => {
+    const view = new DataView(buffer);
+    const headerLength = view.getUint32(MAGIC_LENGTH, true);
+    const headerStart = MAGIC_LENGTH + 4;
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, headerStart, headerLength)));
+    const bodyStart = headerStart + headerLength;
+
+    const columns = {};
+    Object.entries(header.columns).forEach(([name, column]) => {
+        const ArrayType = TYPED_ARRAYS[column.dtype];
+        columns[name] = new ArrayType(buffer, bodyStart + column.offset, column.count);
+    });
+
+    if (header.coords === "int32-delta") {
+        ["polylines.coords", "lines.coords", "circles.center", "arcs.center", "texts.position"].forEach((name) => {
+            columns[name] = dequantize(columns[name], header);
+        });
+    }
+    return { header, columns };
+};
+
+// Fonction pour lire le texte n° index de la colonne texts
+export const getText = ({ columns }, index) => {
+    const offsets = columns["texts.text_offsets"];
+    const start = Number(offsets[index]);
+    const end = Number(offsets[index + 1]);
+    return new TextDecoder().decode(columns["texts.text"].subarray(start, end));
+};